@@ -0,0 +1,69 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the ShapedArray codecs on the variables of the test granules: compression ratio and compression and
+decompression throughput, with and without byte shuffling.
+
+    python -m scripts.benchmark_compression [granule ...]
+"""
+
+import glob
+import sys
+import timeit
+from os import path
+
+import numpy
+import xarray as xr
+
+from sdap.processors.serialization import CODECS, compress_payload, decompress_payload, to_shaped_array
+
+DATAFILES = path.join(path.dirname(__file__), '..', 'tests', 'datafiles')
+REPEAT = 5
+
+
+def benchmark(array_data, codec, shuffle):
+    compressed = compress_payload(array_data, codec, shuffle=shuffle)
+
+    compress_time = min(timeit.repeat(lambda: compress_payload(array_data, codec, shuffle=shuffle),
+                                      number=1, repeat=REPEAT))
+    decompress_time = min(timeit.repeat(lambda: decompress_payload(compressed), number=1, repeat=REPEAT))
+
+    megabytes = len(array_data) / 1e6
+    return len(array_data) / len(compressed), megabytes / compress_time, megabytes / decompress_time
+
+
+def main(granules):
+    print("%-28s %-24s %10s %-6s %-7s %7s %10s %10s" % (
+        'granule', 'variable', 'bytes', 'codec', 'shuffle', 'ratio', 'comp MB/s', 'dec MB/s'))
+
+    for granule in granules:
+        with xr.open_dataset(granule, decode_times=False) as ds:
+            for name, variable in ds.data_vars.items():
+                if variable.ndim < 2 or not numpy.issubdtype(variable.dtype, numpy.number):
+                    continue
+
+                array_data = to_shaped_array(numpy.ma.filled(variable.values, numpy.NaN)).array_data
+
+                for codec in sorted(CODECS):
+                    for shuffle in (False, True):
+                        ratio, compress_speed, decompress_speed = benchmark(array_data, codec, shuffle)
+                        print("%-28s %-24s %10d %-6s %-7s %7.2f %10.1f %10.1f" % (
+                            path.basename(granule)[:28], name[:24], len(array_data), codec, shuffle, ratio,
+                            compress_speed, decompress_speed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or sorted(glob.glob(path.join(DATAFILES, '*.nc*')) + glob.glob(path.join(DATAFILES, '*.h5'))))
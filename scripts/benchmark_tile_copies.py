@@ -0,0 +1,149 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare building a grid tile the way the readers used to (serialize into temporary messages, then CopyFrom them into
+the tile and the tile into the output) and the way they do now (serialize directly into the fields of the output tile).
+
+For every CopyFrom the payload bytes that end up in a new object are counted as copied: the pure Python protobuf
+implementation shares the immutable bytes between the messages and copies nothing, the C++ and upb implementations
+copy them. The protobuf implementation in use is printed first, set PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION to compare.
+
+Memory is measured with tracemalloc, which only sees memory allocated by Python: the peak traced memory while building
+one tile, and what is still allocated once it is built (the tile itself).
+
+    python -m scripts.benchmark_tile_copies [tile size ...]
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+import numpy
+from google.protobuf.descriptor import FieldDescriptor
+from google.protobuf.internal import api_implementation
+from nexusproto import DataTile_pb2 as nexusproto
+
+from sdap.processors.serialization import to_metadata, to_shaped_array
+
+REPEAT = 5
+
+
+def arrays(size):
+    latitude = numpy.linspace(-90, 90, size)
+    longitude = numpy.linspace(-180, 180, size)
+    data = numpy.random.RandomState(0).normal(290, 5, (1, size, size)).astype(numpy.float32)
+    return latitude, longitude, data, data.copy()
+
+
+def payload_bytes_copied(source, destination):
+    """
+    :return: Number of bytes of the bytes fields of source that are held by another object in destination
+    """
+    copied = 0
+    for field, value in source.ListFields():
+        if field.label == FieldDescriptor.LABEL_REPEATED:
+            if field.type == FieldDescriptor.TYPE_MESSAGE:
+                copied += sum(payload_bytes_copied(item, copy)
+                              for item, copy in zip(value, getattr(destination, field.name)))
+        elif field.type == FieldDescriptor.TYPE_MESSAGE:
+            copied += payload_bytes_copied(value, getattr(destination, field.name))
+        elif field.type == FieldDescriptor.TYPE_BYTES and getattr(destination, field.name) is not value:
+            copied += len(value)
+    return copied
+
+
+def copy_from(destination, source, copied):
+    destination.CopyFrom(source)
+    if copied is not None:
+        copied.append(payload_bytes_copied(source, destination))
+
+
+def build_with_copies(input_tile, latitude, longitude, data, meta, copied=None):
+    output_tile = nexusproto.NexusTile()
+    copy_from(output_tile, input_tile, copied)
+
+    tile = nexusproto.GridTile()
+    copy_from(tile.latitude, to_shaped_array(latitude), copied)
+    copy_from(tile.longitude, to_shaped_array(longitude), copied)
+    copy_from(tile.variable_data, to_shaped_array(data), copied)
+    copy_from(tile.meta_data.add(), to_metadata('meta', meta), copied)
+
+    copy_from(output_tile.tile.grid_tile, tile, copied)
+
+    return output_tile
+
+
+def build_in_place(input_tile, latitude, longitude, data, meta, copied=None):
+    output_tile = nexusproto.NexusTile()
+    copy_from(output_tile.summary, input_tile.summary, copied)
+
+    tile = output_tile.tile.grid_tile
+    to_shaped_array(latitude, out=tile.latitude)
+    to_shaped_array(longitude, out=tile.longitude)
+    to_shaped_array(data, out=tile.variable_data)
+    to_metadata('meta', meta, out=tile.meta_data.add())
+
+    return output_tile
+
+
+def measure_allocations(build, *args):
+    """
+    :return: (peak bytes allocated while building the tile, bytes still allocated once it is built)
+    """
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        tile = build(*args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del tile
+
+    return peak - start, current - start
+
+
+def main(sizes):
+    input_tile = nexusproto.NexusTile()
+    input_tile.summary.granule = 'file:/tmp/granule.nc'
+    input_tile.summary.section_spec = 'time:0:1,lat:0:100,lon:0:100'
+
+    print("protobuf implementation: %s" % api_implementation.Type())
+    print("%10s %12s %14s %14s %14s %14s %14s %14s %10s %10s" % (
+        'tile size', 'tile bytes', 'copied before', 'copied now', 'peak before', 'peak now', 'kept before', 'kept now',
+        'ms before', 'ms now'))
+
+    for size in sizes:
+        tile_arrays = arrays(size)
+
+        copied_before = []
+        copied_now = []
+        before = build_with_copies(input_tile, *tile_arrays, copied=copied_before)
+        now = build_in_place(input_tile, *tile_arrays, copied=copied_now)
+        assert before == now
+
+        peak_before, kept_before = measure_allocations(build_with_copies, input_tile, *tile_arrays)
+        peak_now, kept_now = measure_allocations(build_in_place, input_tile, *tile_arrays)
+
+        time_before = min(timeit.repeat(lambda: build_with_copies(input_tile, *tile_arrays), number=1, repeat=REPEAT))
+        time_now = min(timeit.repeat(lambda: build_in_place(input_tile, *tile_arrays), number=1, repeat=REPEAT))
+
+        print("%10s %12d %14d %14d %14d %14d %14d %14d %10.2f %10.2f" % (
+            '%dx%d' % (size, size), now.ByteSize(), sum(copied_before), sum(copied_now), peak_before, peak_now,
+            kept_before, kept_now, time_before * 1000, time_now * 1000))
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or [100, 500, 1000, 2000])
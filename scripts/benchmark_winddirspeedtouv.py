@@ -0,0 +1,98 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the time WindDirSpeedToUV takes to convert a tile element by element, the way it used to, and with the
+vectorized masked array implementation, for tiles of 10^3 to 10^7 elements. The element-wise conversion is only timed
+up to --max-loop-size elements, larger tiles take minutes.
+
+    python -m scripts.benchmark_winddirspeedtouv [--max-loop-size N] [tile size ...]
+"""
+
+import argparse
+import timeit
+from math import cos, radians, sin
+
+import numpy
+from nexusproto import DataTile_pb2 as nexusproto
+
+from sdap.processors import WindDirSpeedToUV
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+
+REPEAT = 3
+
+
+def element_wise(wind_speed, wind_dir):
+    wind_u_component = numpy.empty(wind_speed.shape, dtype=float)
+    wind_v_component = numpy.empty(wind_speed.shape, dtype=float)
+    wind_speed_iter = numpy.nditer(wind_speed, flags=['multi_index'])
+    while not wind_speed_iter.finished:
+        speed = wind_speed_iter[0]
+        current_index = wind_speed_iter.multi_index
+        direction = radians(wind_dir[current_index])
+
+        wind_u_component[current_index] = speed * sin(direction)
+        wind_v_component[current_index] = speed * cos(direction)
+
+        wind_speed_iter.iternext()
+
+    return wind_u_component, wind_v_component
+
+
+def make_tile(size):
+    random = numpy.random.RandomState(0)
+    wind_speed = random.uniform(0, 30, size).astype(numpy.float32)
+    wind_dir = random.uniform(0, 360, size).astype(numpy.float32)
+    # A tenth of the values are missing
+    wind_speed[::10] = numpy.nan
+
+    nexus_tile = nexusproto.NexusTile()
+    nexus_tile.tile.swath_tile.variable_data.CopyFrom(to_shaped_array(wind_speed))
+    nexus_tile.tile.swath_tile.meta_data.add().CopyFrom(to_metadata('wind_dir', wind_dir))
+    return nexus_tile, wind_speed, wind_dir
+
+
+def vectorized(nexus_tile):
+    tile = nexusproto.NexusTile()
+    tile.CopyFrom(nexus_tile)
+    return list(WindDirSpeedToUV('U').process(tile))[0]
+
+
+def main(sizes, max_loop_size):
+    print("%10s %14s %14s %10s" % ('elements', 'ms per loop', 'ms vectorized', 'speedup'))
+
+    for size in sizes:
+        nexus_tile, wind_speed, wind_dir = make_tile(size)
+
+        time_vectorized = min(timeit.repeat(lambda: vectorized(nexus_tile), number=1, repeat=REPEAT))
+
+        if size <= max_loop_size:
+            expected_u, _ = element_wise(wind_speed, wind_dir)
+            numpy.testing.assert_array_equal(
+                expected_u, from_shaped_array(vectorized(nexus_tile).tile.swath_tile.variable_data))
+
+            time_loop = min(timeit.repeat(lambda: element_wise(wind_speed, wind_dir), number=1, repeat=REPEAT))
+            print("%10d %14.2f %14.2f %9.0fx" % (size, time_loop * 1000, time_vectorized * 1000,
+                                                 time_loop / time_vectorized))
+        else:
+            print("%10d %14s %14.2f %10s" % (size, '-', time_vectorized * 1000, '-'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sizes', nargs='*', type=int, default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7])
+    parser.add_argument('--max-loop-size', type=int, default=10 ** 5)
+    args = parser.parse_args()
+    main(args.sizes, args.max_loop_size)
@@ -17,6 +17,7 @@ import pprint
 import sys
 import uuid
 
+import pyarrow
 from flask import Flask, request, jsonify, Response
 from flask.json import JSONEncoder
 from flask_accept import accept
@@ -26,6 +27,7 @@ from nexusproto import DataTile_pb2 as nexusproto
 from werkzeug.exceptions import HTTPException, BadRequest
 from werkzeug.exceptions import default_exceptions
 
+from sdap.processors.arrowwriter import ARROW_STREAM_MIMETYPE, PARQUET_MIMETYPE, ArrowTileWriter
 from sdap.processors.processorchain import ProcessorChain, ProcessorNotFound, MissingProcessorArguments
 
 logging.basicConfig(format="%(asctime)s  %(levelname)s %(process)d --- [%(name)s.%(funcName)s:%(lineno)d] %(message)s",
@@ -50,9 +52,7 @@ class ProtobufJSONEncoder(JSONEncoder):
         return JSONEncoder.default(self, obj)
 
 
-@app.route('/processorchain', methods=['POST'], )
-@accept('application/octet-stream', '*/*')
-def run_processor_chain():
+def parse_processor_chain_request():
     try:
         parameters = request.get_json()
     except Exception as e:
@@ -76,6 +76,14 @@ def run_processor_chain():
     except ParseError as e:
         raise BadRequest("input_data must be a NexusTile protobuf serialized as a string") from e
 
+    return chain, input_data
+
+
+@app.route('/processorchain', methods=['POST'], )
+@accept('application/octet-stream', '*/*')
+def run_processor_chain():
+    chain, input_data = parse_processor_chain_request()
+
     result = next(chain.process(input_data), None)
 
     if isinstance(result, nexusproto.NexusTile):
@@ -84,6 +92,22 @@ def run_processor_chain():
     return Response(result, mimetype='application/octet-stream')
 
 
+@run_processor_chain.support(ARROW_STREAM_MIMETYPE, PARQUET_MIMETYPE)
+def run_processor_chain_columnar():
+    """
+    Return every tile produced by the chain, with its summary, as an Arrow stream or a Parquet file depending on the
+    Accept header.
+    """
+    chain, input_data = parse_processor_chain_request()
+
+    mimetype = request.accept_mimetypes.best_match([ARROW_STREAM_MIMETYPE, PARQUET_MIMETYPE])
+    sink = pyarrow.BufferOutputStream()
+    with ArrowTileWriter(sink, file_format='parquet' if mimetype == PARQUET_MIMETYPE else 'arrow') as writer:
+        chain.write(input_data, writer)
+
+    return Response(sink.getvalue().to_pybytes(), mimetype=mimetype)
+
+
 @app.route('/healthcheck', methods=['GET'], )
 def health_check():
     return ''
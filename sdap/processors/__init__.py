@@ -13,10 +13,40 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
 from nexusproto import DataTile_pb2 as nexusproto
 
+logger = logging.getLogger('processors')
+
+_thread_pool = None
+_thread_pool_size = None
+_thread_pool_lock = Lock()
+
+
+def shared_thread_pool(max_workers):
+    """
+    Return the thread pool shared by every processor in this process, creating it on first use.
+
+    The pool is sized by the first caller; later callers get the same pool whatever max_workers they ask for, and a
+    warning is logged when they ask for another size.
+
+    :param max_workers: Number of threads in the pool if it has to be created
+    :return: The process-wide ThreadPoolExecutor
+    """
+    global _thread_pool, _thread_pool_size
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=max_workers)
+            _thread_pool_size = max_workers
+        elif max_workers != _thread_pool_size:
+            logger.warning("Asked for a thread pool of %s threads, the shared pool already has %s", max_workers,
+                           _thread_pool_size)
+        return _thread_pool
+
 
 class Processor(object):
     def __init__(self, *args, **kwargs):
@@ -51,9 +81,14 @@ class NexusTileProcessor(Processor):
 
 from sdap.processors.callncpdq import CallNcpdq
 from sdap.processors.callncra import CallNcra
+from sdap.processors.compresstiledata import CompressTileData
+from sdap.processors.computequadkeys import ComputeQuadkeys
 from sdap.processors.computespeeddirfromuv import ComputeSpeedDirFromUV
+from sdap.processors.convertunits import ConvertUnits
+from sdap.processors.deduplicatetiles import DeduplicateTiles
 from sdap.processors.deleteunitaxis import DeleteUnitAxis
 from sdap.processors.emptytilefilter import EmptyTileFilter
+from sdap.processors.expression import Expression
 from sdap.processors.kelvintocelsius import KelvinToCelsius
 from sdap.processors.normalizetimebeginningofmonth import NormalizeTimeBeginningOfMonth
 from sdap.processors.promotevariabletoglobalattribute import PromoteVariableToGlobalAttribute
@@ -61,15 +96,22 @@ from sdap.processors.regrid1x1 import Regrid1x1
 from sdap.processors.subtract180longitude import Subtract180Longitude
 from sdap.processors.tilereadingprocessor import GridReadingProcessor, SwathReadingProcessor, TimeSeriesReadingProcessor
 from sdap.processors.tilesummarizingprocessor import TileSummarizingProcessor
+from sdap.processors.trimemptyborders import TrimEmptyBorders
+from sdap.processors.trimprecision import TrimPrecision
 from sdap.processors.winddirspeedtouv import WindDirSpeedToUV
 from sdap.processors.extracttimestampprocessor import ExtractTimestampProcessor
 
 INSTALLED_PROCESSORS = {
     "CallNcpdq": CallNcpdq,
     "CallNcra": CallNcra,
+    "CompressTileData": CompressTileData,
+    "ComputeQuadkeys": ComputeQuadkeys,
     "ComputeSpeedDirFromUV": ComputeSpeedDirFromUV,
+    "ConvertUnits": ConvertUnits,
+    "DeduplicateTiles": DeduplicateTiles,
     "DeleteUnitAxis": DeleteUnitAxis,
     "EmptyTileFilter": EmptyTileFilter,
+    "Expression": Expression,
     "KelvinToCelsius": KelvinToCelsius,
     "NormalizeTimeBeginningOfMonth": NormalizeTimeBeginningOfMonth,
     "PromoteVariableToGlobalAttribute": PromoteVariableToGlobalAttribute,
@@ -79,6 +121,8 @@ INSTALLED_PROCESSORS = {
     "SwathReadingProcessor": SwathReadingProcessor,
     "TimeSeriesReadingProcessor": TimeSeriesReadingProcessor,
     "TileSummarizingProcessor": TileSummarizingProcessor,
+    "TrimEmptyBorders": TrimEmptyBorders,
+    "TrimPrecision": TrimPrecision,
     "WindDirSpeedToUV": WindDirSpeedToUV,
     "ExtractTimestampProcessor": ExtractTimestampProcessor
 }
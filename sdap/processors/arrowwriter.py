@@ -0,0 +1,296 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy
+import pyarrow
+import pyarrow.parquet as parquet
+from nexusproto import DataTile_pb2 as nexusproto
+
+from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import view_shaped_array
+
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_MIMETYPE = 'application/vnd.apache.parquet'
+
+FORMATS = ('arrow', 'parquet')
+
+# One meta data array of a tile
+META_DATA_TYPE = pyarrow.struct([
+    ('name', pyarrow.string()),
+    ('shape', pyarrow.list_(pyarrow.int64())),
+    ('values', pyarrow.large_list(pyarrow.float64()))
+])
+
+
+def tile_schema(data_dtype=numpy.float64):
+    """
+    :param data_dtype: numpy dtype of the variable_data column
+    :return: Schema of the record batches of tiles
+    """
+    return pyarrow.schema([
+        ('tile_id', pyarrow.string()),
+        ('granule', pyarrow.string()),
+        ('section_spec', pyarrow.string()),
+        ('dataset_name', pyarrow.string()),
+        ('dataset_uuid', pyarrow.string()),
+        ('data_var_name', pyarrow.string()),
+        ('global_attributes', pyarrow.map_(pyarrow.string(), pyarrow.list_(pyarrow.string()))),
+        ('tile_type', pyarrow.string()),
+        ('lat_min', pyarrow.float64()),
+        ('lat_max', pyarrow.float64()),
+        ('lon_min', pyarrow.float64()),
+        ('lon_max', pyarrow.float64()),
+        ('min', pyarrow.float64()),
+        ('max', pyarrow.float64()),
+        ('mean', pyarrow.float64()),
+        ('count', pyarrow.int64()),
+        ('min_time', pyarrow.int64()),
+        ('max_time', pyarrow.int64()),
+        # Only for grid tiles, see times for the other tile types
+        ('time', pyarrow.int64()),
+        ('shape', pyarrow.list_(pyarrow.int64())),
+        # Flattened in C order. Large lists have 64 bit offsets, a batch of large tiles easily holds more than 2 ** 31
+        # values
+        ('latitude', pyarrow.large_list(pyarrow.float64())),
+        ('longitude', pyarrow.large_list(pyarrow.float64())),
+        ('variable_data', pyarrow.large_list(pyarrow.from_numpy_dtype(numpy.dtype(data_dtype)))),
+        # Only for swath and time series tiles, their time array as stored in the tile, NaN times are null
+        ('times', pyarrow.large_list(pyarrow.int64())),
+        # Meta data arrays, flattened in C order like variable_data
+        ('meta_data', pyarrow.list_(META_DATA_TYPE))
+    ])
+
+
+TILE_SCHEMA = tile_schema()
+
+# Appended to the tile schema when the serialized tiles are written too
+TILE_FIELD = pyarrow.field('tile', pyarrow.binary())
+
+
+def list_array(arrays, dtype=numpy.float64):
+    """
+    Build a large_list array from numpy arrays with one concatenation instead of one Python object per value.
+    """
+    offsets = numpy.zeros(len(arrays) + 1, dtype=numpy.int64)
+    numpy.cumsum([array.size for array in arrays], dtype=numpy.int64, out=offsets[1:])
+    values = numpy.concatenate([array.ravel() for array in arrays]) if arrays else numpy.empty(0)
+
+    if numpy.issubdtype(values.dtype, numpy.floating) and not numpy.issubdtype(dtype, numpy.floating):
+        # NaN has no integer value, keep it as null
+        mask = numpy.isnan(values)
+        values = pyarrow.array(numpy.where(mask, 0, values).astype(dtype), mask=mask)
+    else:
+        values = pyarrow.array(values.astype(dtype, copy=False))
+
+    return pyarrow.LargeListArray.from_arrays(pyarrow.array(offsets), values)
+
+
+def meta_data_array(tile_data):
+    """
+    Build the list array of the meta data of each tile, one META_DATA_TYPE struct per meta data array.
+    """
+    meta_data = [list(data.meta_data) if data is not None else [] for data in tile_data]
+    entries = [entry for tile_meta_data in meta_data for entry in tile_meta_data]
+    values = [view_shaped_array(entry.meta_data) if entry.meta_data.array_data else numpy.empty(0)
+              for entry in entries]
+
+    offsets = numpy.zeros(len(meta_data) + 1, dtype=numpy.int32)
+    numpy.cumsum([len(tile_meta_data) for tile_meta_data in meta_data], dtype=numpy.int32, out=offsets[1:])
+    structs = pyarrow.StructArray.from_arrays(
+        [pyarrow.array([entry.name for entry in entries], type=pyarrow.string()),
+         pyarrow.array([list(array.shape) for array in values], type=pyarrow.list_(pyarrow.int64())),
+         list_array(values)],
+        fields=list(META_DATA_TYPE))
+
+    return pyarrow.ListArray.from_arrays(pyarrow.array(offsets), structs)
+
+
+def data_dtype_of(nexus_tiles, default=numpy.float64):
+    """
+    :return: dtype holding the variable data of every tile, default if there is none
+    """
+    dtypes = []
+    for nexus_tile in nexus_tiles:
+        tile_type = nexus_tile.tile.WhichOneof("tile_type")
+        if tile_type and getattr(nexus_tile.tile, tile_type).variable_data.array_data:
+            dtypes.append(view_shaped_array(getattr(nexus_tile.tile, tile_type).variable_data).dtype)
+    return numpy.result_type(*dtypes) if dtypes else numpy.dtype(default)
+
+
+def to_record_batch(nexus_tiles, include_tile=False, data_dtype=None):
+    """
+    Convert NexusTiles into one Arrow RecordBatch with a row per tile.
+
+    :param nexus_tiles: List of NexusTiles
+    :param include_tile: Add a 'tile' column with each tile serialized as protobuf bytes
+    :param data_dtype: dtype of the variable_data column. Defaults to the dtype of the variable data of the tiles, so
+                       float32 data (see the output_dtype option of the readers) isn't widened
+    :return: RecordBatch following tile_schema(data_dtype)
+    """
+    data_dtype = numpy.dtype(data_dtype) if data_dtype is not None else data_dtype_of(nexus_tiles)
+    tile_types = [nexus_tile.tile.WhichOneof("tile_type") for nexus_tile in nexus_tiles]
+    tile_data = [getattr(nexus_tile.tile, tile_type) if tile_type else None
+                 for nexus_tile, tile_type in zip(nexus_tiles, tile_types)]
+    summaries = [nexus_tile.summary for nexus_tile in nexus_tiles]
+
+    def summary_column(get, present=lambda summary: True):
+        return [get(summary) if present(summary) else None for summary in summaries]
+
+    def has_bbox(summary):
+        return summary.HasField('bbox')
+
+    def has_stats(summary):
+        return summary.HasField('stats')
+
+    def data_column(field):
+        return [view_shaped_array(getattr(data, field)) if data is not None and getattr(data, field).array_data
+                else numpy.empty(0) for data in tile_data]
+
+    variable_data = data_column('variable_data')
+
+    columns = [
+        summary_column(lambda summary: summary.tile_id),
+        summary_column(lambda summary: summary.granule),
+        summary_column(lambda summary: summary.section_spec),
+        summary_column(lambda summary: summary.dataset_name),
+        summary_column(lambda summary: summary.dataset_uuid),
+        summary_column(lambda summary: summary.data_var_name),
+        summary_column(lambda summary: [(attribute.name, list(attribute.values))
+                                        for attribute in summary.global_attributes]),
+        tile_types,
+        summary_column(lambda summary: summary.bbox.lat_min, has_bbox),
+        summary_column(lambda summary: summary.bbox.lat_max, has_bbox),
+        summary_column(lambda summary: summary.bbox.lon_min, has_bbox),
+        summary_column(lambda summary: summary.bbox.lon_max, has_bbox),
+        summary_column(lambda summary: summary.stats.min, has_stats),
+        summary_column(lambda summary: summary.stats.max, has_stats),
+        summary_column(lambda summary: summary.stats.mean, has_stats),
+        summary_column(lambda summary: summary.stats.count, has_stats),
+        summary_column(lambda summary: summary.stats.min_time, has_stats),
+        summary_column(lambda summary: summary.stats.max_time, has_stats),
+        [data.time if tile_type == 'grid_tile' else None for data, tile_type in zip(tile_data, tile_types)],
+        [list(data.shape) for data in variable_data]
+    ]
+    schema = tile_schema(data_dtype)
+    arrays = [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)]
+    arrays.append(list_array(data_column('latitude')))
+    arrays.append(list_array(data_column('longitude')))
+    arrays.append(list_array(variable_data, data_dtype))
+    arrays.append(list_array([view_shaped_array(data.time)
+                              if tile_type in ('swath_tile', 'time_series_tile') and data.time.array_data
+                              else numpy.empty(0) for data, tile_type in zip(tile_data, tile_types)], numpy.int64))
+    arrays.append(meta_data_array(tile_data))
+
+    if include_tile:
+        arrays.append(pyarrow.array([nexus_tile.SerializeToString() for nexus_tile in nexus_tiles],
+                                    type=pyarrow.binary()))
+        schema = schema.append(TILE_FIELD)
+
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ArrowTileWriter(object):
+    """
+    Write NexusTiles to an Arrow IPC stream or a Parquet file, batch_size tiles at a time. Each batch becomes one
+    Arrow record batch or one Parquet row group.
+
+    Use it as the output stage of a ProcessorChain:
+
+        with ArrowTileWriter('tiles.parquet') as writer:
+            chain.write(input_tile, writer)
+    """
+
+    def __init__(self, where, file_format='parquet', batch_size=1024, include_tile=False, data_dtype=None):
+        """
+        :param where: Path or writable file object
+        :param file_format: 'parquet' or 'arrow'
+        :param batch_size: Number of tiles buffered before they are written
+        :param include_tile: Add a 'tile' column with each tile serialized as protobuf bytes
+        :param data_dtype: dtype of the variable_data column, the variable data of every batch is cast to it. A file
+                           has a single schema, so if not given it is the dtype of the variable data of the first batch
+                           and a later batch of another dtype raises a ValueError
+        """
+        if file_format not in FORMATS:
+            raise ValueError("file_format must be one of %s, got %s" % (FORMATS, file_format))
+
+        self.where = where
+        self.file_format = file_format
+        self.batch_size = int(batch_size)
+        self.include_tile = include_tile
+        self.data_dtype = numpy.dtype(data_dtype) if data_dtype is not None else None
+        # Only cast the variable data to a dtype that was asked for
+        self._cast = data_dtype is not None
+
+        self._tiles = []
+        self._writer = None
+
+    @property
+    def schema(self):
+        schema = tile_schema(self.data_dtype if self.data_dtype is not None else numpy.float64)
+        return schema.append(TILE_FIELD) if self.include_tile else schema
+
+    def _open(self):
+        if self._writer is None:
+            if self.file_format == 'parquet':
+                self._writer = parquet.ParquetWriter(self.where, self.schema)
+            else:
+                self._writer = pyarrow.ipc.new_stream(self.where, self.schema)
+        return self._writer
+
+    def write(self, nexus_tile):
+        if isinstance(nexus_tile, nexusproto.NexusTile):
+            # The tile is buffered until the batch is full, copy it as the caller may reuse it meanwhile (the readers
+            # refill the same output tile for every section)
+            tile = nexusproto.NexusTile()
+            tile.CopyFrom(nexus_tile)
+        else:
+            tile = NexusTileProcessor.parse_input(nexus_tile)
+        self._tiles.append(tile)
+
+        if len(self._tiles) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._tiles:
+            return
+
+        if self.data_dtype is None:
+            self.data_dtype = data_dtype_of(self._tiles)
+            self._cast = False
+        elif not self._cast:
+            batch_dtype = data_dtype_of(self._tiles, default=self.data_dtype)
+            if batch_dtype != self.data_dtype:
+                # Drop the batch so closing the writer doesn't raise again
+                self._tiles = []
+                raise ValueError("Variable data of dtype %s can't be written after %s, set data_dtype to cast it"
+                                 % (batch_dtype, self.data_dtype))
+        batch = to_record_batch(self._tiles, include_tile=self.include_tile, data_dtype=self.data_dtype)
+        self._tiles = []
+
+        if self.file_format == 'parquet':
+            self._open().write_table(pyarrow.Table.from_batches([batch]))
+        else:
+            self._open().write_batch(batch)
+
+    def close(self):
+        self.flush()
+        # Opening here writes a valid empty file if no tile was written
+        self._open().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
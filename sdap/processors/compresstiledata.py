@@ -0,0 +1,56 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from nexusproto import DataTile_pb2 as nexusproto
+
+from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import compress_shaped_array, get_codec
+
+
+def shaped_arrays(tile_data):
+    yield tile_data.latitude
+    yield tile_data.longitude
+    if isinstance(tile_data.time, nexusproto.ShapedArray):
+        yield tile_data.time
+    yield tile_data.variable_data
+    for metadata in tile_data.meta_data:
+        yield metadata.meta_data
+
+
+class CompressTileData(NexusTileProcessor):
+    """
+    Compress every ShapedArray of a tile with one of the codecs registered in sdap.processors.serialization. The
+    processors and from_shaped_array/view_shaped_array decompress them transparently, so this can sit anywhere in a
+    chain, but it is usually the last step before the tile is stored or sent.
+    """
+
+    def __init__(self, codec, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Fail when the chain is built rather than on the first tile
+        get_codec(codec)
+        self.codec = codec
+        self.level = int(self.environ['LEVEL']) if self.environ['LEVEL'] is not None else None
+        self.shuffle = str(self.environ['SHUFFLE']).lower() in ('true', '1', 'yes')
+
+    def process_nexus_tile(self, nexus_tile):
+        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+
+        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+
+        for shaped_array in shaped_arrays(the_tile_data):
+            compress_shaped_array(shaped_array, self.codec, level=self.level, shuffle=self.shuffle)
+
+        yield nexus_tile
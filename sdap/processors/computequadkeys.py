@@ -0,0 +1,114 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy
+
+from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import view_shaped_array
+from sdap.processors.tileaccessor import set_global_attribute
+
+# Name of the global attribute holding the quadkeys at a level, e.g. quadkeys.8
+QUADKEYS_ATTRIBUTE = 'quadkeys.%d'
+MAX_LEVEL = 30
+
+
+def cell_columns(longitudes, level):
+    """
+    :return: Column of the cell containing every longitude on a 2 ** level by 2 ** level grid over the globe, counted
+             eastward from -180
+    """
+    cells = 2 ** level
+    x = numpy.floor(((longitudes + 180.0) % 360.0) * (cells / 360.0)).astype(numpy.int64)
+    return numpy.clip(x, 0, cells - 1, out=x)
+
+
+def cell_rows(latitudes, level):
+    """
+    :return: Row of the cell containing every latitude on a 2 ** level by 2 ** level grid over the globe, counted
+             southward from 90
+    """
+    cells = 2 ** level
+    y = numpy.floor((90.0 - latitudes) * (cells / 180.0)).astype(numpy.int64)
+    return numpy.clip(y, 0, cells - 1, out=y)
+
+
+def quadkeys(x, y, level):
+    """
+    :param x: Columns of unique cells
+    :param y: Rows of unique cells
+    :return: Quadkey of every cell. Each digit picks a quadrant (0 NW, 1 NE, 2 SW, 3 SE) so a key is prefixed by the
+             keys of the cells containing it at lower levels
+    """
+    shifts = numpy.arange(level - 1, -1, -1, dtype=numpy.int64)
+    digits = ((y[:, numpy.newaxis] >> shifts) & 1) * 2 + ((x[:, numpy.newaxis] >> shifts) & 1)
+    characters = numpy.ascontiguousarray(digits + ord('0'), dtype=numpy.uint8)
+
+    return [key.decode('ascii') for key in characters.view('S%d' % level).ravel().tolist()]
+
+
+def covered_quadkeys(latitudes, longitudes, level, grid=False):
+    """
+    Quadkeys of the cells containing at least one point of a tile.
+
+    :param latitudes: Latitudes of the points
+    :param longitudes: Longitudes of the points, same shape as latitudes unless grid is True
+    :param level: Level of the cells, the globe is divided into 4 ** level cells
+    :param grid: latitudes and longitudes are the 1-D axes of a grid, every combination of them is a point
+    :return: Sorted list of quadkeys
+    """
+    if grid:
+        latitudes = latitudes[~numpy.isnan(latitudes)]
+        longitudes = longitudes[~numpy.isnan(longitudes)]
+        # The cells of a grid are every combination of the rows of its latitudes and the columns of its longitudes
+        x = numpy.unique(cell_columns(longitudes, level))
+        y = numpy.unique(cell_rows(latitudes, level))
+        codes = (y[:, numpy.newaxis] << level | x).ravel()
+    else:
+        valid = ~(numpy.isnan(latitudes) | numpy.isnan(longitudes))
+        x = cell_columns(longitudes[valid], level)
+        y = cell_rows(latitudes[valid], level)
+        codes = numpy.unique(y << level | x)
+
+    return sorted(quadkeys(codes & ((1 << level) - 1), codes >> level, level))
+
+
+class ComputeQuadkeys(NexusTileProcessor):
+    """
+    Add the quadkeys of the cells covered by the tile at each of the configured levels to the global attributes of its
+    summary, so tiles can be looked up by region with an index rather than by scanning their bounding boxes.
+    """
+
+    def __init__(self, levels, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Either a list or a comma separated string
+        self.levels = [int(level) for level in (levels.split(',') if isinstance(levels, str) else levels)]
+        for level in self.levels:
+            if not 1 <= level <= MAX_LEVEL:
+                raise ValueError("Quadkey levels must be between 1 and %d, got %d" % (MAX_LEVEL, level))
+
+    def process_nexus_tile(self, nexus_tile):
+        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+
+        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+
+        latitudes = view_shaped_array(the_tile_data.latitude)
+        longitudes = view_shaped_array(the_tile_data.longitude)
+
+        for level in self.levels:
+            set_global_attribute(nexus_tile.summary, QUADKEYS_ATTRIBUTE % level,
+                                 covered_quadkeys(latitudes, longitudes, level, grid=the_tile_type == 'grid_tile'))
+
+        yield nexus_tile
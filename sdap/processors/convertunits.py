@@ -0,0 +1,232 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy
+from netCDF4 import Dataset
+
+from sdap.processors import NexusTileProcessor
+from sdap.processors.granuleindex import get_granule_index
+from sdap.processors.serialization import to_shaped_array, view_shaped_array
+from sdap.processors.tileaccessor import get_global_attribute, set_global_attribute
+
+# Global attribute of the summary holding the units of the variable data, and of each meta data
+UNITS_ATTRIBUTE = 'units'
+META_UNITS_ATTRIBUTE = '%s.units'
+
+# Every unit maps to (quantity, scale, offset) such that value * scale + offset is the value in the base unit of the
+# quantity, so any two units of a quantity convert into each other with a single affine transformation
+UNITS = {}
+
+
+class UnknownUnitException(Exception):
+    pass
+
+
+class IncompatibleUnitsException(Exception):
+    pass
+
+
+def normalize_unit(unit):
+    return ' '.join(unit.split())
+
+
+def register_unit(names, quantity, scale, offset=0.0):
+    """
+    Make units available to ConvertUnits.
+
+    :param names: Spellings of the unit, e.g. ['degC', 'celsius']
+    :param quantity: Name of the quantity measured, only units of the same quantity can be converted into each other
+    :param scale: Scale to the base unit of the quantity
+    :param offset: Offset to the base unit of the quantity, applied after scale
+    """
+    for name in names:
+        UNITS[normalize_unit(name)] = (quantity, scale, offset)
+
+
+register_unit(['K', 'kelvin', 'Kelvin', 'kelvins', 'degK', 'degree_K', 'degrees_K', 'degree_kelvin'], 'temperature', 1.0)
+register_unit(['degC', 'celsius', 'Celsius', 'degree_C', 'degrees_C', 'degree_Celsius', 'degrees_Celsius', 'deg C'],
+              'temperature', 1.0, 273.15)
+register_unit(['degF', 'fahrenheit', 'Fahrenheit', 'degree_F', 'degrees_F', 'degree_Fahrenheit'], 'temperature',
+              5.0 / 9.0, 273.15 - 32.0 * 5.0 / 9.0)
+
+register_unit(['m s-1', 'm/s', 'm s^-1', 'm s**-1', 'meter second-1', 'meters/second', 'meters per second'], 'speed',
+              1.0)
+register_unit(['cm s-1', 'cm/s'], 'speed', 0.01)
+register_unit(['mm s-1', 'mm/s'], 'speed', 0.001)
+register_unit(['km h-1', 'km/h'], 'speed', 1000.0 / 3600.0)
+register_unit(['knot', 'knots', 'kt', 'kn'], 'speed', 1852.0 / 3600.0)
+
+register_unit(['m', 'meter', 'meters', 'metre', 'metres'], 'length', 1.0)
+register_unit(['cm', 'centimeter', 'centimeters'], 'length', 0.01)
+register_unit(['mm', 'millimeter', 'millimeters'], 'length', 0.001)
+register_unit(['km', 'kilometer', 'kilometers'], 'length', 1000.0)
+register_unit(['ft', 'foot', 'feet'], 'length', 0.3048)
+register_unit(['nmi', 'nautical_mile', 'nautical miles'], 'length', 1852.0)
+
+register_unit(['Pa', 'pascal'], 'pressure', 1.0)
+register_unit(['hPa', 'mbar', 'millibar', 'millibars'], 'pressure', 100.0)
+register_unit(['kPa'], 'pressure', 1000.0)
+register_unit(['dbar', 'decibar', 'decibars'], 'pressure', 1.0e4)
+register_unit(['bar', 'bars'], 'pressure', 1.0e5)
+register_unit(['atm'], 'pressure', 101325.0)
+
+# Practical salinity is dimensionless, these are all the same scale
+register_unit(['psu', 'PSU', 'pss', 'PSS-78', '1e-3', '0.001', 'ppt'], 'salinity', 1.0)
+
+register_unit(['kg m-3', 'kg/m3', 'kg m^-3'], 'mass concentration', 1.0)
+register_unit(['g m-3', 'g/m3', 'g m^-3', 'mg L-1', 'mg/L'], 'mass concentration', 1.0e-3)
+register_unit(['mg m-3', 'mg/m3', 'mg m^-3', 'mg m**-3', 'ug L-1', 'ug/L', 'ug l-1'], 'mass concentration', 1.0e-6)
+
+register_unit(['rad', 'radian', 'radians'], 'angle', 1.0)
+register_unit(['degree', 'degrees', 'deg'], 'angle', numpy.pi / 180.0)
+
+
+def conversion(from_units, to_units):
+    """
+    :return: (scale, offset) such that value * scale + offset converts a value in from_units to to_units
+    """
+    try:
+        from_quantity, from_scale, from_offset = UNITS[normalize_unit(from_units)]
+        to_quantity, to_scale, to_offset = UNITS[normalize_unit(to_units)]
+    except KeyError as e:
+        raise UnknownUnitException("Unknown unit %s, known units are %s" % (e.args[0], ', '.join(sorted(UNITS))))
+
+    if from_quantity != to_quantity:
+        raise IncompatibleUnitsException("Cannot convert %s (%s) to %s (%s)" % (
+            from_units, from_quantity, to_units, to_quantity))
+
+    return from_scale / to_scale, (from_offset - to_offset) / to_scale
+
+
+def convert_in_place(shaped_array, scale, offset):
+    """
+    Apply value * scale + offset to a ShapedArray, making a single copy of its data to compute in. Integers are
+    converted to float64.
+    """
+    data = view_shaped_array(shaped_array)
+    data = data.astype(data.dtype if numpy.issubdtype(data.dtype, numpy.floating) else numpy.float64)
+
+    if scale != 1.0:
+        numpy.multiply(data, data.dtype.type(scale), out=data)
+    if offset != 0.0:
+        numpy.add(data, data.dtype.type(offset), out=data)
+
+    to_shaped_array(data, out=shaped_array)
+
+
+class ConvertUnits(NexusTileProcessor):
+    """
+    Convert the variable data and the selected meta data of a tile to to_units in place.
+
+    The units of an array are, in order: from_units for the variable data if given, the units attribute of the summary
+    (units for the variable data, <meta data>.units for a meta data), or the units attribute of the variable of the
+    same name in the granule. The variable data is read from variable, or summary.data_var_name if not given.
+    The units attributes of the summary are set to the new units after conversion.
+
+    Meta data are converted as absolute values unless listed in differences: an uncertainty like analysis_error must
+    not be offset when converting kelvin to degrees Celsius.
+    """
+
+    def __init__(self, to_units, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.to_units = normalize_unit(to_units)
+        if self.to_units not in UNITS:
+            raise UnknownUnitException("Unknown unit %s" % to_units)
+        self.from_units = self.environ['FROM_UNITS']
+        self.variable = self.environ['VARIABLE']
+        # Meta data converted along with the variable data, each to to_units or to its own units given as
+        # name:units (e.g. analysis_error:K). Either a list or a comma separated string
+        meta = self.environ['META'] or []
+        meta = meta.split(',') if isinstance(meta, str) else list(meta)
+        self.meta = []
+        for entry in meta:
+            name, _, units = entry.partition(':')
+            units = normalize_unit(units) if units else self.to_units
+            if units not in UNITS:
+                raise UnknownUnitException("Unknown unit %s for meta data %s" % (units, name))
+            self.meta.append((name, units))
+        # Meta data holding differences or uncertainties, e.g. analysis_error. They are only scaled: a difference of
+        # 1 kelvin is a difference of 1 degree Celsius. Either a list or a comma separated string
+        differences = self.environ['DIFFERENCES'] or []
+        self.differences = set(differences.split(',') if isinstance(differences, str) else differences)
+        self.granule_index = get_granule_index(self.environ['GRANULE_INDEX']) \
+            if self.environ['GRANULE_INDEX'] is not None else None
+
+        # Units read from the last granule, tiles of the same granule usually follow each other
+        self._granule_units = (None, {})
+
+    def granule_units(self, granule, variable):
+        file_path = granule[len('file:'):] if granule.startswith('file:') else granule
+
+        if self._granule_units[0] != file_path:
+            self._granule_units = (file_path, {})
+        units = self._granule_units[1]
+
+        if variable not in units:
+            if self.granule_index is not None:
+                # The variable attributes are in the granule index, no need to open the granule
+                info = self.granule_index.get(file_path)
+                units[variable] = info[variable].attrs.get('units') if variable in info else None
+            else:
+                with Dataset(file_path) as ds:
+                    units[variable] = getattr(ds[variable], 'units', None) if variable in ds.variables else None
+
+        return units[variable]
+
+    def source_units(self, summary, attribute_name, variable, explicit_units=None):
+        if explicit_units is not None:
+            return explicit_units
+
+        attribute = get_global_attribute(summary, attribute_name)
+        if attribute is not None and attribute.values:
+            return attribute.values[0]
+
+        units = self.granule_units(summary.granule, variable) if summary.granule and variable else None
+        if units is None:
+            raise UnknownUnitException("Units of %s in %s are unknown" % (variable, summary.granule))
+        return units
+
+    @staticmethod
+    def convert(shaped_array, from_units, to_units, difference=False):
+        scale, offset = conversion(from_units, to_units)
+        if difference:
+            offset = 0.0
+        if scale != 1.0 or offset != 0.0:
+            convert_in_place(shaped_array, scale, offset)
+
+    def process_nexus_tile(self, nexus_tile):
+        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+
+        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+
+        summary = nexus_tile.summary
+
+        from_units = self.source_units(summary, UNITS_ATTRIBUTE, self.variable or summary.data_var_name,
+                                       self.from_units)
+        self.convert(the_tile_data.variable_data, from_units, self.to_units)
+        set_global_attribute(summary, UNITS_ATTRIBUTE, [self.to_units])
+
+        meta_data = {meta.name: meta for meta in the_tile_data.meta_data}
+        for name, to_units in self.meta:
+            if name not in meta_data:
+                raise RuntimeError(
+                    "Meta data %s was not found for granule %s slice %s. Cannot convert its units." % (
+                        name, summary.granule, summary.section_spec))
+            from_units = self.source_units(summary, META_UNITS_ATTRIBUTE % name, name)
+            self.convert(meta_data[name].meta_data, from_units, to_units, difference=name in self.differences)
+            set_global_attribute(summary, META_UNITS_ATTRIBUTE % name, [to_units])
+
+        yield nexus_tile
@@ -0,0 +1,104 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import sqlite3
+from threading import Lock
+
+from sdap.processors import NexusTileProcessor
+
+logger = logging.getLogger('deduplicatetiles')
+
+
+def tile_digest(nexus_tile):
+    """
+    Hash the data of a tile: its variable data, meta data, coordinates and time but not its summary, so a granule
+    republished with only metadata changes gives the same digests.
+
+    :return: 16 byte BLAKE2b digest
+    """
+    return hashlib.blake2b(nexus_tile.tile.SerializeToString(deterministic=True), digest_size=16).digest()
+
+
+class TileHashStore(object):
+    """
+    Local SQLite store of the digest of the last version of every tile, keyed by granule and section spec.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(self.store_path, check_same_thread=False)
+
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS tiles "
+                                     "(granule TEXT NOT NULL, section_spec TEXT NOT NULL, digest BLOB NOT NULL, "
+                                     "PRIMARY KEY (granule, section_spec))")
+
+    def update(self, granule, section_spec, digest):
+        """
+        Record digest as the current version of a tile.
+
+        :return: False if digest was already the current version, True if the tile is new or has changed
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT digest FROM tiles WHERE granule = ? AND section_spec = ?",
+                                           (granule, section_spec)).fetchone()
+            if row is not None and row[0] == digest:
+                return False
+
+            self._connection.execute("INSERT OR REPLACE INTO tiles (granule, section_spec, digest) VALUES (?, ?, ?)",
+                                     (granule, section_spec, digest))
+            return True
+
+    def close(self):
+        self._connection.close()
+
+
+_tile_hash_stores = {}
+_tile_hash_stores_lock = Lock()
+
+
+def get_tile_hash_store(store_path):
+    """
+    Return the TileHashStore stored at store_path, shared by every processor in this process.
+    """
+    with _tile_hash_stores_lock:
+        if store_path not in _tile_hash_stores:
+            _tile_hash_stores[store_path] = TileHashStore(store_path)
+        return _tile_hash_stores[store_path]
+
+
+class DeduplicateTiles(NexusTileProcessor):
+    """
+    Drop tiles whose data hasn't changed since they were last seen, so re-ingesting a granule that was republished with
+    only metadata changes doesn't write its tiles again. A tile is recorded as soon as it is passed on, so a tile whose
+    write later fails downstream is only ingested again once the store is removed.
+    """
+
+    def __init__(self, hash_store, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.hash_store = get_tile_hash_store(hash_store)
+
+    def process_nexus_tile(self, nexus_tile):
+        granule = nexus_tile.summary.granule
+        section_spec = nexus_tile.summary.section_spec
+
+        if self.hash_store.update(granule, section_spec, tile_digest(nexus_tile)):
+            yield nexus_tile
+        else:
+            logger.info("Discarding tile %s from %s because it hasn't changed" % (section_spec, granule))
@@ -14,9 +14,9 @@
 # limitations under the License.
 
 import numpy
-from nexusproto.serialization import from_shaped_array, to_shaped_array
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import to_shaped_array, view_shaped_array
 
 
 class DeleteUnitAxis(NexusTileProcessor):
@@ -33,10 +33,10 @@ class DeleteUnitAxis(NexusTileProcessor):
 
         the_tile_data = getattr(nexus_tile.tile, the_tile_type)
 
-        var_data = from_shaped_array(the_tile_data.variable_data)
+        var_data = view_shaped_array(the_tile_data.variable_data)
 
         if numpy.size(var_data, axis) == 1:
-            the_tile_data.variable_data.CopyFrom(to_shaped_array(numpy.squeeze(var_data, axis=axis)))
+            to_shaped_array(numpy.squeeze(var_data, axis=axis), out=the_tile_data.variable_data)
         else:
             raise RuntimeError("Cannot delete axis for dimension %s because length is not 1." % self.dimension)
 
@@ -17,9 +17,9 @@ import logging
 
 from nexusproto import DataTile_pb2 as nexusproto
 import numpy
-from nexusproto.serialization import from_shaped_array
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import view_shaped_array
 
 logger = logging.getLogger('emptytilefilter')
 
@@ -34,7 +34,7 @@ class EmptyTileFilter(NexusTileProcessor):
 
         the_tile_data = getattr(nexus_tile.tile, the_tile_type)
 
-        data = from_shaped_array(the_tile_data.variable_data)
+        data = view_shaped_array(the_tile_data.variable_data)
 
         # Only supply data if there is actual values in the tile
         if data.size - numpy.count_nonzero(numpy.isnan(data)) > 0:
@@ -0,0 +1,254 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ast
+
+import numpy
+
+from sdap.processors import NexusTileProcessor, shared_thread_pool
+from sdap.processors.tileaccessor import VARIABLE_DATA, get_tile_accessor
+
+# Name of the variable data in expressions, meta data are referred to by their name
+DATA_NAME = 'data'
+
+# Number of elements evaluated at a time, so temporaries stay in cache and blocks can be spread over threads
+BLOCK_SIZE = 65536
+
+BINARY_OPERATORS = {
+    ast.Add: numpy.add,
+    ast.Sub: numpy.subtract,
+    ast.Mult: numpy.multiply,
+    ast.Div: numpy.true_divide,
+    ast.FloorDiv: numpy.floor_divide,
+    ast.Mod: numpy.remainder,
+    ast.Pow: numpy.power
+}
+
+UNARY_OPERATORS = {
+    ast.USub: numpy.negative,
+    ast.UAdd: numpy.positive
+}
+
+COMPARISON_OPERATORS = {
+    ast.Lt: numpy.less,
+    ast.LtE: numpy.less_equal,
+    ast.Gt: numpy.greater,
+    ast.GtE: numpy.greater_equal,
+    ast.Eq: numpy.equal,
+    ast.NotEq: numpy.not_equal
+}
+
+FUNCTIONS = {name: getattr(numpy, name) for name in (
+    'abs', 'arccos', 'arcsin', 'arctan', 'arctan2', 'ceil', 'cos', 'deg2rad', 'degrees', 'exp', 'floor', 'fmax',
+    'fmin', 'hypot', 'isnan', 'log', 'log10', 'maximum', 'minimum', 'rad2deg', 'radians', 'sin', 'sqrt', 'tan',
+    'where')}
+
+CONSTANTS = {
+    'pi': numpy.pi,
+    'e': numpy.e,
+    'nan': numpy.nan
+}
+
+
+class ExpressionException(Exception):
+    pass
+
+
+# Ufuncs whose result isn't of the type of their operands, never evaluated in place
+BOOLEAN_UFUNCS = set(COMPARISON_OPERATORS.values()) | {numpy.isnan}
+
+
+def apply_ufunc(ufunc, operands, owned):
+    """
+    Apply ufunc, writing the result into the first operand that is a floating point temporary of the type of the
+    result instead of allocating a new array.
+
+    :return: (result, True) since the result is always a temporary
+    """
+    if ufunc not in BOOLEAN_UFUNCS:
+        result_dtype = numpy.result_type(*operands)
+        if numpy.issubdtype(result_dtype, numpy.inexact):
+            for operand, is_owned in zip(operands, owned):
+                if is_owned and isinstance(operand, numpy.ndarray) and operand.dtype == result_dtype:
+                    return ufunc(*operands, out=operand), True
+
+    return ufunc(*operands), True
+
+
+def compile_node(node, names):
+    """
+    Turn a node of the syntax tree of an expression into a function of the input arrays returning (value, owned), where
+    owned tells whether value is a temporary that may be overwritten.
+    """
+    if isinstance(node, ast.Expression):
+        return compile_node(node.body, names)
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = node.value
+        return lambda inputs: (value, False)
+
+    if isinstance(node, ast.Name):
+        if node.id in CONSTANTS:
+            value = CONSTANTS[node.id]
+            return lambda inputs: (value, False)
+        if node.id not in names:
+            raise ExpressionException("Unknown name %s, expected one of %s" % (node.id, ', '.join(sorted(names))))
+        name = node.id
+        names[name] = True
+        return lambda inputs: (inputs[name], False)
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        return compile_ufunc(BINARY_OPERATORS[type(node.op)], [node.left, node.right], names)
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        return compile_ufunc(UNARY_OPERATORS[type(node.op)], [node.operand], names)
+
+    if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in COMPARISON_OPERATORS:
+        return compile_ufunc(COMPARISON_OPERATORS[type(node.ops[0])], [node.left, node.comparators[0]], names)
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+            and not node.keywords:
+        function = FUNCTIONS[node.func.id]
+        if isinstance(function, numpy.ufunc):
+            return compile_ufunc(function, node.args, names)
+
+        arguments = [compile_node(argument, names) for argument in node.args]
+        return lambda inputs: (function(*[argument(inputs)[0] for argument in arguments]), True)
+
+    raise ExpressionException("Unsupported expression %s" % ast.dump(node))
+
+
+def compile_ufunc(ufunc, argument_nodes, names):
+    if len(argument_nodes) != ufunc.nin:
+        raise ExpressionException("%s takes %d arguments, got %d" % (ufunc.__name__, ufunc.nin, len(argument_nodes)))
+
+    arguments = [compile_node(argument, names) for argument in argument_nodes]
+
+    def evaluate(inputs):
+        operands, owned = zip(*[argument(inputs) for argument in arguments])
+        return apply_ufunc(ufunc, operands, owned)
+
+    return evaluate
+
+
+class CompiledExpression(object):
+    """
+    An arithmetic expression over named arrays, parsed and checked once and then evaluated blockwise with numpy ufuncs.
+    Temporaries are reused in place, so evaluating a + b * c allocates a single block-sized temporary.
+    """
+
+    def __init__(self, expression, names):
+        """
+        :param expression: The expression, e.g. sqrt(u * u + v * v)
+        :param names: Names the expression may refer to
+        """
+        self.expression = expression
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ExpressionException("Invalid expression %s: %s" % (expression, e))
+
+        used = {name: False for name in names}
+        self._evaluate = compile_node(tree, used)
+        # Names the expression refers to, in the order they were given
+        self.names = [name for name in names if used[name]]
+
+    def evaluate_block(self, inputs, out):
+        with numpy.errstate(all='ignore'):
+            result, _ = self._evaluate(inputs)
+        numpy.copyto(out, result, casting='unsafe')
+
+    def evaluate(self, inputs, shape, pool=None, block_size=BLOCK_SIZE):
+        """
+        :param inputs: Array of every name used by the expression, all of them shaped like shape
+        :param shape: Shape of the result
+        :param pool: Evaluate blocks in parallel on this executor
+        :return: The result, a new array
+        """
+        inputs = {name: numpy.ascontiguousarray(inputs[name]).reshape(-1) for name in self.names}
+        for name, values in inputs.items():
+            if values.size != numpy.prod(shape, dtype=numpy.int64):
+                raise ExpressionException("%s doesn't have shape %s" % (name, shape))
+
+        # The dtype of the result is found by evaluating the expression on empty inputs
+        with numpy.errstate(all='ignore'):
+            dtype = numpy.result_type(self._evaluate({name: values[:0] for name, values in inputs.items()})[0])
+
+        out = numpy.empty(shape, dtype=dtype)
+        flat_out = out.reshape(-1)
+
+        def evaluate_range(start):
+            stop = start + block_size
+            self.evaluate_block({name: values[start:stop] for name, values in inputs.items()}, flat_out[start:stop])
+
+        starts = range(0, flat_out.size, block_size)
+        if pool is not None and len(starts) > 1:
+            for _ in pool.map(evaluate_range, starts):
+                pass
+        else:
+            for start in starts:
+                evaluate_range(start)
+
+        return out
+
+
+class Expression(NexusTileProcessor):
+    """
+    Evaluate an expression over the variable data (named data) and the meta data of a tile (named by their names),
+    e.g. sqrt(u * u + v * v), and store the result as the variable data or as a meta data.
+    """
+
+    def __init__(self, expression, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Meta data the expression may refer to. Either a list or a comma separated string; any identifier but data is
+        # taken as a meta data name if not given
+        meta = self.environ['META']
+        if meta is None:
+            names = {node.id for node in ast.walk(ast.parse(expression.strip(), mode='eval'))
+                     if isinstance(node, ast.Name)} - set(CONSTANTS) - set(FUNCTIONS)
+            meta = sorted(names - {DATA_NAME})
+        elif isinstance(meta, str):
+            meta = meta.split(',')
+        self.meta = list(meta)
+
+        self.expression = CompiledExpression(expression, [DATA_NAME] + self.meta)
+        # variable_data or the name of the meta data the result is stored in, replacing it if it exists
+        self.output = self.environ['OUTPUT'] or VARIABLE_DATA
+        self.output_dtype = numpy.dtype(self.environ['OUTPUT_DTYPE']) \
+            if self.environ['OUTPUT_DTYPE'] is not None else None
+        # Evaluate large tiles on the process-wide thread pool. This many threads only if this is the first processor
+        # to use the pool, it keeps the size it was created with (see shared_thread_pool)
+        threads = int(self.environ['THREADS']) if self.environ['THREADS'] is not None else None
+        self.pool = shared_thread_pool(threads) if threads is not None and threads > 1 else None
+
+    def process_nexus_tile(self, nexus_tile):
+        tile = get_tile_accessor(nexus_tile)
+
+        data = tile.array(VARIABLE_DATA)
+
+        inputs = {DATA_NAME: data}
+        for name in self.expression.names:
+            if name == DATA_NAME:
+                continue
+            if name not in tile:
+                raise ExpressionException("Tile has no meta data %s" % name)
+            inputs[name] = tile.array(name)
+
+        result = self.expression.evaluate(inputs, data.shape, pool=self.pool)
+
+        tile.set_array(self.output, result, dtype=self.output_dtype)
+
+        yield nexus_tile
@@ -13,9 +13,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import nexusproto
-from nexusproto.serialization import from_shaped_array
-
 import datetime
 import time
 import logging
@@ -23,6 +20,8 @@ from netCDF4 import Dataset, num2date
 from pytz import timezone
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.granuleindex import get_granule_index
+from sdap.processors.serialization import from_shaped_array
 
 EPOCH = timezone('UTC').localize(datetime.datetime(1970, 1, 1))
 
@@ -44,23 +43,27 @@ class ExtractTimestampProcessor(NexusTileProcessor):
 
         self.timestamp_name = timestamp_name
         self.timestamp_pattern = timestamp_pattern
+        self.granule_index = get_granule_index(self.environ['GRANULE_INDEX']) \
+            if self.environ['GRANULE_INDEX'] is not None else None
 
     def process_nexus_tile(self, nexus_tile):
-        output_tile = nexusproto.DataTile_pb2.NexusTile()
-        output_tile.CopyFrom(nexus_tile)
-
-        file_path = output_tile.summary.granule
+        file_path = nexus_tile.summary.granule
         file_path = file_path[len('file:'):] if file_path.startswith('file:') else file_path
 
         tile_type = nexus_tile.tile.WhichOneof("tile_type")
 
-        with Dataset(file_path) as ds:
-            timestamp = getattr(ds,self.timestamp_name)
-            seconds = to_seconds_from_epoch(timestamp, self.timestamp_pattern)
+        if self.granule_index is not None:
+            # The global attributes are in the granule index, no need to open the granule
+            timestamp = self.granule_index.get(file_path).attrs[self.timestamp_name]
+        else:
+            with Dataset(file_path) as ds:
+                timestamp = getattr(ds, self.timestamp_name)
+
+        seconds = to_seconds_from_epoch(timestamp, self.timestamp_pattern)
 
-            if tile_type == "grid_tile":
-                nexus_tile.tile.grid_tile.time = seconds
-            else:
-                raise BadTimestampExtractionException("Unsupported tile type: {}".format(tile_type))
+        if tile_type == "grid_tile":
+            nexus_tile.tile.grid_tile.time = seconds
+        else:
+            raise BadTimestampExtractionException("Unsupported tile type: {}".format(tile_type))
 
         yield nexus_tile
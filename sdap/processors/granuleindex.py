@@ -0,0 +1,229 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from os import path
+from threading import Lock
+
+import numpy
+
+from sdap.processors.tilereadingprocessor import open_granule, to_seconds_from_epoch
+
+COORDINATE_STANDARD_NAMES = ('latitude', 'longitude', 'time')
+COORDINATE_UNITS = ('degrees_north', 'degrees_east')
+
+
+def to_json_value(value):
+    if isinstance(value, (numpy.ndarray, numpy.generic)):
+        return value.tolist()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def is_coordinate(ds, name):
+    variable = ds[name]
+    return name in ds.coords \
+        or variable.attrs.get('standard_name') in COORDINATE_STANDARD_NAMES \
+        or variable.attrs.get('units') in COORDINATE_UNITS
+
+
+class GranuleVariable(object):
+    """
+    Description of one variable of a granule. Exposes dims and attrs like an xarray variable so it can be used in place
+    of one when only metadata is needed.
+    """
+
+    def __init__(self, dims, shape, dtype, chunks=None, attrs=None, minimum=None, maximum=None, time_min=None,
+                 time_max=None):
+        self.dims = tuple(dims)
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.chunks = tuple(chunks) if chunks is not None else None
+        self.attrs = attrs or {}
+        # Only filled for coordinates
+        self.min = minimum
+        self.max = maximum
+        # Only filled for coordinates with CF time units, in seconds since the epoch
+        self.time_min = time_min
+        self.time_max = time_max
+
+    def to_dict(self):
+        return {
+            'dims': list(self.dims),
+            'shape': list(self.shape),
+            'dtype': self.dtype,
+            'chunks': list(self.chunks) if self.chunks is not None else None,
+            'attrs': self.attrs,
+            'minimum': self.min,
+            'maximum': self.max,
+            'time_min': self.time_min,
+            'time_max': self.time_max
+        }
+
+
+class GranuleInfo(object):
+    """
+    Metadata of a granule: dimension sizes, variables and global attributes. Supports ``info[variable].dims``,
+    ``info[variable].attrs`` and ``info.attrs`` so it can stand in for an opened xarray Dataset.
+    """
+
+    def __init__(self, dims, variables, attrs):
+        self.dims = dims
+        self.variables = variables
+        self.attrs = attrs
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def __contains__(self, name):
+        return name in self.variables
+
+    def to_json(self):
+        return json.dumps({
+            'dims': self.dims,
+            'variables': {name: variable.to_dict() for name, variable in self.variables.items()},
+            'attrs': self.attrs
+        })
+
+    @staticmethod
+    def from_json(info_json):
+        info = json.loads(info_json)
+        return GranuleInfo(info['dims'],
+                           {name: GranuleVariable(**variable) for name, variable in info['variables'].items()},
+                           info['attrs'])
+
+
+def describe_granule(file_path):
+    """
+    Open a granule and collect its dimension sizes, variable dimensions, chunking and attributes, the min/max of its
+    coordinates and the time range of its time coordinates.
+
+    :param file_path: Path to a NetCDF/HDF5 file or a Zarr directory store
+    :return: GranuleInfo describing the granule
+    """
+    with open_granule(file_path) as ds:
+        variables = {}
+        for name, variable in ds.variables.items():
+            chunks = variable.encoding.get('chunksizes', variable.encoding.get('chunks'))
+            attrs = {key: to_json_value(value) for key, value in variable.attrs.items()}
+            description = GranuleVariable(variable.dims, variable.shape, str(variable.dtype), chunks, attrs)
+
+            if is_coordinate(ds, name) and variable.size > 0 and numpy.issubdtype(variable.dtype, numpy.number):
+                values = variable.values
+                description.min = to_json_value(numpy.nanmin(values))
+                description.max = to_json_value(numpy.nanmax(values))
+
+                units = attrs.get('units')
+                if isinstance(units, str) and ' since ' in units:
+                    try:
+                        description.time_min = to_seconds_from_epoch(description.min, timeunits=units)
+                        description.time_max = to_seconds_from_epoch(description.max, timeunits=units)
+                    except ValueError:
+                        pass
+
+            variables[str(name)] = description
+
+        return GranuleInfo({str(name): size for name, size in ds.dims.items()}, variables,
+                           {key: to_json_value(value) for key, value in ds.attrs.items()})
+
+
+def granule_version(file_path):
+    """
+    Identify the current version of a granule. A file is identified by its modification time and size. Writing a
+    chunk to a Zarr directory store does not change the mtime of the directory or of its metadata files, so a store is
+    identified by a hash of the name, size and modification time of every file in it.
+
+    :param file_path: Path to a NetCDF/HDF5 file or a Zarr directory store
+    :return: String that changes whenever the granule is rewritten
+    """
+    if not path.isdir(file_path):
+        stat = os.stat(file_path)
+        return "%d:%d" % (stat.st_mtime_ns, stat.st_size)
+
+    digest = hashlib.sha1()
+    for directory, directories, files in os.walk(file_path):
+        directories.sort()
+        for name in sorted(files):
+            stat = os.stat(path.join(directory, name))
+            digest.update(("%s:%d:%d\n" % (path.relpath(path.join(directory, name), file_path),
+                                            stat.st_mtime_ns, stat.st_size)).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class GranuleIndex(object):
+    """
+    Local SQLite store of GranuleInfo keyed by granule path. A granule is described the first time it is requested and
+    again only when its version (see granule_version) changes, so processors can look up its metadata without opening
+    it.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._cache = {}
+        self._lock = Lock()
+
+        with closing(sqlite3.connect(self.index_path)) as connection, connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS granules "
+                               "(path TEXT PRIMARY KEY, version TEXT NOT NULL, info TEXT NOT NULL)")
+
+    def get(self, file_path):
+        """
+        :param file_path: Path to a NetCDF/HDF5 file or a Zarr directory store
+        :return: GranuleInfo for the current version of the granule
+        """
+        file_path = file_path[len('file:'):] if file_path.startswith('file:') else file_path
+        version = granule_version(file_path)
+
+        with self._lock:
+            cached = self._cache.get(file_path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            with closing(sqlite3.connect(self.index_path)) as connection, connection:
+                row = connection.execute("SELECT version, info FROM granules WHERE path = ?", (file_path,)).fetchone()
+
+                if row is not None and row[0] == version:
+                    info = GranuleInfo.from_json(row[1])
+                else:
+                    info = describe_granule(file_path)
+                    connection.execute("INSERT OR REPLACE INTO granules (path, version, info) VALUES (?, ?, ?)",
+                                       (file_path, version, info.to_json()))
+
+            self._cache[file_path] = (version, info)
+            return info
+
+
+_granule_indexes = {}
+_granule_indexes_lock = Lock()
+
+
+def get_granule_index(index_path):
+    """
+    Return the GranuleIndex stored at index_path, shared by every processor in this process so its in-memory cache
+    outlives the processor chains that use it.
+    """
+    with _granule_indexes_lock:
+        if index_path not in _granule_indexes:
+            _granule_indexes[index_path] = GranuleIndex(index_path)
+        return _granule_indexes[index_path]
@@ -14,9 +14,10 @@
 # limitations under the License.
 
 
-from nexusproto.serialization import from_shaped_array, to_shaped_array
+import numpy
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import to_shaped_array, view_shaped_array, writable
 
 
 class KelvinToCelsius(NexusTileProcessor):
@@ -25,8 +26,13 @@ class KelvinToCelsius(NexusTileProcessor):
 
         the_tile_data = getattr(nexus_tile.tile, the_tile_type)
 
-        var_data = from_shaped_array(the_tile_data.variable_data) - 273.15
+        var_data = view_shaped_array(the_tile_data.variable_data)
+        if numpy.issubdtype(var_data.dtype, numpy.floating):
+            var_data = writable(var_data)
+            numpy.subtract(var_data, 273.15, out=var_data)
+        else:
+            var_data = var_data - 273.15
 
-        the_tile_data.variable_data.CopyFrom(to_shaped_array(var_data))
+        to_shaped_array(var_data, out=the_tile_data.variable_data)
 
         yield nexus_tile
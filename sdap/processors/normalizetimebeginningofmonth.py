@@ -13,29 +13,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import datetime
 
-from pytz import timezone
+import numpy
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import to_shaped_array, view_shaped_array
 
-EPOCH = timezone('UTC').localize(datetime.datetime(1970, 1, 1))
 
+def beginning_of_month(seconds):
+    """
+    Move times to 00:00:00 UTC on the first day of their month.
 
-class NormalizeTimeBeginningOfMonth(NexusTileProcessor):
-    def process_nexus_tile(self, nexus_tile):
-        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+    :param seconds: Seconds since the epoch, an int or an array of ints or floats. NaN times are left as they are
+    :return: Seconds since the epoch of the beginning of the month of every time, of the type of seconds
+    """
+    times = numpy.asarray(seconds)
+    valid = numpy.isfinite(times) if numpy.issubdtype(times.dtype, numpy.floating) else True
 
-        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+    # Converting to a month resolution floors to the beginning of the month, also before the epoch
+    months = numpy.floor(times, where=valid, out=numpy.zeros(times.shape)).astype('datetime64[s]').astype(
+        'datetime64[M]')
+    normalized = months.astype('datetime64[s]').astype(numpy.int64)
 
-        time = the_tile_data.time
+    if numpy.ndim(seconds) == 0:
+        return type(seconds)(normalized.item()) if numpy.all(valid) else seconds
+    return numpy.where(valid, normalized, times).astype(times.dtype, copy=False)
 
-        timeObj = datetime.datetime.utcfromtimestamp(time)
 
-        timeObj = timeObj.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+class NormalizeTimeBeginningOfMonth(NexusTileProcessor):
+    def process_nexus_tile(self, nexus_tile):
+        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
 
-        timeObj = timezone('UTC').localize(timeObj)
+        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
 
-        the_tile_data.time = int((timeObj - EPOCH).total_seconds())
+        if the_tile_type == 'grid_tile':
+            the_tile_data.time = int(beginning_of_month(the_tile_data.time))
+        elif the_tile_data.HasField('time'):
+            # Swath and time series tiles have a time for every value
+            to_shaped_array(beginning_of_month(view_shaped_array(the_tile_data.time)), out=the_tile_data.time)
 
         yield nexus_tile
@@ -17,6 +17,8 @@ import inspect
 import re
 
 import sdap.processors
+from sdap.processors.emptytilefilter import EmptyTileFilter
+from sdap.processors.tilereadingprocessor import TileReadingProcessor
 
 
 class BadChainException(Exception):
@@ -88,6 +90,23 @@ class ProcessorChain(sdap.processors.Processor):
 
             self.processors.append(processor_instance)
 
+        self.push_down_empty_tile_filters()
+
+    def push_down_empty_tile_filters(self):
+        """
+        Let a reader directly followed by an EmptyTileFilter skip empty tiles itself, before it reads their coordinates
+        and meta data and serializes them, and drop the filter.
+        """
+        processors = []
+        for processor in self.processors:
+            if isinstance(processor, EmptyTileFilter) and processors \
+                    and isinstance(processors[-1], TileReadingProcessor):
+                processors[-1].skip_empty = True
+            else:
+                processors.append(processor)
+
+        self.processors = processors
+
     def process(self, input_data):
 
         def recursive_processing_chain(gen_index, message):
@@ -101,3 +120,16 @@ class ProcessorChain(sdap.processors.Processor):
                         yield result
 
         return recursive_processing_chain(-1, input_data)
+
+    def write(self, input_data, writer):
+        """
+        Run the chain and hand every resulting tile to writer, e.g. an ArrowTileWriter.
+
+        :return: Number of tiles written
+        """
+        count = 0
+        for result in self.process(input_data):
+            writer.write(result)
+            count += 1
+
+        return count
@@ -14,19 +14,82 @@
 # limitations under the License.
 
 
+import hashlib
 import os
+import tempfile
 from datetime import datetime
+from threading import Lock
 
 import numpy as np
 from netCDF4 import Dataset
 from pytz import timezone
-from scipy import interpolate
+from scipy.spatial import cKDTree
 
 from sdap.processors import Processor
 
 UTC = timezone('UTC')
 ISO_8601 = '%Y-%m-%dT%H:%M:%S%z'
 
+# Nearest neighbour indexes by grid hash, shared by every Regrid1x1 in this process
+_nearest_indexes = {}
+_nearest_indexes_lock = Lock()
+
+
+def grid_hash(in_lon, in_lat, out_lon, out_lat):
+    """
+    :return: Hex digest identifying a source and a target grid
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for axis in (in_lon, in_lat, out_lon, out_lat):
+        axis = np.ascontiguousarray(axis, dtype=np.float64)
+        digest.update(np.int64(axis.size).tobytes())
+        digest.update(axis.tobytes())
+    return digest.hexdigest()
+
+
+def nearest_index(in_lon, in_lat, out_lon, out_lat):
+    """
+    Map every point of the target grid to the nearest point of the source grid, the way
+    scipy.interpolate.griddata(..., method='nearest') does.
+
+    :return: Index into the raveled latitude x longitude source grid of every point of the latitude x longitude target
+             grid
+    """
+    x_mesh, y_mesh = np.meshgrid(in_lon, in_lat, copy=False)
+    x1_mesh, y1_mesh = np.meshgrid(out_lon, out_lat, copy=False)
+
+    tree = cKDTree(np.array([x_mesh.ravel(), y_mesh.ravel()]).T)
+    _, index = tree.query(np.array([x1_mesh.ravel(), y1_mesh.ravel()]).T)
+
+    return index.reshape(x1_mesh.shape)
+
+
+def get_nearest_index(in_lon, in_lat, out_lon, out_lat, cache_dir=None):
+    """
+    Return the nearest_index of a pair of grids, computed once per process and, if cache_dir is given, once for all
+    processes sharing cache_dir.
+    """
+    key = grid_hash(in_lon, in_lat, out_lon, out_lat)
+
+    with _nearest_indexes_lock:
+        if key in _nearest_indexes:
+            return _nearest_indexes[key]
+
+        cache_path = os.path.join(cache_dir, 'nearest-%s.npy' % key) if cache_dir is not None else None
+        if cache_path is not None and os.path.exists(cache_path):
+            index = np.load(cache_path)
+        else:
+            index = nearest_index(in_lon, in_lat, out_lon, out_lat)
+            if cache_path is not None:
+                # Write to a temporary file first so other processes never load a partial index
+                fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npy')
+                with os.fdopen(fd, 'wb') as temp_file:
+                    np.save(temp_file, index)
+                os.replace(temp_path, cache_path)
+
+        _nearest_indexes[key] = index
+        return index
+
 
 class Regrid1x1(Processor):
 
@@ -39,6 +102,8 @@ class Regrid1x1(Processor):
         self.time_var_name = time_var_name
 
         self.filename_prefix = self.environ.get("FILENAME_PREFIX", '1x1regrid-')
+        # Directory where the nearest neighbour index of every pair of grids is kept between runs
+        self.index_cache_dir = self.environ['INDEX_CACHE_DIR']
 
         vvr = self.environ['VARIABLE_VALID_RANGE']
         if vvr:
@@ -88,6 +153,8 @@ class Regrid1x1(Processor):
                      if
                      str(attrname) != 'bounds'})
 
+                index = get_nearest_index(in_lon[:], in_lat[:], lon1deg, lat1deg, cache_dir=self.index_cache_dir)
+
                 for variable_name in self.variables_to_regrid.split(','):
 
                     # If longitude is the first dimension, we need to transpose the dimensions
@@ -106,33 +173,23 @@ class Regrid1x1(Processor):
                             np.array([self.variable_valid_range[variable_name][1]],
                                      dtype=inputds[variable_name].dtype).item()]
 
-                    for ti in range(0, len(out_time)):
-                        in_data = inputds[variable_name][ti, :, :]
-                        if transpose_dimensions:
-                            in_data = in_data.T
-
-                        # Produces erroneous values on the edges of data
-                        # interp_func = interpolate.interp2d(in_lon[:], in_lat[:], in_data[:], fill_value=float('NaN'))
-
-                        x_mesh, y_mesh = np.meshgrid(in_lon[:], in_lat[:], copy=False)
-
-                        # Does not work for large datasets (n > 5000)
-                        # interp_func = interpolate.Rbf(x_mesh, y_mesh, in_data[:], function='linear', smooth=0)
+                    # Every time step of every variable is regridded with one gather through the same index
+                    in_data = inputds[variable_name][:]
+                    if transpose_dimensions:
+                        in_data = in_data.transpose(0, 2, 1)
 
-                        x1_mesh, y1_mesh = np.meshgrid(lon1deg, lat1deg, copy=False)
-                        out_data = interpolate.griddata(np.array([x_mesh.ravel(), y_mesh.ravel()]).T, in_data.ravel(),
-                                                        (x1_mesh, y1_mesh), method='nearest')
+                    out_data = in_data.reshape(in_data.shape[0], -1)[:, index]
 
-                        if transpose_dimensions:
-                            out_data = out_data.T
+                    if transpose_dimensions:
+                        out_data = out_data.transpose(0, 2, 1)
 
-                        outputds[variable_name][ti, :] = out_data[np.newaxis, :]
+                    outputds[variable_name][:] = out_data
 
                 global_atts = {
-                    'geospatial_lon_min': np.float(np.min(lon1deg)),
-                    'geospatial_lon_max': np.float(np.max(lon1deg)),
-                    'geospatial_lat_min': np.float(np.min(lat1deg)),
-                    'geospatial_lat_max': np.float(np.max(lat1deg)),
+                    'geospatial_lon_min': float(np.min(lon1deg)),
+                    'geospatial_lon_max': float(np.max(lon1deg)),
+                    'geospatial_lat_min': float(np.min(lat1deg)),
+                    'geospatial_lat_max': float(np.max(lat1deg)),
                     'Conventions': 'CF-1.6',
                     'date_created': datetime.utcnow().replace(tzinfo=UTC).strftime(ISO_8601),
                     'title': getattr(inputds, 'title', ''),
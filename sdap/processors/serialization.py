@@ -0,0 +1,295 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import zlib
+from io import BytesIO
+
+import numpy
+from numpy.lib import format as npy_format
+from nexusproto import DataTile_pb2 as nexusproto
+from nexusproto import serialization
+
+try:
+    import numcodecs
+except ImportError:
+    numcodecs = None
+
+# Compressed payloads start with this instead of the .npy magic string, followed by a flags byte, the length of the
+# codec name, the codec name and the compressed .npy bytes
+COMPRESSED_MAGIC = b'\x93SDAPZ'
+FLAG_SHUFFLE = 0x01
+# Sparse payloads start with this, followed by the shape of the array, the validity bitmask and the valid values, each
+# as .npy bytes
+SPARSE_MAGIC = b'\x93SDAPS'
+
+CODECS = {}
+
+
+class UnknownCodecException(Exception):
+    pass
+
+
+def register_codec(name, compress, decompress):
+    """
+    Make a codec available to to_shaped_array and compress_shaped_array.
+
+    :param name: Name of the codec, stored in the header of every payload it compresses
+    :param compress: Function (data, level) -> bytes. level is None when the caller didn't ask for one
+    :param decompress: Function (data) -> bytes
+    """
+    CODECS[name] = (compress, decompress)
+
+
+register_codec('zlib',
+               lambda data, level: zlib.compress(data, level if level is not None else zlib.Z_DEFAULT_COMPRESSION),
+               zlib.decompress)
+
+if numcodecs is not None:
+    # numcodecs is installed with zarr
+    register_codec('zstd',
+                   lambda data, level: numcodecs.Zstd(level=level if level is not None else 1).encode(data),
+                   lambda data: numcodecs.Zstd().decode(data))
+    register_codec('lz4',
+                   lambda data, level: numcodecs.LZ4(acceleration=level if level is not None else 1).encode(data),
+                   lambda data: numcodecs.LZ4().decode(data))
+
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError as e:
+        raise UnknownCodecException("Unknown codec %s. Available codecs are %s" % (name, sorted(CODECS))) from e
+
+
+def read_npy_header(array_data):
+    """
+    :param array_data: Bytes of a .npy file
+    :return: (shape, fortran_order, dtype, offset of the data) or None if array_data isn't in a supported .npy format
+    """
+    if not array_data.startswith(npy_format.MAGIC_PREFIX):
+        return None
+
+    header = BytesIO(array_data)
+
+    version = npy_format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = npy_format.read_array_header_1_0(header)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = npy_format.read_array_header_2_0(header)
+    else:
+        return None
+
+    return shape, fortran_order, dtype, header.tell()
+
+
+def is_compressed(shaped_array):
+    return shaped_array.array_data[:len(COMPRESSED_MAGIC)] == COMPRESSED_MAGIC
+
+
+def is_sparse(array_data):
+    return array_data[:len(SPARSE_MAGIC)] == SPARSE_MAGIC
+
+
+def npy_payload(data_array):
+    memfile = BytesIO()
+    numpy.save(memfile, data_array)
+    return memfile.getvalue()
+
+
+def sparse_payload(data_array):
+    """
+    Encode a floating point array as a validity bitmask and its packed non-NaN values. Takes data_array.size / 8 bytes
+    plus the size of the valid values, instead of the size of the whole array.
+    """
+    valid = ~numpy.isnan(data_array).ravel()
+
+    return SPARSE_MAGIC + npy_payload(numpy.array(data_array.shape, dtype=numpy.int64)) \
+        + npy_payload(numpy.packbits(valid)) + npy_payload(data_array.ravel()[valid])
+
+
+def from_sparse_payload(array_data):
+    memfile = BytesIO(array_data)
+    memfile.seek(len(SPARSE_MAGIC))
+    shape = tuple(numpy.load(memfile))
+    packed = numpy.load(memfile)
+    values = numpy.load(memfile)
+
+    data_array = numpy.full(shape, numpy.NaN, dtype=values.dtype)
+    valid = numpy.unpackbits(packed)[:data_array.size].view(bool).reshape(shape)
+    data_array[valid] = values
+
+    return data_array
+
+
+def compress_payload(array_data, codec, level=None, shuffle=False):
+    compress, _ = get_codec(codec)
+
+    flags = 0
+    header = read_npy_header(array_data)
+    if shuffle and header is not None and not header[2].hasobject and header[2].itemsize > 1:
+        # Group the n-th byte of every element together, like blosc's shuffle filter. The bytes of floating point
+        # data compress much better that way because the exponents are close to each other
+        offset, itemsize = header[3], header[2].itemsize
+        data = numpy.frombuffer(array_data, dtype=numpy.uint8, offset=offset)
+        array_data = array_data[:offset] + data.reshape(-1, itemsize).T.tobytes()
+        flags |= FLAG_SHUFFLE
+
+    name = codec.encode('ascii')
+    return COMPRESSED_MAGIC + bytes((flags, len(name))) + name + compress(array_data, level)
+
+
+def decompress_payload(array_data):
+    flags = array_data[len(COMPRESSED_MAGIC)]
+    name_length = array_data[len(COMPRESSED_MAGIC) + 1]
+    name_start = len(COMPRESSED_MAGIC) + 2
+    _, decompress = get_codec(array_data[name_start:name_start + name_length].decode('ascii'))
+
+    array_data = decompress(array_data[name_start + name_length:])
+
+    if flags & FLAG_SHUFFLE:
+        _, _, dtype, offset = read_npy_header(array_data)
+        data = numpy.frombuffer(array_data, dtype=numpy.uint8, offset=offset)
+        unshuffled = bytearray(len(array_data))
+        unshuffled[:offset] = array_data[:offset]
+        numpy.frombuffer(unshuffled, dtype=numpy.uint8, offset=offset).reshape(-1, dtype.itemsize)[...] = \
+            data.reshape(dtype.itemsize, -1).T
+        array_data = unshuffled
+
+    return array_data
+
+
+def npy_bytes(shaped_array):
+    """
+    :return: The .npy or sparse bytes of shaped_array, decompressed if needed
+    """
+    if is_compressed(shaped_array):
+        return decompress_payload(shaped_array.array_data)
+    return shaped_array.array_data
+
+
+def compress_shaped_array(shaped_array, codec, level=None, shuffle=False):
+    """
+    Compress the payload of a ShapedArray in place. Does nothing if it is empty or already compressed.
+
+    :param shaped_array: The ShapedArray to compress
+    :param codec: Name of a registered codec, e.g. 'zlib', 'zstd' or 'lz4'
+    :param level: Optional compression level passed to the codec
+    :param shuffle: Shuffle the bytes of the elements before compressing them
+    """
+    if shaped_array.array_data and not is_compressed(shaped_array):
+        shaped_array.array_data = compress_payload(shaped_array.array_data, codec, level=level, shuffle=shuffle)
+
+
+def to_shaped_array(data_array, dtype=None, codec=None, level=None, shuffle=False, sparse_threshold=None, out=None):
+    """
+    Serialize a numpy array into a ShapedArray, optionally casting and compressing it.
+
+    :param data_array: The array to serialize
+    :param dtype: Optional dtype the array is cast to before being serialized, e.g. 'float32'
+    :param codec: Optional name of a registered codec the payload is compressed with
+    :param level: Optional compression level passed to the codec
+    :param shuffle: Shuffle the bytes of the elements before compressing them
+    :param sparse_threshold: Optional fraction of NaN (e.g. 0.8) from which a floating point array is stored as a
+                             validity bitmask and its valid values instead of as a dense array
+    :param out: Optional ShapedArray to fill, e.g. a field of the tile being built, so the payload doesn't have to be
+                copied into it afterwards
+    :return: The ShapedArray
+    """
+    data_array = numpy.asarray(data_array)
+    if dtype is not None:
+        data_array = data_array.astype(dtype, copy=False)
+
+    shaped_array = out if out is not None else nexusproto.ShapedArray()
+    del shaped_array.shape[:]
+    shaped_array.shape.extend(data_array.shape)
+    shaped_array.dtype = str(data_array.dtype)
+
+    if sparse_threshold is not None and numpy.issubdtype(data_array.dtype, numpy.floating) and data_array.size > 0 \
+            and numpy.count_nonzero(numpy.isnan(data_array)) >= sparse_threshold * data_array.size:
+        shaped_array.array_data = sparse_payload(data_array)
+    else:
+        shaped_array.array_data = npy_payload(data_array)
+
+    if codec is not None:
+        compress_shaped_array(shaped_array, codec, level=level, shuffle=shuffle)
+
+    return shaped_array
+
+
+def to_metadata(name, data_array, dtype=None, sparse_threshold=None, out=None):
+    """
+    Serialize a numpy array into a MetaData named name. See to_shaped_array.
+    """
+    metadata = out if out is not None else nexusproto.MetaData()
+    metadata.name = name
+    to_shaped_array(data_array, dtype=dtype, sparse_threshold=sparse_threshold, out=metadata.meta_data)
+
+    return metadata
+
+
+def from_shaped_array(shaped_array):
+    """
+    Deserialize a ShapedArray into a new numpy array, decompressing and densifying it if needed.
+    """
+    if is_compressed(shaped_array) or is_sparse(shaped_array.array_data):
+        array_data = npy_bytes(shaped_array)
+        if is_sparse(array_data):
+            return from_sparse_payload(array_data)
+        return numpy.load(BytesIO(array_data))
+
+    return serialization.from_shaped_array(shaped_array)
+
+
+def view_shaped_array(shaped_array):
+    """
+    Decode a ShapedArray without copying its data: the returned array is a read-only view over the serialized bytes
+    (over the decompressed bytes for compressed payloads). Sparse payloads are densified into a new array.
+
+    Processors that only read the data should use this instead of from_shaped_array. Processors that modify it
+    should pass the view through writable() first.
+
+    :param shaped_array: The ShapedArray to decode
+    :return: A read-only numpy array
+    """
+    array_data = npy_bytes(shaped_array)
+    if is_sparse(array_data):
+        data_array = from_sparse_payload(array_data)
+        data_array.flags.writeable = False
+        return data_array
+
+    header = read_npy_header(array_data)
+    if header is None or header[2].hasobject:
+        # Object arrays are pickled, they can't be viewed
+        return numpy.load(BytesIO(array_data))
+
+    shape, fortran_order, dtype, offset = header
+    count = int(numpy.prod(shape, dtype=numpy.int64))
+    data_array = numpy.frombuffer(array_data, dtype=dtype, count=count, offset=offset)
+    data_array.flags.writeable = False
+
+    return data_array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def writable(data_array):
+    """
+    Return data_array if it can be modified in place, otherwise a writable copy of it. Arrays owning their memory, like
+    the densified sparse payloads of view_shaped_array, are made writable instead of copied.
+    """
+    if data_array.flags.writeable:
+        return data_array
+    if data_array.base is None:
+        data_array.flags.writeable = True
+        return data_array
+    return data_array.copy()
@@ -0,0 +1,275 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+from collections import Counter
+
+import numpy
+
+# Names of the global attributes of the TileSummary the sketch is stored in
+SKETCH_PREFIX = 'sketch.'
+
+
+class SketchMismatchException(Exception):
+    pass
+
+
+class QuantileSketch(object):
+    """
+    Quantile sketch with a bounded relative error (DDSketch): values are counted in logarithmic buckets, so any
+    quantile is returned within relative_accuracy of the true value and two sketches merge exactly by adding their
+    bucket counts.
+    """
+
+    # Values closer to zero than this are counted as zero
+    MIN_VALUE = 1e-12
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = float(relative_accuracy)
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zero = 0
+
+    @property
+    def count(self):
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zero
+
+    def _add(self, store, magnitudes):
+        if magnitudes.size:
+            buckets, counts = numpy.unique(numpy.ceil(numpy.log(magnitudes) / self.log_gamma).astype(numpy.int64),
+                                           return_counts=True)
+            store.update(dict(zip(buckets.tolist(), counts.tolist())))
+
+    def update(self, values):
+        """
+        :param values: 1-D array of values without NaN
+        """
+        self._add(self.positive, values[values > self.MIN_VALUE])
+        self._add(self.negative, -values[values < -self.MIN_VALUE])
+        self.zero += int(numpy.count_nonzero(numpy.abs(values) <= self.MIN_VALUE))
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise SketchMismatchException("Cannot merge quantile sketches with relative accuracies %s and %s" % (
+                self.relative_accuracy, other.relative_accuracy))
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zero += other.zero
+
+    def value(self, bucket):
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantile(self, q):
+        """
+        :param q: Quantile between 0 and 1
+        :return: Estimate of the q quantile, NaN if the sketch is empty
+        """
+        count = self.count
+        if count == 0:
+            return numpy.NaN
+
+        rank = q * (count - 1)
+        seen = 0
+        for bucket in sorted(self.negative, reverse=True):
+            seen += self.negative[bucket]
+            if seen > rank:
+                return -self.value(bucket)
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self.positive):
+            seen += self.positive[bucket]
+            if seen > rank:
+                return self.value(bucket)
+        return self.value(max(self.positive))
+
+
+class TileSketch(object):
+    """
+    Mergeable summary of the values of a tile: count, sum and sum of squares (for the mean and standard deviation), an
+    optional histogram with fixed bins and an optional quantile sketch. Sketches of tiles with the same histogram bins
+    and quantile accuracy can be merged into granule or dataset statistics without reading the tiles again.
+    """
+
+    def __init__(self, histogram_bins=None, histogram_range=None, quantile_accuracy=None):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.min = numpy.NaN
+        self.max = numpy.NaN
+
+        if histogram_range is not None:
+            self.histogram_range = (float(histogram_range[0]), float(histogram_range[1]))
+            self.histogram = numpy.zeros(int(histogram_bins or 64), dtype=numpy.int64)
+        else:
+            self.histogram_range = None
+            self.histogram = None
+
+        self.quantiles = QuantileSketch(quantile_accuracy) if quantile_accuracy is not None else None
+
+    def update(self, values):
+        """
+        :param values: 1-D array of values without NaN
+        """
+        if values.size == 0:
+            return
+
+        values = values.astype(numpy.float64, copy=False)
+        self.count += values.size
+        self.sum += values.sum()
+        self.sum_squares += numpy.dot(values, values)
+        self.min = numpy.fmin(self.min, values.min())
+        self.max = numpy.fmax(self.max, values.max())
+
+        if self.histogram is not None:
+            # Values outside of the range are counted in the first and last bins
+            low, high = self.histogram_range
+            bins = ((values - low) * (len(self.histogram) / (high - low))).astype(numpy.int64)
+            numpy.clip(bins, 0, len(self.histogram) - 1, out=bins)
+            self.histogram += numpy.bincount(bins, minlength=len(self.histogram))
+
+        if self.quantiles is not None:
+            self.quantiles.update(values)
+
+    def merge(self, other):
+        if self.histogram_range != other.histogram_range or \
+                (self.histogram is not None and len(self.histogram) != len(other.histogram)):
+            raise SketchMismatchException("Cannot merge histograms with different bins")
+        if (self.quantiles is None) != (other.quantiles is None):
+            raise SketchMismatchException("Cannot merge a sketch with quantiles with one without")
+
+        self.count += other.count
+        self.sum += other.sum
+        self.sum_squares += other.sum_squares
+        self.min = numpy.fmin(self.min, other.min)
+        self.max = numpy.fmax(self.max, other.max)
+        if self.histogram is not None:
+            self.histogram += other.histogram
+        if self.quantiles is not None:
+            self.quantiles.merge(other.quantiles)
+
+        return self
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else numpy.NaN
+
+    @property
+    def std(self):
+        """
+        Population standard deviation of the values
+        """
+        if not self.count:
+            return numpy.NaN
+        return math.sqrt(max(self.sum_squares / self.count - self.mean ** 2, 0.0))
+
+    def quantile(self, q):
+        if self.quantiles is None:
+            raise ValueError("This sketch has no quantile sketch")
+        return self.quantiles.quantile(q)
+
+    def to_attributes(self):
+        """
+        :return: List of (name, list of string values) to store in the global attributes of a TileSummary
+        """
+        attributes = [
+            ('count', [str(self.count)]),
+            ('sum', [repr(float(self.sum))]),
+            ('sum_squares', [repr(float(self.sum_squares))]),
+            ('min', [repr(float(self.min))]),
+            ('max', [repr(float(self.max))])
+        ]
+        if self.histogram is not None:
+            attributes.append(('histogram_range', [repr(value) for value in self.histogram_range]))
+            attributes.append(('histogram', [str(count) for count in self.histogram.tolist()]))
+        if self.quantiles is not None:
+            attributes.append(('quantile_accuracy', [repr(self.quantiles.relative_accuracy)]))
+            attributes.append(('quantile_zero', [str(self.quantiles.zero)]))
+            attributes.append(('quantile_positive',
+                               ['%d:%d' % bucket for bucket in sorted(self.quantiles.positive.items())]))
+            attributes.append(('quantile_negative',
+                               ['%d:%d' % bucket for bucket in sorted(self.quantiles.negative.items())]))
+
+        return [(SKETCH_PREFIX + name, values) for name, values in attributes]
+
+    def add_to_summary(self, tile_summary):
+        existing = [attribute for attribute in tile_summary.global_attributes
+                    if not attribute.name.startswith(SKETCH_PREFIX)]
+        del tile_summary.global_attributes[:]
+        tile_summary.global_attributes.extend(existing)
+
+        for name, values in self.to_attributes():
+            attribute = tile_summary.global_attributes.add()
+            attribute.name = name
+            attribute.values.extend(values)
+
+    @staticmethod
+    def from_summary(tile_summary):
+        """
+        :return: The TileSketch stored in the global attributes of tile_summary, None if there is none
+        """
+        attributes = {attribute.name[len(SKETCH_PREFIX):]: list(attribute.values)
+                      for attribute in tile_summary.global_attributes if attribute.name.startswith(SKETCH_PREFIX)}
+        if not attributes:
+            return None
+
+        def buckets(name):
+            return Counter({int(bucket): int(count) for bucket, count in
+                            (value.split(':') for value in attributes[name])})
+
+        sketch = TileSketch(
+            histogram_bins=len(attributes['histogram']) if 'histogram' in attributes else None,
+            histogram_range=attributes.get('histogram_range'),
+            quantile_accuracy=float(attributes['quantile_accuracy'][0]) if 'quantile_accuracy' in attributes else None)
+        sketch.count = int(attributes['count'][0])
+        sketch.sum = float(attributes['sum'][0])
+        sketch.sum_squares = float(attributes['sum_squares'][0])
+        sketch.min = float(attributes['min'][0])
+        sketch.max = float(attributes['max'][0])
+        if sketch.histogram is not None:
+            sketch.histogram[:] = [int(count) for count in attributes['histogram']]
+        if sketch.quantiles is not None:
+            sketch.quantiles.zero = int(attributes['quantile_zero'][0])
+            sketch.quantiles.positive = buckets('quantile_positive')
+            sketch.quantiles.negative = buckets('quantile_negative')
+
+        return sketch
+
+
+def merge_sketches(sketches):
+    """
+    Merge the sketches of many tiles, e.g. of a granule or a whole dataset.
+
+    :param sketches: Iterable of TileSketch, TileSummary or NexusTile. Tiles without a sketch are skipped
+    :return: The merged TileSketch, None if there was no sketch to merge
+    """
+    merged = None
+    for sketch in sketches:
+        if hasattr(sketch, 'summary'):
+            sketch = sketch.summary
+        if hasattr(sketch, 'global_attributes'):
+            sketch = TileSketch.from_summary(sketch)
+        if sketch is None:
+            continue
+
+        if merged is None:
+            merged = TileSketch(len(sketch.histogram) if sketch.histogram is not None else None,
+                                sketch.histogram_range,
+                                sketch.quantiles.relative_accuracy if sketch.quantiles is not None else None)
+        merged.merge(sketch)
+
+    return merged
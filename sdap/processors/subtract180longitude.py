@@ -13,12 +13,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from nexusproto.serialization import from_shaped_array, to_shaped_array
+
+import numpy
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import to_shaped_array, view_shaped_array, writable
+
+
+def wrap_shift(longitudes):
+    """
+    :param longitudes: Longitudes of a grid after wrapping, increasing but for a single drop where they wrapped
+    :return: Number of positions to roll the longitude axis left by so the longitudes are increasing
+    """
+    drops = numpy.flatnonzero(numpy.diff(longitudes) < 0)
+    return int(drops[0]) + 1 if drops.size == 1 else 0
+
+
+def roll_shaped_array(shaped_array, shift, axis):
+    to_shaped_array(numpy.roll(view_shaped_array(shaped_array), -shift, axis=axis), out=shaped_array)
 
 
 class Subtract180Longitude(NexusTileProcessor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Also roll the longitudes, data and meta data of grid tiles along the longitude axis so the longitudes stay
+        # increasing. The data is then no longer in the order of the section spec of the tile
+        self.reorder = str(self.environ['REORDER']).lower() in ('true', '1', 'yes')
+
     def process_nexus_tile(self, nexus_tile):
         """
         This method will transform longitude values in degrees_east from 0 TO 360 to -180 to 180
@@ -32,12 +54,19 @@ class Subtract180Longitude(NexusTileProcessor):
 
         the_tile_data = getattr(nexus_tile.tile, the_tile_type)
 
-        longitudes = from_shaped_array(the_tile_data.longitude)
+        longitudes = writable(view_shaped_array(the_tile_data.longitude))
 
         # Only subtract 360 if the longitude is greater than 180
         longitudes[longitudes > 180] -= 360
 
-        the_tile_data.longitude.CopyFrom(to_shaped_array(longitudes))
+        shift = wrap_shift(longitudes) if self.reorder and the_tile_type == 'grid_tile' else 0
+        if shift:
+            # Grid tiles are ordered latitude x longitude in their last two axes
+            longitudes = numpy.roll(longitudes, -shift)
+            roll_shaped_array(the_tile_data.variable_data, shift, axis=-1)
+            for metadata in the_tile_data.meta_data:
+                roll_shaped_array(metadata.meta_data, shift, axis=-1)
 
-        yield nexus_tile
+        to_shaped_array(longitudes, out=the_tile_data.longitude)
 
+        yield nexus_tile
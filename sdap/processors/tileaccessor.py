@@ -0,0 +1,161 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import local
+
+from sdap.processors.serialization import to_metadata, to_shaped_array, view_shaped_array
+
+# Name under which the variable data of a tile is accessed
+VARIABLE_DATA = 'variable_data'
+
+_last_accessor = local()
+
+
+class TileAccessor(object):
+    """
+    Access to the variable data and the meta data of a tile by name. Meta data are indexed by name once and arrays are
+    decoded only when asked for, then kept until their ShapedArray changes, so processors reading the same arrays don't
+    each scan and decode them.
+
+    Arrays are read-only views (see view_shaped_array), use set_array to change them.
+    """
+
+    def __init__(self, nexus_tile):
+        self.nexus_tile = nexus_tile
+        self._index = {}
+        self._indexed_count = None
+        # Name to (payload the array was decoded from, decoded array)
+        self._arrays = {}
+
+    @property
+    def tile_type(self):
+        return self.nexus_tile.tile.WhichOneof("tile_type")
+
+    @property
+    def tile_data(self):
+        return getattr(self.nexus_tile.tile, self.tile_type)
+
+    def _build_index(self):
+        meta_data = self.tile_data.meta_data
+        self._index = {}
+        for position, meta in enumerate(meta_data):
+            # Like a linear scan, the first of several meta data with the same name wins
+            self._index.setdefault(meta.name, position)
+        self._indexed_count = len(meta_data)
+
+    def metadata(self, name):
+        """
+        :return: The MetaData called name, or None if the tile has none
+        """
+        meta_data = self.tile_data.meta_data
+        if self._indexed_count != len(meta_data):
+            self._build_index()
+
+        position = self._index.get(name)
+        if position is None or meta_data[position].name != name:
+            # Meta data were changed without going through this accessor
+            self._build_index()
+            position = self._index.get(name)
+
+        return meta_data[position] if position is not None else None
+
+    def __contains__(self, name):
+        return name == VARIABLE_DATA or self.metadata(name) is not None
+
+    def names(self):
+        """
+        :return: Names of the meta data of the tile, in order
+        """
+        return [meta.name for meta in self.tile_data.meta_data]
+
+    def shaped_array(self, name):
+        """
+        :return: The ShapedArray of the variable data if name is VARIABLE_DATA, otherwise of the meta data called name
+        """
+        if name == VARIABLE_DATA:
+            return self.tile_data.variable_data
+
+        meta = self.metadata(name)
+        if meta is None:
+            raise KeyError("Tile has no meta data %s" % name)
+        return meta.meta_data
+
+    def array(self, name):
+        """
+        :return: The decoded array of the variable data if name is VARIABLE_DATA, otherwise of the meta data called name
+        """
+        shaped_array = self.shaped_array(name)
+        array_data = shaped_array.array_data
+
+        cached = self._arrays.get(name)
+        if cached is not None and (cached[0] is array_data or cached[0] == array_data):
+            return cached[1]
+
+        data_array = view_shaped_array(shaped_array)
+        self._arrays[name] = (array_data, data_array)
+        return data_array
+
+    def set_array(self, name, data_array, dtype=None, sparse_threshold=None):
+        """
+        Replace the variable data if name is VARIABLE_DATA, otherwise the meta data called name, adding it if the tile
+        has none. See to_shaped_array for dtype and sparse_threshold.
+        """
+        self._arrays.pop(name, None)
+
+        if name == VARIABLE_DATA:
+            to_shaped_array(data_array, dtype=dtype, sparse_threshold=sparse_threshold,
+                            out=self.tile_data.variable_data)
+            return
+
+        meta = self.metadata(name)
+        if meta is not None:
+            to_shaped_array(data_array, dtype=dtype, sparse_threshold=sparse_threshold, out=meta.meta_data)
+        else:
+            to_metadata(name, data_array, dtype=dtype, sparse_threshold=sparse_threshold,
+                        out=self.tile_data.meta_data.add())
+            self._index[name] = self._indexed_count
+            self._indexed_count += 1
+
+
+def get_tile_accessor(nexus_tile):
+    """
+    Return the TileAccessor of nexus_tile. The stages of a processor chain pass the same tile along, so the last
+    accessor of the thread is reused when it is for the same tile and what it decoded carries over between stages.
+    """
+    accessor = getattr(_last_accessor, 'accessor', None)
+    if accessor is None or accessor.nexus_tile is not nexus_tile:
+        accessor = TileAccessor(nexus_tile)
+        _last_accessor.accessor = accessor
+    return accessor
+
+
+def get_global_attribute(summary, name):
+    """
+    :return: The global attribute of a tile summary with this name, None if there is none
+    """
+    return next((attribute for attribute in summary.global_attributes if attribute.name == name), None)
+
+
+def set_global_attribute(summary, name, values):
+    """
+    Set the values of the global attribute of a tile summary with this name, replacing the ones it already has so
+    processors can run again on the same tile.
+    """
+    attribute = get_global_attribute(summary, name)
+    if attribute is None:
+        attribute = summary.global_attributes.add()
+        attribute.name = name
+    del attribute.values[:]
+    attribute.values.extend(values)
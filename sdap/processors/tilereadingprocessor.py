@@ -14,22 +14,36 @@
 # limitations under the License.
 
 import datetime
+import itertools
+import logging
 from collections import OrderedDict
 from contextlib import contextmanager
 from os import path, remove, sep
 from urllib.request import urlopen
 
+import dask
 import numpy
 import xarray as xr
+import zarr
 from cftime import num2date
+from dask.utils import parse_bytes
 from pytz import timezone
 
 from nexusproto import DataTile_pb2 as nexusproto
-from nexusproto.serialization import to_metadata, to_shaped_array
-from sdap.processors import NexusTileProcessor
+from sdap.processors import NexusTileProcessor, shared_thread_pool
+from sdap.processors.serialization import to_metadata, to_shaped_array
+
+logger = logging.getLogger('tilereadingprocessor')
 
 EPOCH = timezone('UTC').localize(datetime.datetime(1970, 1, 1))
 
+# Number of dask chunks computed at the same time when reading out-of-core
+OUT_OF_CORE_WORKERS = 4
+
+
+class TileTooLargeException(Exception):
+    pass
+
 
 @contextmanager
 def closing(thing):
@@ -91,6 +105,113 @@ def to_seconds_from_epoch(date, timeunits=None, start_day=None, timeoffset=None)
         return int((date - EPOCH).total_seconds())
 
 
+def is_zarr_store(file_path):
+    return path.isdir(file_path) and any(
+        path.exists(path.join(file_path, marker)) for marker in ('.zgroup', '.zarray', '.zmetadata'))
+
+
+def zarr_chunks_missing(file_path, variable, index):
+    """
+    Check whether none of the chunks of a Zarr variable covering index have been written. Missing chunks read as the
+    fill value, which xarray masks, so such a selection is all NaN.
+
+    :param file_path: Path to a Zarr directory store
+    :param variable: Name of the variable
+    :param index: Tuple of slices in the order of the variable's dimensions
+    :return: True if the selection is provably all NaN without reading it
+    """
+    array = zarr.open_group(file_path, mode='r')[variable]
+    if array.fill_value is None:
+        return False
+
+    store = getattr(array, 'chunk_store', None) or array.store
+    separator = getattr(array, '_dimension_separator', None) or '.'
+    prefix = array.path + '/' if array.path else ''
+
+    chunk_ranges = [range(selection.start // chunk, (selection.stop - 1) // chunk + 1)
+                    for selection, chunk in zip(index, array.chunks)]
+    return not any(prefix + separator.join(str(i) for i in chunk_index) in store
+                   for chunk_index in itertools.product(*chunk_ranges))
+
+
+def open_granule(file_path, memory_limit=None, read_threads=None):
+    """
+    Open a granule as an xarray Dataset without decoding times.
+
+    NetCDF/HDF5 files are opened lazily through the netCDF4 engine. Zarr directory stores are opened backed by dask
+    arrays chunked like the store, so the chunks touched by one tile are read and decompressed concurrently.
+
+    If memory_limit is given, NetCDF/HDF5 files are opened out-of-core as well: variables are split into dask chunks
+    small enough that as many of them as there are workers, once decoded, fit in half of the limit.
+
+    If only read_threads is given, NetCDF/HDF5 files are opened as dask arrays following the chunking of the file so
+    the chunks of a tile can be processed in parallel.
+
+    :param file_path: Path to a NetCDF/HDF5 file or a Zarr directory store
+    :param memory_limit: Optional upper bound, in bytes, on the memory used to read a tile
+    :param read_threads: Optional number of threads used to read the chunks of a tile
+    :return: The opened Dataset
+    """
+    if is_zarr_store(file_path):
+        ds = xr.open_zarr(file_path, decode_cf=False)
+    elif memory_limit is not None:
+        workers = read_threads or OUT_OF_CORE_WORKERS
+        # Decoding may widen integers to float64, leave room for that when sizing the raw chunks
+        with dask.config.set({'array.chunk-size': max(memory_limit // (4 * workers), 1)}):
+            ds = xr.open_dataset(file_path, decode_cf=False, chunks='auto')
+    elif read_threads is not None:
+        ds = xr.open_dataset(file_path, decode_cf=False, chunks={})
+    else:
+        ds = xr.open_dataset(file_path, decode_cf=False)
+
+    return xr.decode_cf(ds, decode_times=False)
+
+
+def read_variables(variables, index, memory_limit=None, pool=None):
+    """
+    Read the same part of several variables in one pass, replacing masked values with NaN.
+
+    Dask-backed variables are computed together so chunks shared between them are only scheduled once.
+
+    :param variables: xarray DataArrays to read from. They are all indexed the same way
+    :param index: A slice, integer or tuple of slices in the order of the variables' dimensions
+    :param memory_limit: Optional upper bound, in bytes, on the memory used to read the selection. The selection itself
+     may use at most half of it, the rest is left for the chunks being computed.
+    :param pool: Optional thread pool used to read and decode the chunks of dask-backed variables
+    :return: List of numpy arrays holding the selected values, in the order of variables
+    """
+    selections = [variable[index] for variable in variables]
+
+    nbytes = sum(selection.nbytes for selection in selections)
+    if memory_limit is not None and nbytes > memory_limit // 2:
+        raise TileTooLargeException("Reading %s needs %d bytes which exceeds half of the memory limit of %d bytes" % (
+            ', '.join('%s%s' % (selection.name, list(selection.shape)) for selection in selections), nbytes,
+            memory_limit))
+
+    if pool is not None:
+        config = {'scheduler': 'threads', 'pool': pool}
+    elif memory_limit is not None:
+        config = {'scheduler': 'threads', 'num_workers': OUT_OF_CORE_WORKERS}
+    else:
+        config = {}
+
+    with dask.config.set(config):
+        values = dask.compute(*[selection.data for selection in selections])
+
+    return [numpy.ma.filled(value, numpy.NaN) for value in values]
+
+
+def read_variable(variable, index, memory_limit=None, pool=None):
+    """
+    Read only the part of a variable selected by index, replacing masked values with NaN.
+
+    See read_variables for a description of the parameters.
+
+    :return: numpy array holding the selected values
+    """
+    return read_variables([variable], index, memory_limit=memory_limit, pool=pool)[0]
+
+
 def get_ordered_slices(ds, variable, dimension_to_slice):
     dimensions_for_variable = [str(dimension) for dimension in ds[variable].dims]
     ordered_slices = OrderedDict()
@@ -110,16 +231,39 @@ class TileReadingProcessor(NexusTileProcessor):
 
         # Common optional properties
         self.temp_dir = self.environ['TEMP_DIR']
-        self.metadata = self.environ['META']
+        # One or more variables read with the same slices as variable_to_read and added to the tile as meta data.
+        # Either a list or a comma separated string
+        metadata = self.environ['META'] or []
+        self.metadata = metadata.split(',') if isinstance(metadata, str) else list(metadata)
         self.start_of_day = self.environ['GLBLATTR_DAY']
         self.start_of_day_pattern = self.environ['GLBLATTR_DAY_FORMAT']
         self.time_offset = int(self.environ['TIME_OFFSET']) if self.environ['TIME_OFFSET'] is not None else None
+        # Read granules out-of-core, never holding more than this many bytes (e.g. 2000000 or '2GB') per tile
+        self.memory_limit = parse_bytes(self.environ['MEMORY_LIMIT']) \
+            if self.environ['MEMORY_LIMIT'] is not None else None
+        # Read and decompress the chunks of a tile in parallel on the process-wide thread pool, which keeps the size
+        # asked for by the first processor to use it (see shared_thread_pool)
+        self.read_threads = int(self.environ['READ_THREADS']) if self.environ['READ_THREADS'] is not None else None
+        self.read_pool = shared_thread_pool(self.read_threads) if self.read_threads is not None else None
+        # Data and meta data are cast to this dtype (e.g. float32) before being serialized. Masked values are
+        # replaced with NaN so only floating point types are allowed
+        self.output_dtype = numpy.dtype(self.environ['OUTPUT_DTYPE']) \
+            if self.environ['OUTPUT_DTYPE'] is not None else None
+        if self.output_dtype is not None and not numpy.issubdtype(self.output_dtype, numpy.floating):
+            raise ValueError("output_dtype must be a floating point type, got %s" % self.output_dtype)
+        # Data and meta data with at least this fraction of NaN (e.g. 0.8) are stored as a bitmask of the valid values
+        self.sparse_threshold = float(self.environ['SPARSE_THRESHOLD']) \
+            if self.environ['SPARSE_THRESHOLD'] is not None else None
+        # Don't produce tiles without valid data. ProcessorChain turns this on when the reader is followed by an
+        # EmptyTileFilter, so empty tiles are dropped before their coordinates and meta data are read and serialized
+        self.skip_empty = str(self.environ['SKIP_EMPTY']).lower() in ('true', '1', 'yes')
 
     def process_nexus_tile(self, input_tile):
         tile_specifications, file_path = parse_input(input_tile, self.temp_dir)
 
+        # Only the summary is carried over, the readers build the tile data directly in output_tile
         output_tile = nexusproto.NexusTile()
-        output_tile.CopyFrom(input_tile)
+        output_tile.summary.CopyFrom(input_tile.summary)
 
         for tile in self.read_data(tile_specifications, file_path, output_tile):
             yield tile
@@ -131,6 +275,48 @@ class TileReadingProcessor(NexusTileProcessor):
     def read_data(self, tile_specifications, file_path, output_tile):
         raise NotImplementedError
 
+    def read_slice(self, ds, variable, index):
+        return read_variable(ds[variable], index, memory_limit=self.memory_limit, pool=self.read_pool)
+
+    def read_data_unless_empty(self, ds, file_path, section_spec, ordered_slices):
+        """
+        Read the data of a tile before anything else, so tiles without valid data can be skipped cheaply.
+
+        :return: The data, or None if the tile is empty
+        """
+        index = tuple(ordered_slices.values())
+        if is_zarr_store(file_path) and zarr_chunks_missing(file_path, self.variable_to_read, index):
+            data_array = None
+        else:
+            data_array = self.read_slice(ds, self.variable_to_read, index)
+            if numpy.isnan(data_array).all():
+                data_array = None
+
+        if data_array is None:
+            logger.warning("Skipping tile %s from %s because it is empty" % (section_spec, file_path))
+        return data_array
+
+    def read_data_and_metadata(self, ds, tile, ordered_slices, data_array=None):
+        # Read the data and every meta data variable in one pass using the same ordered slices. The data may already
+        # have been read to check whether the tile is empty
+        index = tuple(ordered_slices.values())
+        if data_array is None:
+            variables = [ds[variable] for variable in [self.variable_to_read] + self.metadata]
+            data_array, *metadata_arrays = read_variables(variables, index, memory_limit=self.memory_limit,
+                                                          pool=self.read_pool)
+        elif self.metadata:
+            metadata_arrays = read_variables([ds[variable] for variable in self.metadata], index,
+                                             memory_limit=self.memory_limit, pool=self.read_pool)
+        else:
+            metadata_arrays = []
+
+        to_shaped_array(data_array, dtype=self.output_dtype, sparse_threshold=self.sparse_threshold,
+                        out=tile.variable_data)
+
+        for metadata, metadata_array in zip(self.metadata, metadata_arrays):
+            to_metadata(metadata, metadata_array, dtype=self.output_dtype, sparse_threshold=self.sparse_threshold,
+                        out=tile.meta_data.add())
+
 
 class GridReadingProcessor(TileReadingProcessor):
     def __init__(self, variable_to_read, latitude, longitude, **kwargs):
@@ -142,33 +328,32 @@ class GridReadingProcessor(TileReadingProcessor):
         # Time is optional for Grid data
         time = self.environ['TIME']
 
-        with xr.decode_cf(xr.open_dataset(file_path, decode_cf=False), decode_times=False) as ds:
+        with open_granule(file_path, memory_limit=self.memory_limit, read_threads=self.read_threads) as ds:
             for section_spec, dimtoslice in tile_specifications:
-                tile = nexusproto.GridTile()
-
-                tile.latitude.CopyFrom(to_shaped_array(numpy.ma.filled(ds[self.latitude].data[dimtoslice[self.y_dim]], numpy.NaN)))
-                tile.longitude.CopyFrom(to_shaped_array(numpy.ma.filled(ds[self.longitude].data[dimtoslice[self.x_dim]], numpy.NaN)))
                 # Before we read the data we need to make sure the dimensions are in the proper order so we don't have any
                 #  indexing issues
                 ordered_slices = get_ordered_slices(ds, self.variable_to_read, dimtoslice)
-                # Read data using the ordered slices, replacing masked values with NaN
-                data_array = numpy.ma.filled(ds[self.variable_to_read].data[tuple(ordered_slices.values())], numpy.NaN)
+                if self.skip_empty:
+                    data_array = self.read_data_unless_empty(ds, file_path, section_spec, ordered_slices)
+                    if data_array is None:
+                        continue
+                else:
+                    data_array = None
 
-                tile.variable_data.CopyFrom(to_shaped_array(data_array))
+                tile = output_tile.tile.grid_tile
+                tile.Clear()
 
-                if self.metadata is not None:
-                    tile.meta_data.add().CopyFrom(
-                        to_metadata(self.metadata, ds[self.metadata].data[tuple(ordered_slices.values())]))
+                to_shaped_array(self.read_slice(ds, self.latitude, dimtoslice[self.y_dim]), out=tile.latitude)
+                to_shaped_array(self.read_slice(ds, self.longitude, dimtoslice[self.x_dim]), out=tile.longitude)
+                # Read data and meta data using the ordered slices, replacing masked values with NaN
+                self.read_data_and_metadata(ds, tile, ordered_slices, data_array)
 
                 if time is not None:
-                    timevar = ds[time]
                     # Note assumption is that index of time is start value in dimtoslice
-                    tile.time = to_seconds_from_epoch(timevar.data[dimtoslice[time].start],
-                                                      timeunits=timevar.attrs['units'],
+                    tile.time = to_seconds_from_epoch(self.read_slice(ds, time, dimtoslice[time].start).item(),
+                                                      timeunits=ds[time].attrs['units'],
                                                       timeoffset=self.time_offset)
 
-                output_tile.tile.grid_tile.CopyFrom(tile)
-
                 yield output_tile
 
 
@@ -180,16 +365,24 @@ class SwathReadingProcessor(TileReadingProcessor):
         self.time = time
 
     def read_data(self, tile_specifications, file_path, output_tile):
-        with xr.decode_cf(xr.open_dataset(file_path, decode_cf=False), decode_times=False) as ds:
+        with open_granule(file_path, memory_limit=self.memory_limit, read_threads=self.read_threads) as ds:
             for section_spec, dimtoslice in tile_specifications:
-                tile = nexusproto.SwathTile()
                 # Time Lat Long Data and metadata should all be indexed by the same dimensions, order the incoming spec once using the data variable
                 ordered_slices = get_ordered_slices(ds, self.variable_to_read, dimtoslice)
-                tile.latitude.CopyFrom(to_shaped_array(numpy.ma.filled(ds[self.latitude].data[tuple(ordered_slices.values())], numpy.NaN)))
-                tile.longitude.CopyFrom(to_shaped_array(numpy.ma.filled(ds[self.longitude].data[tuple(ordered_slices.values())], numpy.NaN)))
-
-                timetile = ds[self.time][
-                    tuple([ordered_slices[time_dim] for time_dim in ds[self.time].dims])].astype(
+                if self.skip_empty:
+                    data_array = self.read_data_unless_empty(ds, file_path, section_spec, ordered_slices)
+                    if data_array is None:
+                        continue
+                else:
+                    data_array = None
+
+                tile = output_tile.tile.swath_tile
+                tile.Clear()
+                to_shaped_array(self.read_slice(ds, self.latitude, tuple(ordered_slices.values())), out=tile.latitude)
+                to_shaped_array(self.read_slice(ds, self.longitude, tuple(ordered_slices.values())), out=tile.longitude)
+
+                timetile = self.read_slice(
+                    ds, self.time, tuple([ordered_slices[time_dim] for time_dim in ds[self.time].dims])).astype(
                     'float64',
                     casting='same_kind',
                     copy=False)
@@ -204,17 +397,10 @@ class SwathReadingProcessor(TileReadingProcessor):
                     timetile[index] = to_seconds_from_epoch(timetile[index].item(), timeunits=timeunits,
                                                             start_day=start_of_day_date, timeoffset=self.time_offset)
 
-                tile.time.CopyFrom(to_shaped_array(timetile))
-
-                # Read the data converting masked values to NaN
-                data_array = numpy.ma.filled(ds[self.variable_to_read].data[tuple(ordered_slices.values())], numpy.NaN)
-                tile.variable_data.CopyFrom(to_shaped_array(data_array))
+                to_shaped_array(timetile, out=tile.time)
 
-                if self.metadata is not None:
-                    tile.meta_data.add().CopyFrom(
-                        to_metadata(self.metadata, ds[self.metadata].data[tuple(ordered_slices.values())]))
-
-                output_tile.tile.swath_tile.CopyFrom(tile)
+                # Read the data and meta data converting masked values to NaN
+                self.read_data_and_metadata(ds, tile, ordered_slices, data_array)
 
                 yield output_tile
 
@@ -227,34 +413,31 @@ class TimeSeriesReadingProcessor(TileReadingProcessor):
         self.time = time
 
     def read_data(self, tile_specifications, file_path, output_tile):
-        with xr.decode_cf(xr.open_dataset(file_path, decode_cf=False), decode_times=False) as ds:
+        with open_granule(file_path, memory_limit=self.memory_limit, read_threads=self.read_threads) as ds:
             for section_spec, dimtoslice in tile_specifications:
-                tile = nexusproto.TimeSeriesTile()
-
-                instance_dimension = next(
-                    iter([dim for dim in ds[self.variable_to_read].dims if dim != self.time]))
-
-                tile.latitude.CopyFrom(
-                    to_shaped_array(numpy.ma.filled(ds[self.latitude].data[dimtoslice[instance_dimension]], numpy.NaN)))
-
-                tile.longitude.CopyFrom(
-                    to_shaped_array(numpy.ma.filled(ds[self.longitude].data[dimtoslice[instance_dimension]], numpy.NaN)))
-
                 # Before we read the data we need to make sure the dimensions are in the proper order so we don't
                 # have any indexing issues
                 ordered_slices = get_ordered_slices(ds, self.variable_to_read, dimtoslice)
-                # Read data using the ordered slices, replacing masked values with NaN
-                data_array = numpy.ma.filled(ds[self.variable_to_read].data[tuple(ordered_slices.values())], numpy.NaN)
+                if self.skip_empty:
+                    data_array = self.read_data_unless_empty(ds, file_path, section_spec, ordered_slices)
+                    if data_array is None:
+                        continue
+                else:
+                    data_array = None
+
+                tile = output_tile.tile.time_series_tile
+                tile.Clear()
+
+                instance_dimension = next(
+                    iter([dim for dim in ds[self.variable_to_read].dims if dim != self.time]))
 
-                tile.variable_data.CopyFrom(to_shaped_array(data_array))
+                to_shaped_array(self.read_slice(ds, self.latitude, dimtoslice[instance_dimension]), out=tile.latitude)
 
-                if self.metadata is not None:
-                    tile.meta_data.add().CopyFrom(
-                        to_metadata(self.metadata, ds[self.metadata].data[tuple(ordered_slices.values())]))
+                to_shaped_array(self.read_slice(ds, self.longitude, dimtoslice[instance_dimension]), out=tile.longitude)
 
-                tile.time.CopyFrom(
-                    to_shaped_array(numpy.ma.filled(ds[self.time].data[dimtoslice[self.time]], numpy.NaN)))
+                # Read data and meta data using the ordered slices, replacing masked values with NaN
+                self.read_data_and_metadata(ds, tile, ordered_slices, data_array)
 
-                output_tile.tile.time_series_tile.CopyFrom(tile)
+                to_shaped_array(self.read_slice(ds, self.time, dimtoslice[self.time]), out=tile.time)
 
                 yield output_tile
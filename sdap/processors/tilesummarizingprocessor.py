@@ -15,9 +15,14 @@
 
 from nexusproto import DataTile_pb2 as nexusproto
 import numpy
-from nexusproto.serialization import from_shaped_array
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import view_shaped_array
+from sdap.processors.sketches import TileSketch
+
+
+# Number of elements summarized at a time, so the temporaries of the kernel stay small whatever the size of the tile
+BLOCK_SIZE = 65536
 
 
 class NoTimeException(Exception):
@@ -27,7 +32,7 @@ class NoTimeException(Exception):
 def find_time_min_max(tile_data):
     # Only try to grab min/max time if it exists as a ShapedArray
     if tile_data.time and isinstance(tile_data.time, nexusproto.ShapedArray):
-        time_data = from_shaped_array(tile_data.time)
+        time_data = view_shaped_array(tile_data.time)
         min_time = int(numpy.nanmin(time_data).item())
         max_time = int(numpy.nanmax(time_data).item())
 
@@ -38,6 +43,53 @@ def find_time_min_max(tile_data):
     raise NoTimeException
 
 
+def summarize_data(data, latitudes=None, sketch=None):
+    """
+    Compute the min, max, mean weighted by the cosine of the latitude and count of the non-NaN values of data in a
+    single blockwise pass. Latitudes are broadcast against data rather than repeated, and only blocks of BLOCK_SIZE
+    elements are ever materialized.
+
+    :param data: The data
+    :param latitudes: Latitude of every value, broadcastable to data. The mean isn't weighted if None
+    :param sketch: Optional TileSketch updated with the valid values in the same pass
+    :return: (min, max, mean, count). min and max are NaN and mean is 0 when there is no valid value
+    """
+    minimum = maximum = numpy.NaN
+    weighted_sum = weight_sum = 0.0
+    count = 0
+
+    operands = [data] if latitudes is None else [data, latitudes]
+    iterator = numpy.nditer(operands, flags=['external_loop', 'buffered', 'zerosize_ok'],
+                            op_flags=[['readonly']] * len(operands), buffersize=BLOCK_SIZE)
+    for block in iterator:
+        values = block[0] if latitudes is not None else block
+        valid = ~numpy.isnan(values)
+        valid_count = numpy.count_nonzero(valid)
+        if valid_count == 0:
+            continue
+
+        count += valid_count
+        if sketch is not None:
+            sketch.update(values[valid])
+        minimum = numpy.fmin(minimum, numpy.fmin.reduce(values))
+        maximum = numpy.fmax(maximum, numpy.fmax.reduce(values))
+
+        if latitudes is None:
+            weighted_sum += numpy.sum(values, where=valid, dtype=numpy.float64)
+            weight_sum += valid_count
+        else:
+            weights = numpy.cos(numpy.radians(block[1]))
+            # Values without a latitude don't count towards the mean
+            valid &= ~numpy.isnan(weights)
+            weights[~valid] = 0.0
+            weighted_sum += numpy.dot(numpy.where(valid, values, 0.0), weights)
+            weight_sum += weights.sum()
+
+    mean = weighted_sum / weight_sum if weight_sum > 0 else 0.0
+
+    return float(minimum), float(maximum), float(mean), count
+
+
 class TileSummarizingProcessor(NexusTileProcessor):
 
     def __init__(self, *args, **kwargs):
@@ -45,48 +97,62 @@ class TileSummarizingProcessor(NexusTileProcessor):
 
         self.stored_var_name = self.environ['STORED_VAR_NAME']
 
+        # Optional mergeable sketch of the values (see sdap.processors.sketches), stored in the global attributes.
+        # histogram_range is a list or a comma separated string: min,max
+        self.sketch = str(self.environ['SKETCH']).lower() in ('true', '1', 'yes')
+        histogram_range = self.environ['HISTOGRAM_RANGE']
+        self.histogram_range = [float(value) for value in histogram_range.split(',')] \
+            if isinstance(histogram_range, str) else histogram_range
+        self.histogram_bins = int(self.environ['HISTOGRAM_BINS']) \
+            if self.environ['HISTOGRAM_BINS'] is not None else None
+        self.quantile_accuracy = float(self.environ['QUANTILE_ACCURACY']) \
+            if self.environ['QUANTILE_ACCURACY'] is not None else None
+
     def process_nexus_tile(self, nexus_tile):
         the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
 
         the_tile_data = getattr(nexus_tile.tile, the_tile_type)
 
-        latitudes = numpy.ma.masked_invalid(from_shaped_array(the_tile_data.latitude))
-        longitudes = numpy.ma.masked_invalid(from_shaped_array(the_tile_data.longitude))
+        latitudes = view_shaped_array(the_tile_data.latitude)
+        longitudes = view_shaped_array(the_tile_data.longitude)
 
-        data = from_shaped_array(the_tile_data.variable_data)
+        data = view_shaped_array(the_tile_data.variable_data)
 
         if nexus_tile.HasField("summary"):
             tilesummary = nexus_tile.summary
         else:
             tilesummary = nexusproto.TileSummary()
 
-        tilesummary.bbox.lat_min = numpy.nanmin(latitudes).item()
-        tilesummary.bbox.lat_max = numpy.nanmax(latitudes).item()
-        tilesummary.bbox.lon_min = numpy.nanmin(longitudes).item()
-        tilesummary.bbox.lon_max = numpy.nanmax(longitudes).item()
-
-        tilesummary.stats.min = numpy.nanmin(data).item()
-        tilesummary.stats.max = numpy.nanmax(data).item()
+        # fmin/fmax ignore NaN like nanmin/nanmax, without masking a copy of the coordinates
+        tilesummary.bbox.lat_min = numpy.fmin.reduce(latitudes, axis=None).item()
+        tilesummary.bbox.lat_max = numpy.fmax.reduce(latitudes, axis=None).item()
+        tilesummary.bbox.lon_min = numpy.fmin.reduce(longitudes, axis=None).item()
+        tilesummary.bbox.lon_max = numpy.fmax.reduce(longitudes, axis=None).item()
 
         # In order to accurately calculate the average we need to weight the data based on the cosine of its latitude
         # This is handled slightly differently for swath vs. grid data
         if the_tile_type == 'swath_tile':
             # For Swath tiles, len(data) == len(latitudes) == len(longitudes). So we can simply weight each element in the
             # data array
-            tilesummary.stats.mean = numpy.ma.average(numpy.ma.masked_invalid(data),
-                                                      weights=numpy.cos(numpy.radians(latitudes))).item()
+            weight_latitudes = latitudes
         elif the_tile_type == 'grid_tile':
-            # Grid tiles need to repeat the weight for every longitude
+            # Grid tiles broadcast the weight of each latitude across every longitude
             # TODO This assumes data axis' are ordered as latitude x longitude
-            tilesummary.stats.mean = numpy.ma.average(numpy.ma.masked_invalid(data).flatten(),
-                                                      weights=numpy.cos(
-                                                          numpy.radians(
-                                                              numpy.repeat(latitudes, len(longitudes))))).item()
+            weight_latitudes = latitudes.reshape(-1, 1)
         else:
             # Default to simple average with no weighting
-            tilesummary.stats.mean = numpy.nanmean(data).item()
+            weight_latitudes = None
+
+        sketch = TileSketch(self.histogram_bins, self.histogram_range, self.quantile_accuracy) if self.sketch else None
+
+        minimum, maximum, mean, count = summarize_data(data, weight_latitudes, sketch)
+        tilesummary.stats.min = minimum
+        tilesummary.stats.max = maximum
+        tilesummary.stats.mean = mean
+        tilesummary.stats.count = count
 
-        tilesummary.stats.count = data.size - numpy.count_nonzero(numpy.isnan(data))
+        if sketch is not None:
+            sketch.add_to_summary(tilesummary)
 
         try:
             min_time, max_time = find_time_min_max(the_tile_data)
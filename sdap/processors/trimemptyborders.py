@@ -0,0 +1,176 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+
+import numpy
+
+from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import to_shaped_array, view_shaped_array
+
+
+def valid_bounds(data):
+    """
+    Find the smallest box holding every non-NaN value of data.
+
+    :param data: The data
+    :return: (start, stop) of the box along every axis, or None if data has no valid value
+    """
+    valid = ~numpy.isnan(data)
+    bounds = []
+    for axis in range(data.ndim):
+        # Reduce every other axis so only one boolean per index along this axis is left
+        indices = numpy.flatnonzero(valid.any(axis=tuple(a for a in range(data.ndim) if a != axis)))
+        if indices.size == 0:
+            return None
+        bounds.append((int(indices[0]), int(indices[-1]) + 1))
+
+    return bounds
+
+
+def trim_section_spec(section_spec, dimensions, shape, bounds):
+    """
+    Narrow the slices of a section spec to bounds. Dimensions of the spec that aren't axes of the data (e.g. removed by
+    DeleteUnitAxis) are left as they are.
+
+    :param section_spec: Section spec of the untrimmed data, e.g. time:0:1,lat:0:10,lon:0:10, in any order
+    :param dimensions: Name of the dimension of every axis of the data, in the order of the axes
+    :param shape: Shape of the untrimmed data
+    :param bounds: (start, stop) relative to the untrimmed data along every axis
+    :return: The trimmed section spec
+    """
+    if len(dimensions) != len(shape):
+        raise RuntimeError("Dimensions %s don't match data of shape %s" % (','.join(dimensions), shape))
+
+    trimmed = []
+    matched = set()
+    for dimension in section_spec.split(','):
+        name, start, stop = dimension.split(':')
+        start, stop = int(start), int(stop)
+        if name in dimensions:
+            axis = dimensions.index(name)
+            if stop - start != shape[axis]:
+                raise RuntimeError("Dimension %s of section spec %s doesn't match axis %d of data of shape %s" % (
+                    name, section_spec, axis, shape))
+            start, stop = start + bounds[axis][0], start + bounds[axis][1]
+            matched.add(name)
+        trimmed.append('%s:%d:%d' % (name, start, stop))
+
+    if matched != set(dimensions):
+        raise RuntimeError("Section spec %s doesn't have dimensions %s" % (
+            section_spec, ','.join(sorted(set(dimensions) - matched))))
+
+    return ','.join(trimmed)
+
+
+def time_axes(time_shape, data_shape, time_dimensions=None, dimensions=None):
+    """
+    Find the axis of the data along which each axis of a swath time runs. Size 1 axes of the time broadcast against
+    the data and have no axis.
+
+    :param time_shape: Shape of the time
+    :param data_shape: Shape of the data
+    :param time_dimensions: Name of the dimension of every axis of the time, if known
+    :param dimensions: Name of the dimension of every axis of the data, needed with time_dimensions
+    :return: Axis of the data, or None, for every axis of the time
+    """
+    if time_dimensions is not None:
+        if len(time_dimensions) != len(time_shape) or not set(time_dimensions) <= set(dimensions):
+            raise RuntimeError("Time dimensions %s don't match time of shape %s and data dimensions %s" % (
+                ','.join(time_dimensions), time_shape, ','.join(dimensions)))
+        axes = [dimensions.index(name) for name in time_dimensions]
+    elif len(time_shape) == len(data_shape):
+        axes = list(range(len(data_shape)))
+    else:
+        # Same dimensions as the data, with some left out. Only usable if the sizes pick a single set of data axes
+        candidates = [axes for axes in itertools.combinations(range(len(data_shape)), len(time_shape))
+                      if all(data_shape[axis] == size for axis, size in zip(axes, time_shape))]
+        if len(candidates) != 1:
+            raise RuntimeError("Can't tell which axes of data of shape %s time of shape %s runs along, set "
+                               "time_dimensions" % (data_shape, time_shape))
+        axes = list(candidates[0])
+
+    for size, axis in zip(time_shape, axes):
+        if size != data_shape[axis] and size != 1:
+            raise RuntimeError("Time of shape %s doesn't match data of shape %s" % (time_shape, data_shape))
+
+    return [axis if size == data_shape[axis] and size != 1 else None for size, axis in zip(time_shape, axes)]
+
+
+def trim_coordinate(shaped_array, index):
+    to_shaped_array(view_shaped_array(shaped_array)[index], out=shaped_array)
+
+
+class TrimEmptyBorders(NexusTileProcessor):
+    """
+    Crop the data, meta data and coordinates of a tile to the smallest box holding all of its valid data, and narrow
+    its section spec to match. Rows and columns of NaN along the edges of partially empty tiles are not stored.
+
+    The section spec lists dimensions in any order, dimensions gives the dimension of every axis of the data in order,
+    e.g. time,latitude,longitude for the variables of a CCMP granule. Grid tiles are assumed to be ordered latitude x
+    longitude in their last two axes and time series tiles time x instance. Swath coordinates are shaped like the data;
+    a swath time that isn't (e.g. one time per scan) is cropped along the axes it shares with the data. Those are
+    found from its shape, or from the time_dimensions option when its shape is ambiguous.
+    """
+
+    def __init__(self, dimensions, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # Either a list or a comma separated string
+        self.dimensions = dimensions.split(',') if isinstance(dimensions, str) else list(dimensions)
+        # Dimension of every axis of the time of swath tiles, e.g. scan. Either a list or a comma separated string
+        time_dimensions = self.environ['TIME_DIMENSIONS']
+        self.time_dimensions = time_dimensions.split(',') if isinstance(time_dimensions, str) else time_dimensions
+
+    def process_nexus_tile(self, nexus_tile):
+        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+
+        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+
+        data = view_shaped_array(the_tile_data.variable_data)
+        bounds = valid_bounds(data)
+
+        # Empty tiles are left to EmptyTileFilter and tiles without NaN borders are passed through untouched
+        if bounds is None or all(start == 0 and stop == size for (start, stop), size in zip(bounds, data.shape)):
+            yield nexus_tile
+            return
+
+        index = tuple(slice(start, stop) for start, stop in bounds)
+
+        if nexus_tile.summary.section_spec:
+            nexus_tile.summary.section_spec = trim_section_spec(nexus_tile.summary.section_spec, self.dimensions,
+                                                                 data.shape, bounds)
+
+        to_shaped_array(data[index], out=the_tile_data.variable_data)
+        for metadata in the_tile_data.meta_data:
+            to_shaped_array(view_shaped_array(metadata.meta_data)[index], out=metadata.meta_data)
+
+        if the_tile_type == 'grid_tile':
+            trim_coordinate(the_tile_data.latitude, index[-2])
+            trim_coordinate(the_tile_data.longitude, index[-1])
+        elif the_tile_type == 'swath_tile':
+            trim_coordinate(the_tile_data.latitude, index)
+            trim_coordinate(the_tile_data.longitude, index)
+            axes = time_axes(view_shaped_array(the_tile_data.time).shape, data.shape, self.time_dimensions,
+                             self.dimensions)
+            if any(axis is not None for axis in axes):
+                trim_coordinate(the_tile_data.time, tuple(index[axis] if axis is not None else slice(None)
+                                                          for axis in axes))
+        elif the_tile_type == 'time_series_tile':
+            trim_coordinate(the_tile_data.latitude, index[-1])
+            trim_coordinate(the_tile_data.longitude, index[-1])
+            trim_coordinate(the_tile_data.time, index[0])
+
+        yield nexus_tile
@@ -0,0 +1,120 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import numpy
+
+from sdap.processors import NexusTileProcessor
+from sdap.processors.serialization import to_shaped_array, view_shaped_array, writable
+
+MANTISSA_BITS = {
+    numpy.dtype('float32'): (23, numpy.uint32),
+    numpy.dtype('float64'): (52, numpy.uint64)
+}
+
+
+def keep_bits(significant_digits):
+    """
+    :return: Number of mantissa bits needed to represent significant_digits decimal digits
+    """
+    return int(math.ceil(significant_digits * math.log2(10)))
+
+
+def bit_round(data, significant_digits):
+    """
+    Round the mantissa of every element of a float32/float64 array in place, keeping only the bits needed for
+    significant_digits decimal digits and zeroing the others. The relative error of every element is at most
+    0.5 * 10 ** -significant_digits. NaN and infinity are preserved.
+    """
+    mantissa_bits, uint = MANTISSA_BITS[data.dtype]
+    drop = mantissa_bits - keep_bits(significant_digits)
+    if drop <= 0:
+        return data
+
+    nans = numpy.isnan(data)
+    bits = data.view(uint)
+    # Round half up then clear the dropped bits. A carry into the exponent is the correctly rounded result
+    bits += uint(1 << (drop - 1))
+    bits &= ~uint((1 << drop) - 1)
+    numpy.copyto(data, numpy.NaN, where=nans)
+
+    return data
+
+
+def round_to_precision(data, precision):
+    """
+    Round every element of a floating point array in place to a multiple of the largest power of two no greater than
+    2 * precision. The absolute error of every element is at most precision, and because the quantum is a power of two
+    the trailing bits of the mantissas are zero.
+    """
+    quantum = 2.0 ** math.floor(math.log2(2 * precision))
+
+    numpy.multiply(data, 1 / quantum, out=data)
+    numpy.rint(data, out=data)
+    numpy.multiply(data, quantum, out=data)
+
+    return data
+
+
+class TrimPrecision(NexusTileProcessor):
+    """
+    Discard the precision of variable_data (and of the meta data named in meta) that is beyond the precision of the
+    instrument, so the tiles compress much better. Either significant_digits (relative error at most
+    0.5 * 10 ** -significant_digits) or precision (absolute error at most precision) must be configured.
+    Only float32 and float64 arrays are modified.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.significant_digits = int(self.environ['SIGNIFICANT_DIGITS']) \
+            if self.environ['SIGNIFICANT_DIGITS'] is not None else None
+        self.precision = float(self.environ['PRECISION']) if self.environ['PRECISION'] is not None else None
+        if (self.significant_digits is None) == (self.precision is None):
+            raise ValueError("Exactly one of significant_digits and precision must be configured")
+        if self.significant_digits is not None and self.significant_digits < 1:
+            raise ValueError("significant_digits must be at least 1, got %s" % self.significant_digits)
+        if self.precision is not None and self.precision <= 0:
+            raise ValueError("precision must be positive, got %s" % self.precision)
+
+        # Either a list or a comma separated string
+        metadata = self.environ['META'] or []
+        self.metadata = metadata.split(',') if isinstance(metadata, str) else list(metadata)
+
+    def trim(self, shaped_array):
+        data = view_shaped_array(shaped_array)
+        if data.dtype not in MANTISSA_BITS:
+            return
+        data = writable(data)
+
+        if self.significant_digits is not None:
+            bit_round(data, self.significant_digits)
+        else:
+            round_to_precision(data, self.precision)
+
+        to_shaped_array(data, out=shaped_array)
+
+    def process_nexus_tile(self, nexus_tile):
+        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+
+        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+
+        self.trim(the_tile_data.variable_data)
+        for metadata in the_tile_data.meta_data:
+            if metadata.name in self.metadata:
+                self.trim(metadata.meta_data)
+
+        yield nexus_tile
@@ -13,14 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from math import cos
-from math import radians
-from math import sin
-
 import numpy
-from nexusproto.serialization import from_shaped_array, to_shaped_array
 
 from sdap.processors import NexusTileProcessor
+from sdap.processors.tileaccessor import VARIABLE_DATA, get_tile_accessor
 
 
 def enum(**enums):
@@ -31,17 +27,19 @@ U_OR_V_ENUM = enum(U='u', V='v')
 
 
 def calculate_u_component_value(direction, speed):
-    if direction is numpy.ma.masked or speed is numpy.ma.masked:
-        return numpy.ma.masked
-
-    return speed * sin(direction)
+    """
+    :param direction: Wind direction in radians, masked where unknown
+    :param speed: Wind speed, masked where unknown
+    :return: u component of every value, masked where direction or speed is masked. NaN propagates
+    """
+    return speed * numpy.ma.sin(direction)
 
 
 def calculate_v_component_value(direction, speed):
-    if direction is numpy.ma.masked or speed is numpy.ma.masked:
-        return numpy.ma.masked
-
-    return speed * cos(direction)
+    """
+    See calculate_u_component_value
+    """
+    return speed * numpy.ma.cos(direction)
 
 
 class WindDirSpeedToUV(NexusTileProcessor):
@@ -52,50 +50,34 @@ class WindDirSpeedToUV(NexusTileProcessor):
         self.u_or_v = u_or_v.lower()
 
     def process_nexus_tile(self, nexus_tile):
-        the_tile_type = nexus_tile.tile.WhichOneof("tile_type")
+        tile = get_tile_accessor(nexus_tile)
 
-        the_tile_data = getattr(nexus_tile.tile, the_tile_type)
+        wind_speed = tile.array(VARIABLE_DATA)
 
-        wind_speed = from_shaped_array(the_tile_data.variable_data)
-
-        wind_dir = from_shaped_array(
-            next(meta for meta in the_tile_data.meta_data if meta.name == 'wind_dir').meta_data)
+        wind_dir = tile.array('wind_dir')
 
         assert wind_speed.shape == wind_dir.shape
 
-        wind_u_component = numpy.ma.empty(wind_speed.shape, dtype=float)
-        wind_v_component = numpy.ma.empty(wind_speed.shape, dtype=float)
-        wind_speed_iter = numpy.nditer(wind_speed, flags=['multi_index'])
-        while not wind_speed_iter.finished:
-            speed = wind_speed_iter[0]
-            current_index = wind_speed_iter.multi_index
-            direction = wind_dir[current_index]
-
-            # Convert degrees to radians
-            direction = radians(direction)
-
-            # Calculate component values
-            wind_u_component[current_index] = calculate_u_component_value(direction, speed)
-            wind_v_component[current_index] = calculate_v_component_value(direction, speed)
+        # Convert degrees to radians
+        direction = numpy.ma.masked_array(numpy.radians(numpy.ma.getdata(wind_dir).astype(float)),
+                                          mask=numpy.ma.getmask(wind_dir))
+        # Components are computed in double precision whatever the precision of the speed
+        speed = numpy.ma.asarray(wind_speed).astype(float)
 
-            wind_speed_iter.iternext()
+        # Calculate component values, masked values are stored as NaN
+        wind_u_component = calculate_u_component_value(direction, speed).filled(numpy.nan)
+        wind_v_component = calculate_v_component_value(direction, speed).filled(numpy.nan)
 
         # Stick the original data into the meta data
-        wind_speed_meta = the_tile_data.meta_data.add()
-        wind_speed_meta.name = 'wind_speed'
-        wind_speed_meta.meta_data.CopyFrom(to_shaped_array(wind_speed))
+        tile.set_array('wind_speed', wind_speed)
 
         # The u_or_v variable specifies which component variable is the 'data variable' for this tile
         # Replace data with the appropriate component value and put the other component in metadata
         if self.u_or_v == U_OR_V_ENUM.U:
-            the_tile_data.variable_data.CopyFrom(to_shaped_array(wind_u_component))
-            wind_component_meta = the_tile_data.meta_data.add()
-            wind_component_meta.name = 'wind_v'
-            wind_component_meta.meta_data.CopyFrom(to_shaped_array(wind_v_component))
+            tile.set_array(VARIABLE_DATA, wind_u_component)
+            tile.set_array('wind_v', wind_v_component)
         elif self.u_or_v == U_OR_V_ENUM.V:
-            the_tile_data.variable_data.CopyFrom(to_shaped_array(wind_v_component))
-            wind_component_meta = the_tile_data.meta_data.add()
-            wind_component_meta.name = 'wind_u'
-            wind_component_meta.meta_data.CopyFrom(to_shaped_array(wind_u_component))
+            tile.set_array(VARIABLE_DATA, wind_v_component)
+            tile.set_array('wind_u', wind_u_component)
 
         yield nexus_tile
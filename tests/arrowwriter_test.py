@@ -0,0 +1,198 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import shutil
+import tempfile
+import unittest
+from os import path
+
+import numpy as np
+import pyarrow
+import pyarrow.parquet as parquet
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.arrowwriter import ArrowTileWriter, TILE_SCHEMA, list_array, tile_schema
+from sdap.processors.processorchain import ProcessorChain
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+
+
+class TestArrowTileWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        processor_list = [
+            {'name': 'GridReadingProcessor',
+             'config': {'latitude': 'lat',
+                        'longitude': 'lon',
+                        'time': 'time',
+                        'variable_to_read': 'analysed_sst'}},
+            {'name': 'TileSummarizingProcessor', 'config': {'stored_var_name': 'analysed_sst'}}
+        ]
+        self.chain = ProcessorChain(processor_list)
+
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4')
+        self.input_tiles = []
+        for lat in range(0, 50, 10):
+            input_tile = nexusproto.NexusTile()
+            input_tile.summary.granule = "file:%s" % test_file
+            input_tile.summary.section_spec = "time:0:1,lat:%d:%d,lon:0:10" % (lat, lat + 10)
+            self.input_tiles.append(input_tile)
+
+        self.tiles = [tile for input_tile in self.input_tiles for tile in self.chain.process(input_tile)]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assert_table_matches_tiles(self, table):
+        self.assertEqual(len(self.tiles), table.num_rows)
+
+        rows = table.to_pydict()
+        for row, tile in enumerate(self.tiles):
+            self.assertEqual(tile.summary.section_spec, rows['section_spec'][row])
+            self.assertEqual('analysed_sst', rows['data_var_name'][row])
+            self.assertEqual('grid_tile', rows['tile_type'][row])
+            self.assertEqual(tile.summary.bbox.lat_min, rows['lat_min'][row])
+            self.assertEqual(tile.summary.stats.mean, rows['mean'][row])
+            self.assertEqual(tile.summary.stats.count, rows['count'][row])
+            self.assertEqual(tile.tile.grid_tile.time, rows['time'][row])
+            self.assertEqual([1, 10, 10], rows['shape'][row])
+            np.testing.assert_array_equal(from_shaped_array(tile.tile.grid_tile.variable_data).ravel(),
+                                          np.array(rows['variable_data'][row], dtype=np.float64))
+            np.testing.assert_array_equal(from_shaped_array(tile.tile.grid_tile.latitude),
+                                          np.array(rows['latitude'][row]))
+
+    def test_write_parquet(self):
+        file_path = path.join(self.temp_dir, 'tiles.parquet')
+
+        with ArrowTileWriter(file_path, batch_size=2) as writer:
+            for input_tile in self.input_tiles:
+                self.chain.write(input_tile, writer)
+
+        parquet_file = parquet.ParquetFile(file_path)
+        # One row group per batch
+        self.assertEqual(3, parquet_file.num_row_groups)
+        # The variable data keeps its dtype
+        data_dtype = from_shaped_array(self.tiles[0].tile.grid_tile.variable_data).dtype
+        self.assertTrue(parquet_file.schema_arrow.equals(tile_schema(data_dtype)))
+        self.assert_table_matches_tiles(parquet_file.read())
+
+    def test_write_arrow_stream(self):
+        sink = pyarrow.BufferOutputStream()
+
+        with ArrowTileWriter(sink, file_format='arrow', batch_size=4, include_tile=True) as writer:
+            for tile in self.tiles:
+                writer.write(tile)
+
+        reader = pyarrow.ipc.open_stream(sink.getvalue())
+        batches = list(reader)
+        self.assertEqual([4, 1], [batch.num_rows for batch in batches])
+
+        table = pyarrow.Table.from_batches(batches)
+        self.assert_table_matches_tiles(table)
+        self.assertEqual(self.tiles[0], nexusproto.NexusTile.FromString(table.column('tile')[0].as_py()))
+
+    def test_keep_float32_data(self):
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time', output_dtype='float32')
+        tiles = [tile for input_tile in self.input_tiles for tile in reader.process(input_tile)]
+        file_path = path.join(self.temp_dir, 'tiles.parquet')
+
+        with ArrowTileWriter(file_path, batch_size=2) as writer:
+            for tile in tiles:
+                writer.write(tile)
+
+        table = parquet.read_table(file_path)
+        self.assertTrue(table.schema.equals(tile_schema(np.float32)))
+        self.assertEqual(pyarrow.large_list(pyarrow.float32()), table.schema.field('variable_data').type)
+        np.testing.assert_array_equal(from_shaped_array(tiles[0].tile.grid_tile.variable_data).ravel(),
+                                      table.column('variable_data')[0].values.to_numpy())
+
+    def test_write_reused_tile(self):
+        sink = pyarrow.BufferOutputStream()
+        tile = nexusproto.NexusTile()
+
+        with ArrowTileWriter(sink, file_format='arrow') as writer:
+            for expected in self.tiles:
+                tile.CopyFrom(expected)
+                writer.write(tile)
+            tile.Clear()
+
+        self.assert_table_matches_tiles(pyarrow.ipc.open_stream(sink.getvalue()).read_all())
+
+    def test_write_swath_time_and_meta_data(self):
+        data = np.arange(6.0).reshape(2, 3)
+        time = np.array([[1483228800.0], [np.nan]])
+        swath_tile = nexusproto.SwathTile()
+        swath_tile.latitude.CopyFrom(to_shaped_array(data))
+        swath_tile.longitude.CopyFrom(to_shaped_array(data))
+        swath_tile.time.CopyFrom(to_shaped_array(time))
+        swath_tile.variable_data.CopyFrom(to_shaped_array(data))
+        swath_tile.meta_data.add().CopyFrom(to_metadata('quality', np.ones((2, 3), dtype=np.int8)))
+        tile = nexusproto.NexusTile()
+        tile.tile.swath_tile.CopyFrom(swath_tile)
+        file_path = path.join(self.temp_dir, 'tiles.parquet')
+
+        with ArrowTileWriter(file_path) as writer:
+            writer.write(tile)
+            writer.write(self.tiles[0])
+
+        rows = parquet.read_table(file_path).to_pydict()
+        self.assertEqual([1483228800, None], rows['times'][0])
+        self.assertEqual([{'name': 'quality', 'shape': [2, 3], 'values': [1.0] * 6}], rows['meta_data'][0])
+        self.assertEqual([], rows['times'][1])
+        self.assertEqual([], rows['meta_data'][1])
+
+    def test_reject_other_data_dtype(self):
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time', output_dtype='float32')
+        float32_tile = next(reader.process(self.input_tiles[0]))
+        float64_tile = nexusproto.NexusTile()
+        float64_tile.CopyFrom(float32_tile)
+        float64_tile.tile.grid_tile.variable_data.CopyFrom(
+            to_shaped_array(from_shaped_array(float32_tile.tile.grid_tile.variable_data).astype(np.float64)))
+        file_path = path.join(self.temp_dir, 'tiles.parquet')
+
+        with self.assertRaises(ValueError):
+            with ArrowTileWriter(file_path, batch_size=1) as writer:
+                writer.write(float32_tile)
+                writer.write(float64_tile)
+
+        with ArrowTileWriter(file_path, batch_size=1, data_dtype='float32') as writer:
+            writer.write(float32_tile)
+            writer.write(float64_tile)
+
+        self.assertEqual(2, parquet.read_table(file_path).num_rows)
+
+    def test_list_array_64_bit_offsets(self):
+        array = list_array([np.arange(3.0), np.arange(2.0)])
+
+        self.assertEqual(pyarrow.large_list(pyarrow.float64()), array.type)
+        self.assertEqual(pyarrow.int64(), array.offsets.type)
+        self.assertEqual([0, 3, 5], array.offsets.to_pylist())
+
+    def test_write_no_tiles(self):
+        file_path = path.join(self.temp_dir, 'tiles.parquet')
+
+        ArrowTileWriter(file_path).close()
+
+        table = parquet.read_table(file_path)
+        self.assertEqual(0, table.num_rows)
+        self.assertTrue(table.schema.equals(TILE_SCHEMA))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ArrowTileWriter(path.join(self.temp_dir, 'tiles.csv'), file_format='csv')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.serialization import UnknownCodecException, from_shaped_array, is_compressed, to_metadata, \
+    to_shaped_array
+
+
+class TestCompressTileData(unittest.TestCase):
+    def setUp(self):
+        self.data = np.full((10, 10), np.nan)
+        self.data[2:5, 3:8] = 25.0
+
+        self.input_tile = nexusproto.NexusTile()
+        tile = self.input_tile.tile.swath_tile
+        tile.latitude.CopyFrom(to_shaped_array(np.tile(np.arange(10.0), (10, 1))))
+        tile.longitude.CopyFrom(to_shaped_array(np.tile(np.arange(10.0), (10, 1)).T))
+        tile.time.CopyFrom(to_shaped_array(np.full((10, 10), 1514764800, dtype=np.int64)))
+        tile.variable_data.CopyFrom(to_shaped_array(self.data))
+        tile.meta_data.add().CopyFrom(to_metadata('quality', np.zeros((10, 10), dtype=np.int8)))
+
+    def test_compress_swath_tile(self):
+        processor = sdap.processors.CompressTileData('zlib', shuffle='true')
+
+        tile = list(processor.process(self.input_tile))[0].tile.swath_tile
+
+        for shaped_array in (tile.latitude, tile.longitude, tile.time, tile.variable_data, tile.meta_data[0].meta_data):
+            self.assertTrue(is_compressed(shaped_array))
+        np.testing.assert_array_equal(self.data, from_shaped_array(tile.variable_data))
+        np.testing.assert_array_equal(np.zeros((10, 10)), from_shaped_array(tile.meta_data[0].meta_data))
+
+    def test_summarize_compressed_tile(self):
+        chain = [sdap.processors.CompressTileData('zlib'), sdap.processors.TileSummarizingProcessor()]
+
+        tiles = [self.input_tile]
+        for processor in chain:
+            tiles = [result for tile in tiles for result in processor.process(tile)]
+
+        self.assertEqual(25.0, tiles[0].summary.stats.mean)
+        self.assertEqual(15, tiles[0].summary.stats.count)
+        self.assertEqual(1514764800, tiles[0].summary.stats.min_time)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(UnknownCodecException):
+            sdap.processors.CompressTileData('rar')
+
+
+if __name__ == '__main__':
+    unittest.main()
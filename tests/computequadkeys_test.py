@@ -0,0 +1,103 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+from os import path
+
+import numpy as np
+
+import sdap.processors
+from sdap.processors.computequadkeys import covered_quadkeys
+from sdap.processors.serialization import from_shaped_array
+
+
+class TestCoveredQuadkeys(unittest.TestCase):
+    def test_quadrants(self):
+        self.assertEqual(['0', '3'], covered_quadkeys(np.array([45.0, -45.0]), np.array([-90.0, 90.0]), 1))
+
+    def test_grid(self):
+        self.assertEqual(['03', '13', '23', '33'],
+                         covered_quadkeys(np.array([45.0, -45.0]), np.array([-90.0, 90.0]), 2, grid=True))
+
+    def test_longitude_wraps_and_nan(self):
+        self.assertEqual(['011'], covered_quadkeys(np.array([[89.9, np.nan]]), np.array([[359.9, 0.0]]), 3))
+
+    def test_matches_point_by_point(self):
+        random = np.random.RandomState(0)
+        latitudes = random.uniform(-90, 90, (20, 30))
+        longitudes = random.uniform(-180, 180, (20, 30))
+
+        def quadkey(latitude, longitude, level):
+            key = ''
+            south, north, west, east = -90.0, 90.0, -180.0, 180.0
+            for _ in range(level):
+                middle_latitude, middle_longitude = (south + north) / 2, (west + east) / 2
+                digit = 0
+                if latitude < middle_latitude:
+                    digit += 2
+                    north = middle_latitude
+                else:
+                    south = middle_latitude
+                if longitude >= middle_longitude:
+                    digit += 1
+                    west = middle_longitude
+                else:
+                    east = middle_longitude
+                key += str(digit)
+            return key
+
+        expected = sorted({quadkey(latitude, longitude, 6) for latitude, longitude in
+                           zip(latitudes.ravel(), longitudes.ravel())})
+        self.assertEqual(expected, covered_quadkeys(latitudes, longitudes, 6))
+
+
+class TestComputeQuadkeys(unittest.TestCase):
+    def test_grid_tile(self):
+        test_file = path.join(path.dirname(__file__), 'dumped_nexustiles', 'avhrr_nonempty_nexustile.bin')
+
+        with open(test_file, 'rb') as f:
+            nexustile_str = f.read()
+
+        processor = sdap.processors.ComputeQuadkeys('4,12')
+        nexus_tile = list(processor.process(nexustile_str))[0]
+
+        attributes = {attribute.name: list(attribute.values) for attribute in nexus_tile.summary.global_attributes}
+        self.assertEqual(1, len(attributes['quadkeys.4']))
+        self.assertTrue(all(key.startswith(attributes['quadkeys.4'][0]) for key in attributes['quadkeys.12']))
+
+        latitudes = from_shaped_array(nexus_tile.tile.grid_tile.latitude)
+        longitudes = from_shaped_array(nexus_tile.tile.grid_tile.longitude)
+        self.assertEqual(covered_quadkeys(*np.meshgrid(latitudes, longitudes), 12), attributes['quadkeys.12'])
+
+    def test_run_again(self):
+        test_file = path.join(path.dirname(__file__), 'dumped_nexustiles', 'avhrr_nonempty_nexustile.bin')
+
+        with open(test_file, 'rb') as f:
+            nexustile_str = f.read()
+
+        processor = sdap.processors.ComputeQuadkeys('4,12')
+        expected = list(processor.process(nexustile_str))[0]
+        nexus_tile = list(processor.process(expected.SerializeToString()))[0]
+
+        self.assertEqual(expected.summary.global_attributes, nexus_tile.summary.global_attributes)
+        self.assertEqual(1, len([attribute for attribute in nexus_tile.summary.global_attributes
+                                 if attribute.name == 'quadkeys.4']))
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            sdap.processors.ComputeQuadkeys([0])
+
+
+if __name__ == '__main__':
+    unittest.main()
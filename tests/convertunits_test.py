@@ -0,0 +1,149 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import shutil
+import tempfile
+import unittest
+from os import path
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.convertunits import IncompatibleUnitsException, UnknownUnitException, conversion
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+
+
+def units_attributes(summary):
+    return {attribute.name: list(attribute.values) for attribute in summary.global_attributes}
+
+
+class TestConversion(unittest.TestCase):
+    def test_conversions(self):
+        self.assertEqual((1.0, -273.15), conversion('kelvin', 'degC'))
+        scale, offset = conversion('degF', 'degree_Celsius')
+        self.assertAlmostEqual(100.0, 212.0 * scale + offset)
+        scale, offset = conversion('knots', 'm s-1')
+        self.assertAlmostEqual(0.514444, scale, places=6)
+        self.assertEqual((100.0, 0.0), conversion('dbar', 'hPa'))
+
+    def test_incompatible_units(self):
+        with self.assertRaises(IncompatibleUnitsException):
+            conversion('kelvin', 'm s-1')
+
+    def test_unknown_units(self):
+        with self.assertRaises(UnknownUnitException):
+            conversion('furlongs per fortnight', 'm s-1')
+
+
+class TestConvertMur(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4')
+        input_tile.summary.section_spec = "time:0:1,lat:0:10,lon:0:10"
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time', meta='analysis_error')
+        self.input_tile = list(reader.process(input_tile))[0]
+        self.error = from_shaped_array(self.input_tile.tile.grid_tile.meta_data[0].meta_data)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_units_from_granule(self):
+        expected = list(sdap.processors.KelvinToCelsius().process(self.input_tile.SerializeToString()))[0]
+
+        for granule_index in (None, path.join(self.temp_dir, 'granules.db')):
+            converter = sdap.processors.ConvertUnits('degC', variable='analysed_sst', granule_index=granule_index)
+            tile = nexusproto.NexusTile.FromString(self.input_tile.SerializeToString())
+
+            result = list(converter.process(tile))[0]
+
+            np.testing.assert_array_equal(from_shaped_array(expected.tile.grid_tile.variable_data),
+                                          from_shaped_array(result.tile.grid_tile.variable_data))
+            self.assertEqual({'units': ['degC']}, units_attributes(result.summary))
+            # Meta data not listed are left alone
+            np.testing.assert_array_equal(self.error, from_shaped_array(result.tile.grid_tile.meta_data[0].meta_data))
+
+    def test_already_converted(self):
+        tile = list(sdap.processors.ConvertUnits('degC', variable='analysed_sst').process(self.input_tile))[0]
+        expected = tile.tile.SerializeToString()
+
+        # The units of the summary take precedence over the granule
+        tile = list(sdap.processors.ConvertUnits('celsius', variable='analysed_sst').process(tile))[0]
+
+        self.assertEqual(expected, tile.tile.SerializeToString())
+        self.assertEqual({'units': ['celsius']}, units_attributes(tile.summary))
+
+    def test_uncertainty_is_not_offset(self):
+        converter = sdap.processors.ConvertUnits('degC', variable='analysed_sst', meta='analysis_error',
+                                                 differences='analysis_error')
+
+        result = list(converter.process(self.input_tile))[0]
+
+        error = from_shaped_array(result.tile.grid_tile.meta_data[0].meta_data)
+        self.assertTrue(np.all(error[~np.isnan(error)] >= 0))
+        np.testing.assert_array_equal(self.error, error)
+        self.assertEqual({'units': ['degC'], 'analysis_error.units': ['degC']}, units_attributes(result.summary))
+
+    def test_meta_data_own_units(self):
+        converter = sdap.processors.ConvertUnits('degC', variable='analysed_sst', meta=['analysis_error:K'])
+
+        result = list(converter.process(self.input_tile))[0]
+
+        np.testing.assert_array_equal(self.error, from_shaped_array(result.tile.grid_tile.meta_data[0].meta_data))
+        self.assertEqual({'units': ['degC'], 'analysis_error.units': ['K']}, units_attributes(result.summary))
+
+    def test_missing_meta_data(self):
+        converter = sdap.processors.ConvertUnits('degC', variable='analysed_sst', meta='sea_ice_fraction')
+
+        with self.assertRaisesRegex(RuntimeError, 'sea_ice_fraction.*not_empty_mur.nc4 slice time:0:1,lat:0:10'):
+            list(converter.process(self.input_tile))
+
+
+class TestConvertMetaData(unittest.TestCase):
+    def test_explicit_and_summary_units(self):
+        speed = np.array([[0.0, 10.0], [np.nan, 20.0]], dtype=np.float32)
+        gust = np.array([[100, 200], [300, 400]], dtype=np.int16)
+
+        input_tile = nexusproto.NexusTile()
+        attribute = input_tile.summary.global_attributes.add()
+        attribute.name = 'gust.units'
+        attribute.values.append('cm/s')
+        swath_tile = input_tile.tile.swath_tile
+        swath_tile.variable_data.CopyFrom(to_shaped_array(speed))
+        swath_tile.meta_data.add().CopyFrom(to_metadata('gust', gust))
+
+        converter = sdap.processors.ConvertUnits('m/s', from_units='knots', meta='gust')
+        swath_tile = list(converter.process(input_tile))[0].tile.swath_tile
+
+        converted = from_shaped_array(swath_tile.variable_data)
+        self.assertEqual(np.float32, converted.dtype)
+        np.testing.assert_array_equal(speed * np.float32(1852.0 / 3600.0), converted)
+
+        converted_gust = from_shaped_array(swath_tile.meta_data[0].meta_data)
+        self.assertEqual(np.float64, converted_gust.dtype)
+        np.testing.assert_array_almost_equal(gust / 100.0, converted_gust)
+
+    def test_unknown_source_units(self):
+        input_tile = nexusproto.NexusTile()
+        input_tile.tile.swath_tile.variable_data.CopyFrom(to_shaped_array(np.zeros(3)))
+
+        with self.assertRaises(UnknownUnitException):
+            list(sdap.processors.ConvertUnits('m/s').process(input_tile))
+
+
+if __name__ == '__main__':
+    unittest.main()
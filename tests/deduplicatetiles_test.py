@@ -0,0 +1,87 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import shutil
+import tempfile
+import unittest
+from os import path
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.deduplicatetiles import TileHashStore, tile_digest
+from sdap.processors.serialization import to_metadata, to_shaped_array
+
+
+def make_tile(data, section_spec="lat:0:2,lon:0:3"):
+    nexus_tile = nexusproto.NexusTile()
+    nexus_tile.summary.granule = "file:/data/granule.nc"
+    nexus_tile.summary.section_spec = section_spec
+    grid_tile = nexus_tile.tile.grid_tile
+    grid_tile.variable_data.CopyFrom(to_shaped_array(data))
+    grid_tile.latitude.CopyFrom(to_shaped_array(np.array([10.0, 11.0])))
+    grid_tile.longitude.CopyFrom(to_shaped_array(np.array([20.0, 21.0, 22.0])))
+    grid_tile.meta_data.add().CopyFrom(to_metadata('error', data / 10))
+    grid_tile.time = 1483228800
+    return nexus_tile
+
+
+class TestDeduplicateTiles(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.store_path = path.join(self.temp_dir, 'tiles.db')
+        self.data = np.arange(6, dtype=np.float64).reshape(2, 3)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_digest_ignores_summary(self):
+        republished = make_tile(self.data)
+        republished.summary.stats.mean = 42.0
+        republished.summary.data_var_name = 'sst'
+
+        self.assertEqual(tile_digest(make_tile(self.data)), tile_digest(republished))
+
+    def test_drop_unchanged_tiles(self):
+        processor = sdap.processors.DeduplicateTiles(self.store_path)
+
+        self.assertEqual(1, len(list(processor.process(make_tile(self.data)))))
+        self.assertEqual(0, len(list(processor.process(make_tile(self.data)))))
+        # Another tile of the same granule
+        self.assertEqual(1, len(list(processor.process(make_tile(self.data, "lat:2:4,lon:0:3")))))
+
+    def test_keep_changed_tiles(self):
+        processor = sdap.processors.DeduplicateTiles(self.store_path)
+        changed = self.data.copy()
+        changed[1, 2] = np.nan
+
+        self.assertEqual(1, len(list(processor.process(make_tile(self.data)))))
+        self.assertEqual(1, len(list(processor.process(make_tile(changed)))))
+        self.assertEqual(0, len(list(processor.process(make_tile(changed)))))
+
+    def test_store_persists(self):
+        store = TileHashStore(self.store_path)
+        self.assertTrue(store.update('granule', 'lat:0:2', b'digest'))
+        store.close()
+
+        store = TileHashStore(self.store_path)
+        self.assertFalse(store.update('granule', 'lat:0:2', b'digest'))
+        self.assertTrue(store.update('granule', 'lat:0:2', b'other'))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
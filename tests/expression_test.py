@@ -0,0 +1,123 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from os import path
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors import shared_thread_pool
+from sdap.processors.expression import CompiledExpression, ExpressionException
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+
+
+class TestCompiledExpression(unittest.TestCase):
+    def test_blockwise_matches_numpy(self):
+        random = np.random.RandomState(0)
+        u = random.normal(0, 10, (30, 40)).astype(np.float32)
+        v = random.normal(0, 10, (30, 40)).astype(np.float32)
+        expression = CompiledExpression('sqrt(u * u + v * v)', ['data', 'u', 'v'])
+
+        self.assertEqual(['u', 'v'], expression.names)
+        for pool in (None, shared_thread_pool(4)):
+            result = expression.evaluate({'u': u, 'v': v}, u.shape, pool=pool, block_size=100)
+            self.assertEqual(np.float32, result.dtype)
+            np.testing.assert_array_equal(np.sqrt(u * u + v * v), result)
+
+    def test_operands_not_modified(self):
+        data = np.array([1.0, 2.0, 3.0])
+        data.setflags(write=False)
+
+        result = CompiledExpression('-(data + 1) ** 2 % 5', ['data']).evaluate({'data': data}, data.shape)
+
+        np.testing.assert_array_equal(-(data + 1) ** 2 % 5, result)
+        np.testing.assert_array_equal([1.0, 2.0, 3.0], data)
+
+    def test_where(self):
+        data = np.array([270.0, np.nan, 290.0])
+
+        result = CompiledExpression('where(data > 280, data - 273.15, nan)', ['data']).evaluate({'data': data},
+                                                                                             data.shape)
+
+        np.testing.assert_array_equal([np.nan, np.nan, 290.0 - 273.15], result)
+
+    def test_rejects_unsupported_expressions(self):
+        for expression in ('__import__("os")', 'data.real', 'other + 1', 'lambda: 1', 'data +'):
+            with self.assertRaises(ExpressionException):
+                CompiledExpression(expression, ['data'])
+
+
+class TestExpression(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.u = random.normal(0, 10, (1, 20, 20))
+        self.v = random.normal(0, 10, (1, 20, 20))
+        self.u[0, 0, :] = np.nan
+
+        self.input_tile = nexusproto.NexusTile()
+        tile = self.input_tile.tile.grid_tile
+        tile.variable_data.CopyFrom(to_shaped_array(self.u))
+        tile.meta_data.add().CopyFrom(to_metadata('u', self.u))
+        tile.meta_data.add().CopyFrom(to_metadata('v', self.v))
+
+    def test_kelvin_to_celsius(self):
+        test_file = path.join(path.dirname(__file__), 'dumped_nexustiles', 'avhrr_nonempty_nexustile.bin')
+        with open(test_file, 'rb') as f:
+            nexustile_str = f.read()
+
+        expected = list(sdap.processors.KelvinToCelsius().process(nexustile_str))[0]
+        result = list(sdap.processors.Expression('data - 273.15').process(nexustile_str))[0]
+
+        np.testing.assert_array_equal(from_shaped_array(expected.tile.grid_tile.variable_data),
+                                      from_shaped_array(result.tile.grid_tile.variable_data))
+
+    def test_output_to_new_meta_data(self):
+        processor = sdap.processors.Expression('sqrt(u * u + v * v)', output='wind_speed', threads=2)
+
+        tile = list(processor.process(self.input_tile))[0].tile.grid_tile
+
+        self.assertEqual(['u', 'v', 'wind_speed'], [meta.name for meta in tile.meta_data])
+        np.testing.assert_array_equal(np.sqrt(self.u * self.u + self.v * self.v),
+                                      from_shaped_array(tile.meta_data[2].meta_data))
+        np.testing.assert_array_equal(self.u, from_shaped_array(tile.variable_data))
+
+    def test_replace_meta_data(self):
+        processor = sdap.processors.Expression('v * 2', output='v', output_dtype='float32')
+
+        tile = list(processor.process(self.input_tile))[0].tile.grid_tile
+
+        self.assertEqual(['u', 'v'], [meta.name for meta in tile.meta_data])
+        np.testing.assert_array_equal((self.v * 2).astype(np.float32), from_shaped_array(tile.meta_data[1].meta_data))
+
+    def test_missing_meta_data(self):
+        processor = sdap.processors.Expression('data + w')
+
+        with self.assertRaises(ExpressionException):
+            list(processor.process(self.input_tile))
+
+
+class TestSharedThreadPool(unittest.TestCase):
+    def test_warn_about_another_size(self):
+        pool = shared_thread_pool(4)
+        size = sdap.processors._thread_pool_size
+
+        with self.assertLogs('processors', level='WARNING'):
+            self.assertIs(pool, shared_thread_pool(size + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
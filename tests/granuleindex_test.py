@@ -0,0 +1,106 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import shutil
+import tempfile
+import unittest
+from os import path
+from unittest import mock
+
+import numpy as np
+import xarray as xr
+import zarr
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.granuleindex import GranuleIndex
+
+
+class TestGranuleIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_path = path.join(self.temp_dir, 'granules.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_describe_mur(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4')
+
+        info = GranuleIndex(self.index_path).get("file:%s" % test_file)
+
+        self.assertEqual({'time': 1, 'lat': 51, 'lon': 51}, {dim: info.dims[dim] for dim in ('time', 'lat', 'lon')})
+        self.assertEqual(('time', 'lat', 'lon'), info['analysed_sst'].dims)
+        self.assertEqual('kelvin', info['analysed_sst'].attrs['units'])
+        self.assertAlmostEqual(-34.99, info['lat'].min, places=2)
+        self.assertAlmostEqual(-34.49, info['lat'].max, places=2)
+        self.assertEqual(info['time'].time_min, info['time'].time_max)
+        self.assertIn('NC_GLOBAL.time_coverage_start', info.attrs)
+
+    def test_reuse_stored_description(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4')
+        expected = GranuleIndex(self.index_path).get(test_file)
+
+        with mock.patch('sdap.processors.granuleindex.describe_granule') as describe_granule:
+            info = GranuleIndex(self.index_path).get(test_file)
+
+        describe_granule.assert_not_called()
+        self.assertEqual(expected.to_json(), info.to_json())
+
+    def test_describe_again_when_modified(self):
+        test_file = path.join(self.temp_dir, 'mur.nc4')
+        shutil.copyfile(path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4'), test_file)
+        info = GranuleIndex(self.index_path).get(test_file)
+
+        mtime = path.getmtime(test_file) + 10
+        os.utime(test_file, (mtime, mtime))
+
+        with mock.patch('sdap.processors.granuleindex.describe_granule', return_value=info) as describe_granule:
+            GranuleIndex(self.index_path).get(test_file)
+
+        describe_granule.assert_called_once_with(test_file)
+
+    def test_describe_again_when_zarr_chunk_written(self):
+        store = path.join(self.temp_dir, 'granule.zarr')
+        xr.Dataset({'sst': (('lat', 'lon'), np.full((4, 4), np.nan))},
+                   coords={'lat': np.arange(4.0), 'lon': np.arange(4.0)}).to_zarr(store, consolidated=True,
+                                                                             encoding={'sst': {'chunks': (2, 2)}})
+        info = GranuleIndex(self.index_path).get(store)
+
+        zarr.open_group(store, mode='r+')['sst'][0:2, 0:2] = 1.0
+
+        with mock.patch('sdap.processors.granuleindex.describe_granule', return_value=info) as describe_granule:
+            GranuleIndex(self.index_path).get(store)
+
+        describe_granule.assert_called_once_with(store)
+
+    def test_extract_timestamp_with_index(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'OBP_2017_01.nc')
+
+        input_tile = nexusproto.NexusTile()
+        tile_summary = nexusproto.TileSummary()
+        tile_summary.granule = "file:%s" % test_file
+        input_tile.summary.CopyFrom(tile_summary)
+        input_tile.tile.grid_tile.CopyFrom(nexusproto.GridTile())
+
+        module = sdap.processors.ExtractTimestampProcessor('time_coverage_start', '%Y-%m-%dT%H:%M:%S',
+                                                           granule_index=self.index_path)
+        results = list(module.process_nexus_tile(input_tile))
+
+        self.assertEqual(1483228800, results[0].tile.grid_tile.time)
+
+
+if __name__ == '__main__':
+    unittest.main()
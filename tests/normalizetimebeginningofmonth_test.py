@@ -16,10 +16,13 @@
 import unittest
 from os import path
 
+import numpy as np
 from nexusproto import DataTile_pb2 as nexusproto
 from nexusproto.serialization import from_shaped_array
 
 import sdap.processors
+from sdap.processors.normalizetimebeginningofmonth import beginning_of_month
+from sdap.processors.serialization import to_shaped_array
 
 
 class TestNormalizeTimeBeginningOfMonth(unittest.TestCase):
@@ -42,6 +45,26 @@ class TestNormalizeTimeBeginningOfMonth(unittest.TestCase):
 
         self.assertEqual(1462060800, nexus_tile_after.tile.grid_tile.time)
 
+    def test_normalize_swath_time(self):
+        # 2016-05-10, NaN, 1969-12-31T23:59:59 and 2016-02-29T23:59:59.5
+        time = np.array([[1462838400.0, np.nan], [-1.0, 1456790399.5]])
+        input_tile = nexusproto.NexusTile()
+        input_tile.tile.swath_tile.time.CopyFrom(to_shaped_array(time))
+
+        results = list(self.module.process(input_tile))
+
+        normalized = from_shaped_array(results[0].tile.swath_tile.time)
+        self.assertEqual(np.float64, normalized.dtype)
+        np.testing.assert_array_equal([[1462060800.0, np.nan], [-2678400.0, 1454284800.0]], normalized)
+
+    def test_scalar_matches_array(self):
+        times = np.array([0, 1462838400, 1456790399, 951868800, -86400 * 365], dtype=np.int64)
+
+        normalized = beginning_of_month(times)
+
+        self.assertEqual([beginning_of_month(int(time)) for time in times], normalized.tolist())
+        self.assertEqual(np.int64, normalized.dtype)
+
 
 if __name__ == '__main__':
     unittest.main()
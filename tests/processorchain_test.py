@@ -16,7 +16,9 @@
 import unittest
 from os import path
 
+import numpy as np
 from nexusproto import DataTile_pb2 as nexusproto
+from nexusproto.serialization import from_shaped_array
 
 from sdap.processors.processorchain import ProcessorChain
 
@@ -45,6 +47,23 @@ class TestConstructChain(unittest.TestCase):
 
         self.assertIsNotNone(processorchain)
 
+    def test_construct_chain_pushes_down_empty_tile_filter(self):
+        processor_list = [
+            {'name': 'GridReadingProcessor',
+             'config': {'latitude': 'lat',
+                        'longitude': 'lon',
+                        'time': 'time',
+                        'variable_to_read': 'analysed_sst'}},
+            {'name': 'EmptyTileFilter', 'config': {}},
+            {'name': 'TileSummarizingProcessor', 'config': {}}
+        ]
+
+        processorchain = ProcessorChain(processor_list)
+
+        self.assertEqual(['GridReadingProcessor', 'TileSummarizingProcessor'],
+                         [type(processor).__name__ for processor in processorchain.processors])
+        self.assertTrue(processorchain.processors[0].skip_empty)
+
     def test_construct_chain_with_multiple_list_config(self):
         processor_list = [
             {'name': 'PromoteVariableToGlobalAttribute',
@@ -220,6 +239,65 @@ class TestRunChainMethod(unittest.TestCase):
         tile = results[0]
         self.assertEqual("1104483600", tile.summary.global_attributes[0].values[0])
 
+    def test_run_chain_float32(self):
+        processor_list = [
+            {'name': 'GridReadingProcessor',
+             'config': {'latitude': 'latitude',
+                        'longitude': 'longitude',
+                        'x_dim': 'i',
+                        'y_dim': 'j',
+                        'time': 'time',
+                        'variable_to_read': 'OBP',
+                        'output_dtype': 'float32'}},
+            {'name': 'EmptyTileFilter', 'config': {}},
+            {'name': 'Subtract180Longitude', 'config': {}},
+            {'name': 'TileSummarizingProcessor', 'config': {}}
+        ]
+        processorchain = ProcessorChain(processor_list)
+
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'OBP_2017_01.nc')
+
+        input_tile = nexusproto.NexusTile()
+        tile_summary = nexusproto.TileSummary()
+        tile_summary.granule = "file:%s" % test_file
+        tile_summary.section_spec = "time:0:1,j:0:10,i:0:10"
+        input_tile.summary.CopyFrom(tile_summary)
+
+        results = list(processorchain.process(input_tile))
+
+        self.assertEqual(1, len(results))
+        self.assertEqual(np.float32, from_shaped_array(results[0].tile.grid_tile.variable_data).dtype)
+
+    def test_run_chain_multiple_meta(self):
+        processor_list = [
+            {'name': 'GridReadingProcessor',
+             'config': {'latitude': 'latitude',
+                        'longitude': 'longitude',
+                        'time': 'time',
+                        'variable_to_read': 'nobs',
+                        'meta.0': 'uwnd',
+                        'meta.1': 'vwnd'}},
+            {'name': 'ComputeSpeedDirFromUV',
+             'config': {'wind_u_var_name': 'uwnd',
+                        'wind_v_var_name': 'vwnd'}},
+            {'name': 'TileSummarizingProcessor', 'config': {}}
+        ]
+        processorchain = ProcessorChain(processor_list)
+
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_ccmp.nc')
+
+        input_tile = nexusproto.NexusTile()
+        tile_summary = nexusproto.TileSummary()
+        tile_summary.granule = "file:%s" % test_file
+        tile_summary.section_spec = "time:0:1,longitude:0:87,latitude:0:38"
+        input_tile.summary.CopyFrom(tile_summary)
+
+        results = list(processorchain.process(input_tile))
+
+        self.assertEqual(1, len(results))
+        self.assertEqual(['uwnd', 'vwnd', 'wind_speed', 'wind_dir'],
+                         [meta.name for meta in results[0].tile.grid_tile.meta_data])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -14,9 +14,16 @@
 # limitations under the License.
 
 import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
+
+import numpy as np
+from scipy import interpolate
 
 import sdap.processors
+from sdap.processors import regrid1x1
 
 
 def delete_file_if_exists(filename):
@@ -48,6 +55,45 @@ class TestSSHData(unittest.TestCase):
         self.assertEqual(1, len(results))
 
 
+class TestNearestIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.in_lon = np.linspace(-10.3, 10.7, 43)
+        self.in_lat = np.linspace(-5.2, 5.9, 17)
+        self.out_lon = np.arange(-10.0, 11.0, 1)
+        self.out_lat = np.arange(-5.0, 6.0, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_matches_griddata(self):
+        data = np.random.RandomState(0).normal(size=(17, 43))
+
+        index = regrid1x1.nearest_index(self.in_lon, self.in_lat, self.out_lon, self.out_lat)
+
+        x_mesh, y_mesh = np.meshgrid(self.in_lon, self.in_lat)
+        x1_mesh, y1_mesh = np.meshgrid(self.out_lon, self.out_lat)
+        expected = interpolate.griddata(np.array([x_mesh.ravel(), y_mesh.ravel()]).T, data.ravel(),
+                                        (x1_mesh, y1_mesh), method='nearest')
+        np.testing.assert_array_equal(expected, data.ravel()[index])
+
+    def test_cached_on_disk(self):
+        grids = (self.in_lon, self.in_lat, self.out_lon, self.out_lat)
+        expected = regrid1x1.get_nearest_index(*grids, cache_dir=self.temp_dir)
+        self.assertEqual(['nearest-%s.npy' % regrid1x1.grid_hash(*grids)], os.listdir(self.temp_dir))
+
+        with mock.patch.dict(regrid1x1._nearest_indexes, clear=True), \
+                mock.patch('sdap.processors.regrid1x1.nearest_index') as nearest_index:
+            index = regrid1x1.get_nearest_index(*grids, cache_dir=self.temp_dir)
+
+        nearest_index.assert_not_called()
+        np.testing.assert_array_equal(expected, index)
+
+    def test_other_grid_other_hash(self):
+        self.assertNotEqual(regrid1x1.grid_hash(self.in_lon, self.in_lat, self.out_lon, self.out_lat),
+                            regrid1x1.grid_hash(self.in_lon, self.in_lat, self.out_lon[1:], self.out_lat))
+
+
 class TestGRACEData(unittest.TestCase):
     def setUp(self):
         self.test_file = ''  # os.path.join(os.path.dirname(__file__), 'datafiles', 'not_empty_measures_alt.nc')
@@ -0,0 +1,138 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import numpy as np
+from nexusproto import serialization
+
+from sdap.processors.serialization import CODECS, UnknownCodecException, compress_shaped_array, from_shaped_array, \
+    is_compressed, is_sparse, to_shaped_array, view_shaped_array, writable
+
+
+class TestViewShapedArray(unittest.TestCase):
+    def test_view_matches_from_shaped_array(self):
+        for data in (np.arange(12, dtype=np.float32).reshape(3, 4),
+                     np.asfortranarray(np.arange(12, dtype=np.float64).reshape(3, 4)),
+                     np.array([1, 2, 3], dtype='>i4'),
+                     np.array(5.0)):
+            shaped_array = to_shaped_array(data)
+
+            view = view_shaped_array(shaped_array)
+
+            np.testing.assert_array_equal(serialization.from_shaped_array(shaped_array), view)
+            self.assertEqual(data.dtype, view.dtype)
+            self.assertEqual(data.shape, view.shape)
+
+    def test_view_is_read_only(self):
+        view = view_shaped_array(to_shaped_array(np.array([1.0, np.nan, 3.0])))
+
+        self.assertFalse(view.flags.writeable)
+        with self.assertRaises(ValueError):
+            view[0] = 2.0
+
+    def test_writable_copies_only_read_only_arrays(self):
+        view = view_shaped_array(to_shaped_array(np.array([1.0, np.nan, 3.0])))
+
+        copy = writable(view)
+        copy[0] = 2.0
+
+        self.assertEqual(1.0, view[0])
+        self.assertIs(copy, writable(copy))
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.data = np.full((30, 40), np.nan, dtype=np.float32)
+        self.data[5:20, 10:30] = np.linspace(270.0, 300.0, 300, dtype=np.float32).reshape(15, 20)
+
+    def test_round_trip(self):
+        for codec in CODECS:
+            for shuffle in (False, True):
+                shaped_array = to_shaped_array(self.data, codec=codec, shuffle=shuffle)
+
+                self.assertTrue(is_compressed(shaped_array))
+                self.assertLess(len(shaped_array.array_data), self.data.nbytes)
+                np.testing.assert_array_equal(self.data, from_shaped_array(shaped_array))
+                np.testing.assert_array_equal(self.data, view_shaped_array(shaped_array))
+
+    def test_compress_in_place(self):
+        shaped_array = to_shaped_array(self.data)
+
+        compress_shaped_array(shaped_array, 'zlib', level=9, shuffle=True)
+        compressed = shaped_array.array_data
+        compress_shaped_array(shaped_array, 'zlib')
+
+        self.assertEqual(compressed, shaped_array.array_data)
+        self.assertEqual([30, 40], list(shaped_array.shape))
+        np.testing.assert_array_equal(self.data, from_shaped_array(shaped_array))
+
+    def test_uncompressed_is_unchanged(self):
+        shaped_array = to_shaped_array(self.data)
+
+        self.assertFalse(is_compressed(shaped_array))
+        self.assertEqual(serialization.to_shaped_array(self.data).array_data, shaped_array.array_data)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(UnknownCodecException):
+            to_shaped_array(self.data, codec='rar')
+
+
+class TestSparse(unittest.TestCase):
+    def setUp(self):
+        self.data = np.full((2, 30, 40), np.nan)
+        self.data[1, 25:, 35:] = np.arange(25.0).reshape(5, 5)
+
+    def test_round_trip(self):
+        shaped_array = to_shaped_array(self.data, sparse_threshold=0.8)
+
+        self.assertTrue(is_sparse(shaped_array.array_data))
+        self.assertEqual([2, 30, 40], list(shaped_array.shape))
+        self.assertEqual('float64', shaped_array.dtype)
+        self.assertLess(len(shaped_array.array_data), self.data.nbytes / 10)
+        np.testing.assert_array_equal(self.data, from_shaped_array(shaped_array))
+
+        view = view_shaped_array(shaped_array)
+        np.testing.assert_array_equal(self.data, view)
+        self.assertFalse(view.flags.writeable)
+
+    def test_writable_keeps_densified_array(self):
+        view = view_shaped_array(to_shaped_array(self.data, sparse_threshold=0.8))
+
+        self.assertIs(view, writable(view))
+        self.assertTrue(view.flags.writeable)
+
+    def test_below_threshold(self):
+        self.data[0] = 1.0
+
+        shaped_array = to_shaped_array(self.data, sparse_threshold=0.8)
+
+        self.assertFalse(is_sparse(shaped_array.array_data))
+        np.testing.assert_array_equal(self.data, from_shaped_array(shaped_array))
+
+    def test_not_floating_point(self):
+        shaped_array = to_shaped_array(np.zeros((10, 10), dtype=np.int32), sparse_threshold=0.0)
+
+        self.assertFalse(is_sparse(shaped_array.array_data))
+
+    def test_sparse_and_compressed(self):
+        shaped_array = to_shaped_array(self.data.astype(np.float32), codec='zlib', shuffle=True, sparse_threshold=0.8)
+
+        self.assertTrue(is_compressed(shaped_array))
+        np.testing.assert_array_equal(self.data.astype(np.float32), from_shaped_array(shaped_array))
+        np.testing.assert_array_equal(self.data.astype(np.float32), view_shaped_array(shaped_array))
+
+
+if __name__ == '__main__':
+    unittest.main()
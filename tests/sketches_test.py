@@ -0,0 +1,114 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+from os import path
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.serialization import from_shaped_array
+from sdap.processors.sketches import QuantileSketch, SketchMismatchException, TileSketch, merge_sketches
+
+
+class TestTileSketch(unittest.TestCase):
+    def setUp(self):
+        self.values = np.random.RandomState(0).normal(10.0, 20.0, 10000)
+
+    def sketch(self, values):
+        sketch = TileSketch(histogram_bins=20, histogram_range=(-50, 70), quantile_accuracy=0.01)
+        sketch.update(values)
+        return sketch
+
+    def test_statistics(self):
+        sketch = self.sketch(self.values)
+
+        self.assertEqual(10000, sketch.count)
+        self.assertAlmostEqual(self.values.mean(), sketch.mean, places=9)
+        self.assertAlmostEqual(self.values.std(), sketch.std, places=9)
+        self.assertEqual(self.values.min(), sketch.min)
+        self.assertEqual(10000, sketch.histogram.sum())
+        np.testing.assert_array_equal(np.histogram(np.clip(self.values, -50, 69.9), bins=20, range=(-50, 70))[0],
+                                      sketch.histogram)
+
+    def test_quantiles(self):
+        sketch = self.sketch(self.values)
+
+        for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+            expected = np.quantile(self.values, q, method='lower')
+            self.assertLessEqual(abs(sketch.quantile(q) - expected), abs(expected) * 0.01 + 1e-9)
+
+    def test_merge(self):
+        whole = self.sketch(self.values)
+        merged = merge_sketches([self.sketch(part) for part in np.array_split(self.values, 7)])
+
+        self.assertEqual(whole.count, merged.count)
+        self.assertAlmostEqual(whole.sum, merged.sum, places=6)
+        self.assertAlmostEqual(whole.std, merged.std, places=9)
+        np.testing.assert_array_equal(whole.histogram, merged.histogram)
+        self.assertEqual(whole.quantiles.positive, merged.quantiles.positive)
+        self.assertEqual(whole.quantile(0.5), merged.quantile(0.5))
+
+    def test_merge_different_bins(self):
+        with self.assertRaises(SketchMismatchException):
+            self.sketch(self.values).merge(TileSketch(histogram_bins=10, histogram_range=(-50, 70)))
+        with self.assertRaises(SketchMismatchException):
+            QuantileSketch(0.01).merge(QuantileSketch(0.05))
+
+    def test_summary_round_trip(self):
+        sketch = self.sketch(self.values)
+        summary = nexusproto.TileSummary()
+
+        sketch.add_to_summary(summary)
+        sketch.add_to_summary(summary)
+        restored = TileSketch.from_summary(summary)
+
+        self.assertEqual(len(sketch.to_attributes()), len(summary.global_attributes))
+        self.assertEqual(sketch.to_attributes(), restored.to_attributes())
+        self.assertIsNone(TileSketch.from_summary(nexusproto.TileSummary()))
+
+
+class TestSummarizeWithSketch(unittest.TestCase):
+    def test_summarize_grid_with_sketch(self):
+        test_file = path.join(path.dirname(__file__), 'dumped_nexustiles', 'avhrr_nonempty_nexustile.bin')
+
+        with open(test_file, 'rb') as f:
+            nexustile_str = f.read()
+
+        summarizer = sdap.processors.TileSummarizingProcessor(sketch='true', histogram_range='270,310',
+                                                              histogram_bins=40, quantile_accuracy=0.001)
+        tile = list(summarizer.process(nexustile_str))[0]
+
+        data = from_shaped_array(tile.tile.grid_tile.variable_data)
+        data = data[~np.isnan(data)]
+        sketch = merge_sketches([tile])
+
+        self.assertEqual(tile.summary.stats.count, sketch.count)
+        self.assertEqual(tile.summary.stats.min, sketch.min)
+        self.assertAlmostEqual(data.astype(np.float64).sum(), sketch.sum, places=3)
+        self.assertEqual(40, len(sketch.histogram))
+        self.assertAlmostEqual(np.median(data), sketch.quantile(0.5), delta=np.median(data) * 0.002)
+
+    def test_summarize_without_sketch(self):
+        test_file = path.join(path.dirname(__file__), 'dumped_nexustiles', 'avhrr_nonempty_nexustile.bin')
+
+        with open(test_file, 'rb') as f:
+            tile = list(sdap.processors.TileSummarizingProcessor().process(f.read()))[0]
+
+        self.assertIsNone(merge_sketches([tile]))
+
+
+if __name__ == '__main__':
+    unittest.main()
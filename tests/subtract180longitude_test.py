@@ -21,6 +21,7 @@ import numpy as np
 from nexusproto.serialization import from_shaped_array
 
 import sdap.processors
+from sdap.processors.serialization import to_metadata, to_shaped_array
 
 
 class TestAscatbUData(unittest.TestCase):
@@ -66,3 +67,36 @@ class TestAscatbUData(unittest.TestCase):
         self.assertTrue(np.all(np.not_equal(longitudes_before, longitudes_after)))
         self.assertTrue(np.all(longitudes_after[longitudes_after < 0]))
         self.assertAlmostEqual(-96.61, longitudes_after[0][26], places=2)
+
+
+class TestReorderGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.longitudes = np.arange(0.0, 360.0, 10.0)
+        self.data = np.broadcast_to(self.longitudes, (1, 2, 36)).copy()
+
+        self.input_tile = nexusproto.NexusTile()
+        grid_tile = self.input_tile.tile.grid_tile
+        grid_tile.latitude.CopyFrom(to_shaped_array(np.array([10.0, 20.0])))
+        grid_tile.longitude.CopyFrom(to_shaped_array(self.longitudes))
+        grid_tile.variable_data.CopyFrom(to_shaped_array(self.data))
+        grid_tile.meta_data.add().CopyFrom(to_metadata('error', self.data / 10))
+
+    def test_reorder(self):
+        results = list(sdap.processors.Subtract180Longitude(reorder='true').process(self.input_tile))
+
+        grid_tile = results[0].tile.grid_tile
+        longitudes = from_shaped_array(grid_tile.longitude)
+        np.testing.assert_array_equal(np.arange(-170.0, 190.0, 10.0), longitudes)
+
+        # Every value still sits at its own longitude
+        data = from_shaped_array(grid_tile.variable_data)
+        np.testing.assert_array_equal(np.broadcast_to(longitudes % 360, (1, 2, 36)), data)
+        np.testing.assert_array_equal(data / 10, from_shaped_array(grid_tile.meta_data[0].meta_data))
+
+    def test_no_reorder_by_default(self):
+        results = list(sdap.processors.Subtract180Longitude().process(self.input_tile))
+
+        grid_tile = results[0].tile.grid_tile
+        self.assertEqual(-170.0, from_shaped_array(grid_tile.longitude)[19])
+        np.testing.assert_array_equal(self.data, from_shaped_array(grid_tile.variable_data))
@@ -0,0 +1,101 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+from sdap.processors.tileaccessor import VARIABLE_DATA, TileAccessor, get_tile_accessor
+
+
+class TestTileAccessor(unittest.TestCase):
+    def setUp(self):
+        self.data = np.arange(6, dtype=np.float64).reshape(2, 3)
+
+        self.nexus_tile = nexusproto.NexusTile()
+        swath_tile = self.nexus_tile.tile.swath_tile
+        swath_tile.variable_data.CopyFrom(to_shaped_array(self.data))
+        swath_tile.meta_data.add().CopyFrom(to_metadata('u', self.data * 2))
+        swath_tile.meta_data.add().CopyFrom(to_metadata('v', self.data * 3))
+
+    def test_array_by_name(self):
+        tile = TileAccessor(self.nexus_tile)
+
+        self.assertEqual('swath_tile', tile.tile_type)
+        self.assertIn('v', tile)
+        self.assertNotIn('w', tile)
+        np.testing.assert_array_equal(self.data, tile.array(VARIABLE_DATA))
+        np.testing.assert_array_equal(self.data * 3, tile.array('v'))
+        with self.assertRaises(KeyError):
+            tile.array('w')
+
+    def test_decode_lazily_once(self):
+        with mock.patch('sdap.processors.tileaccessor.view_shaped_array',
+                        wraps=sdap.processors.tileaccessor.view_shaped_array) as view_shaped_array:
+            tile = TileAccessor(self.nexus_tile)
+            view_shaped_array.assert_not_called()
+
+            first = tile.array('u')
+            self.assertIs(first, tile.array('u'))
+            self.assertEqual(1, view_shaped_array.call_count)
+
+    def test_replace_or_insert(self):
+        tile = TileAccessor(self.nexus_tile)
+
+        tile.set_array('u', self.data * 4)
+        tile.set_array('speed', self.data * 5)
+        tile.set_array('speed', self.data * 6)
+        tile.set_array(VARIABLE_DATA, -self.data)
+
+        self.assertEqual(['u', 'v', 'speed'], tile.names())
+        swath_tile = self.nexus_tile.tile.swath_tile
+        np.testing.assert_array_equal(self.data * 4, from_shaped_array(swath_tile.meta_data[0].meta_data))
+        np.testing.assert_array_equal(self.data * 6, from_shaped_array(swath_tile.meta_data[2].meta_data))
+        np.testing.assert_array_equal(-self.data, tile.array(VARIABLE_DATA))
+
+    def test_changes_outside_accessor(self):
+        tile = TileAccessor(self.nexus_tile)
+        tile.array('u')
+
+        swath_tile = self.nexus_tile.tile.swath_tile
+        swath_tile.meta_data[0].meta_data.CopyFrom(to_shaped_array(self.data * 7))
+        swath_tile.meta_data.add().CopyFrom(to_metadata('w', self.data * 8))
+
+        np.testing.assert_array_equal(self.data * 7, tile.array('u'))
+        np.testing.assert_array_equal(self.data * 8, tile.array('w'))
+
+    def test_shared_between_stages(self):
+        tile = get_tile_accessor(self.nexus_tile)
+        decoded = tile.array('u')
+
+        self.assertIs(tile, get_tile_accessor(self.nexus_tile))
+        self.assertIs(decoded, get_tile_accessor(self.nexus_tile).array('u'))
+        self.assertIsNot(tile, get_tile_accessor(nexusproto.NexusTile()))
+
+    def test_rerun_does_not_duplicate(self):
+        processor = sdap.processors.ComputeSpeedDirFromUV('u', 'v')
+
+        list(processor.process(self.nexus_tile))
+        list(processor.process(self.nexus_tile))
+
+        self.assertEqual(['u', 'v', 'wind_speed', 'wind_dir'], get_tile_accessor(self.nexus_tile).names())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,14 +13,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
 import unittest
 from os import path
+from unittest import mock
 
 import numpy as np
-from nexusproto.serialization import from_shaped_array
+import xarray as xr
 from nexusproto import DataTile_pb2 as nexusproto
 
 import sdap.processors
+from sdap.processors.serialization import from_shaped_array, is_sparse
+from sdap.processors.tilereadingprocessor import TileTooLargeException
 
 
 class TestReadMurData(unittest.TestCase):
@@ -223,6 +229,32 @@ class TestReadCcmpData(unittest.TestCase):
 
         self.assertEqual(1451606400, results[0].tile.grid_tile.time)
 
+    def test_read_ccmp_multiple_meta(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_ccmp.nc')
+
+        ccmp_reader = sdap.processors.GridReadingProcessor('nobs', 'latitude', 'longitude', time='time',
+                                                           meta=['uwnd', 'vwnd'])
+
+        input_tile = nexusproto.NexusTile()
+        tile_summary = nexusproto.TileSummary()
+        tile_summary.granule = "file:%s" % test_file
+        tile_summary.section_spec = "time:0:1,longitude:0:87,latitude:0:38"
+        input_tile.summary.CopyFrom(tile_summary)
+
+        results = list(ccmp_reader.process(input_tile))
+
+        self.assertEqual(1, len(results))
+
+        tile = results[0].tile.grid_tile
+        self.assertEqual(['uwnd', 'vwnd'], [meta.name for meta in tile.meta_data])
+        for meta in tile.meta_data:
+            self.assertEqual((1, 38, 87), from_shaped_array(meta.meta_data).shape)
+
+        uwnd_reader = sdap.processors.GridReadingProcessor('uwnd', 'latitude', 'longitude', time='time')
+        uwnd_tile = list(uwnd_reader.process(input_tile))[0].tile.grid_tile
+        np.testing.assert_array_equal(from_shaped_array(uwnd_tile.variable_data),
+                                      from_shaped_array(tile.meta_data[0].meta_data))
+
 
 class TestReadAvhrrData(unittest.TestCase):
     def test_read_not_empty_avhrr(self):
@@ -342,5 +374,274 @@ class TestReadInterpEccoData(unittest.TestCase):
             self.assertEqual(1484568000, tile.time)
 
 
+class TestReadZarrData(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def to_zarr(self, file_name):
+        test_file = path.join(path.dirname(__file__), 'datafiles', file_name)
+        zarr_store = path.join(self.temp_dir, file_name + '.zarr')
+        with xr.open_dataset(test_file, decode_cf=False) as ds:
+            ds.chunk(5).to_zarr(zarr_store)
+
+        return test_file, zarr_store
+
+    @staticmethod
+    def read_tile(reader, granule, section_spec):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % granule
+        input_tile.summary.section_spec = section_spec
+
+        return list(reader.process(input_tile))
+
+    def test_read_zarr_grid(self):
+        test_file, zarr_store = self.to_zarr('not_empty_avhrr.nc4')
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time')
+
+        netcdf_tile = self.read_tile(reader, test_file, "time:0:1,lat:0:10,lon:0:10")[0].tile.grid_tile
+        zarr_tile = self.read_tile(reader, zarr_store, "time:0:1,lat:0:10,lon:0:10")[0].tile.grid_tile
+
+        self.assertEqual(netcdf_tile.time, zarr_tile.time)
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.latitude), from_shaped_array(zarr_tile.latitude))
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.longitude), from_shaped_array(zarr_tile.longitude))
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.variable_data),
+                                      from_shaped_array(zarr_tile.variable_data))
+
+    def test_read_zarr_swath(self):
+        test_file, zarr_store = self.to_zarr('not_empty_ascatb.nc4')
+        reader = sdap.processors.SwathReadingProcessor('wind_speed', 'lat', 'lon', time='time', meta='wind_dir')
+
+        netcdf_tile = self.read_tile(reader, test_file, "NUMROWS:0:1,NUMCELLS:0:82")[0].tile.swath_tile
+        zarr_tile = self.read_tile(reader, zarr_store, "NUMROWS:0:1,NUMCELLS:0:82")[0].tile.swath_tile
+
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.time), from_shaped_array(zarr_tile.time))
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.variable_data),
+                                      from_shaped_array(zarr_tile.variable_data))
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.meta_data[0].meta_data),
+                                      from_shaped_array(zarr_tile.meta_data[0].meta_data))
+
+    def test_read_zarr_time_series(self):
+        test_file, zarr_store = self.to_zarr('not_empty_wswm.nc')
+        reader = sdap.processors.TimeSeriesReadingProcessor('Qout', 'lat', 'lon', 'time')
+
+        netcdf_tile = self.read_tile(reader, test_file, "time:0:5832,rivid:0:1")[0].tile.time_series_tile
+        zarr_tile = self.read_tile(reader, zarr_store, "time:0:5832,rivid:0:1")[0].tile.time_series_tile
+
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.time), from_shaped_array(zarr_tile.time))
+        np.testing.assert_array_equal(from_shaped_array(netcdf_tile.variable_data),
+                                      from_shaped_array(zarr_tile.variable_data))
+
+
+class TestReadOutOfCore(unittest.TestCase):
+    def setUp(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_ccmp.nc')
+
+        self.input_tile = nexusproto.NexusTile()
+        self.input_tile.summary.granule = "file:%s" % test_file
+        self.input_tile.summary.section_spec = "time:0:1,longitude:0:87,latitude:0:38"
+
+    def test_read_with_memory_limit(self):
+        eager_reader = sdap.processors.GridReadingProcessor('uwnd', 'latitude', 'longitude', time='time', meta='vwnd')
+        lazy_reader = sdap.processors.GridReadingProcessor('uwnd', 'latitude', 'longitude', time='time', meta='vwnd',
+                                                           memory_limit='64kB')
+
+        eager_tile = list(eager_reader.process(self.input_tile))[0].tile.grid_tile
+        lazy_tile = list(lazy_reader.process(self.input_tile))[0].tile.grid_tile
+
+        self.assertEqual(eager_tile.time, lazy_tile.time)
+        np.testing.assert_array_equal(from_shaped_array(eager_tile.variable_data),
+                                      from_shaped_array(lazy_tile.variable_data))
+        np.testing.assert_array_equal(from_shaped_array(eager_tile.meta_data[0].meta_data),
+                                      from_shaped_array(lazy_tile.meta_data[0].meta_data))
+
+    def test_tile_larger_than_memory_limit(self):
+        lazy_reader = sdap.processors.GridReadingProcessor('uwnd', 'latitude', 'longitude', time='time',
+                                                           memory_limit=4096)
+
+        with self.assertRaises(TileTooLargeException):
+            list(lazy_reader.process(self.input_tile))
+
+
+class TestReadThreaded(unittest.TestCase):
+    def test_read_with_read_threads(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_ascatb.nc4')
+
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % test_file
+        input_tile.summary.section_spec = "NUMROWS:0:2,NUMCELLS:0:82"
+
+        reader = sdap.processors.SwathReadingProcessor('wind_speed', 'lat', 'lon', time='time', meta='wind_dir')
+        threaded_reader = sdap.processors.SwathReadingProcessor('wind_speed', 'lat', 'lon', time='time',
+                                                                meta='wind_dir', read_threads=2)
+
+        tile = list(reader.process(input_tile))[0].tile.swath_tile
+        threaded_tile = list(threaded_reader.process(input_tile))[0].tile.swath_tile
+
+        np.testing.assert_array_equal(from_shaped_array(tile.time), from_shaped_array(threaded_tile.time))
+        np.testing.assert_array_equal(from_shaped_array(tile.variable_data),
+                                      from_shaped_array(threaded_tile.variable_data))
+        np.testing.assert_array_equal(from_shaped_array(tile.meta_data[0].meta_data),
+                                      from_shaped_array(threaded_tile.meta_data[0].meta_data))
+
+    def test_read_pool_is_shared(self):
+        first_reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', read_threads=2)
+        second_reader = sdap.processors.SwathReadingProcessor('wind_speed', 'lat', 'lon', 'time', read_threads=8)
+
+        self.assertIs(first_reader.read_pool, second_reader.read_pool)
+
+
+class TestReadOutputDtype(unittest.TestCase):
+    @staticmethod
+    def input_tile(file_name, section_spec):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % path.join(path.dirname(__file__), 'datafiles', file_name)
+        input_tile.summary.section_spec = section_spec
+        return input_tile
+
+    def test_read_grid_float32(self):
+        input_tile = self.input_tile('OBP_2017_01.nc', "time:0:1,j:0:10,i:0:10")
+
+        reader = sdap.processors.GridReadingProcessor('OBP', 'latitude', 'longitude', x_dim='i', y_dim='j',
+                                                      time='time')
+        float32_reader = sdap.processors.GridReadingProcessor('OBP', 'latitude', 'longitude', x_dim='i', y_dim='j',
+                                                              time='time', output_dtype='float32')
+
+        tile = list(reader.process(input_tile))[0].tile.grid_tile
+        float32_tile = list(float32_reader.process(input_tile))[0].tile.grid_tile
+
+        data = from_shaped_array(tile.variable_data)
+        float32_data = from_shaped_array(float32_tile.variable_data)
+        self.assertEqual(np.float64, data.dtype)
+        self.assertEqual(np.float32, float32_data.dtype)
+        self.assertEqual('float32', float32_tile.variable_data.dtype)
+        self.assertEqual(data.nbytes // 2, float32_data.nbytes)
+        # Downcasting only loses what float32 cannot represent
+        np.testing.assert_allclose(data, float32_data, rtol=np.finfo(np.float32).eps)
+
+    def test_read_swath_meta_float32(self):
+        input_tile = self.input_tile('not_empty_ascatb.nc4', "NUMROWS:0:1,NUMCELLS:0:82")
+
+        reader = sdap.processors.SwathReadingProcessor('wind_speed', 'lat', 'lon', time='time',
+                                                       meta='wvc_quality_flag')
+        float32_reader = sdap.processors.SwathReadingProcessor('wind_speed', 'lat', 'lon', time='time',
+                                                               meta='wvc_quality_flag', output_dtype='float32')
+
+        tile = list(reader.process(input_tile))[0].tile.swath_tile
+        float32_tile = list(float32_reader.process(input_tile))[0].tile.swath_tile
+
+        meta = from_shaped_array(tile.meta_data[0].meta_data)
+        float32_meta = from_shaped_array(float32_tile.meta_data[0].meta_data)
+        self.assertEqual(np.float64, meta.dtype)
+        self.assertEqual(np.float32, float32_meta.dtype)
+        np.testing.assert_allclose(meta, float32_meta, rtol=np.finfo(np.float32).eps)
+        # Time keeps full precision
+        np.testing.assert_array_equal(from_shaped_array(tile.time), from_shaped_array(float32_tile.time))
+
+    def test_non_float_output_dtype(self):
+        with self.assertRaises(ValueError):
+            sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', output_dtype='int16')
+
+
+class TestReadInPlace(unittest.TestCase):
+    def test_input_tile_unchanged(self):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % path.join(path.dirname(__file__), 'datafiles', 'not_empty_ccmp.nc')
+        input_tile.summary.section_spec = "time:0:1,longitude:0:87,latitude:0:38"
+        expected_input = input_tile.SerializeToString()
+
+        reader = sdap.processors.GridReadingProcessor('uwnd', 'latitude', 'longitude', time='time', meta='vwnd')
+        first = list(reader.process(input_tile))[0]
+        second = list(reader.process(input_tile))[0]
+
+        self.assertEqual(expected_input, input_tile.SerializeToString())
+        self.assertIsNot(first, second)
+        self.assertEqual(first, second)
+        self.assertEqual(input_tile.summary, first.summary)
+        self.assertEqual(1, len(first.tile.grid_tile.meta_data))
+        self.assertEqual((1, 38, 87), from_shaped_array(first.tile.grid_tile.variable_data).shape)
+
+
+class TestReadSkipEmpty(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def input_tile(granule, section_spec):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % granule
+        input_tile.summary.section_spec = section_spec
+        return input_tile
+
+    def test_skip_empty_mur(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'empty_mur.nc4')
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time', skip_empty='true')
+
+        self.assertEqual([], list(reader.process(self.input_tile(test_file, "time:0:1,lat:0:10,lon:0:10"))))
+
+    def test_keep_not_empty_mur(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4')
+        input_tile = self.input_tile(test_file, "time:0:1,lat:0:10,lon:0:10")
+
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time', meta='analysis_error')
+        skipping_reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time',
+                                                               meta='analysis_error', skip_empty='true')
+
+        self.assertEqual(list(reader.process(input_tile)), list(skipping_reader.process(input_tile)))
+
+    def test_skip_missing_zarr_chunks(self):
+        test_file = path.join(path.dirname(__file__), 'datafiles', 'not_empty_mur.nc4')
+        zarr_store = path.join(self.temp_dir, 'mur.zarr')
+        with xr.open_dataset(test_file, decode_cf=False) as ds:
+            ds.chunk({'time': 1, 'lat': 10, 'lon': 10}).to_zarr(zarr_store)
+        # Chunks that were never written
+        for lon_chunk in (0, 1):
+            os.remove(path.join(zarr_store, 'analysed_sst', '0.0.%d' % lon_chunk))
+
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time', skip_empty='true')
+
+        with mock.patch.object(reader, 'read_slice', wraps=reader.read_slice) as read_slice:
+            self.assertEqual([], list(reader.process(self.input_tile(zarr_store, "time:0:1,lat:0:10,lon:0:20"))))
+        read_slice.assert_not_called()
+
+        # Part of the tile is in a written chunk
+        self.assertEqual(1, len(list(reader.process(self.input_tile(zarr_store, "time:0:1,lat:0:10,lon:15:25")))))
+
+
+class TestReadSparse(unittest.TestCase):
+    def setUp(self):
+        self.input_tile = nexusproto.NexusTile()
+        self.input_tile.summary.granule = "file:%s" % path.join(path.dirname(__file__), 'datafiles',
+                                                                'partial_empty_mur.nc4')
+        self.input_tile.summary.section_spec = "time:0:1,lat:380:480,lon:0:11"
+
+    def test_read_sparse_mur(self):
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time')
+        sparse_reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time',
+                                                             sparse_threshold='0.3')
+
+        tile = list(reader.process(self.input_tile))[0].tile.grid_tile
+        sparse_tile = list(sparse_reader.process(self.input_tile))[0].tile.grid_tile
+
+        self.assertTrue(is_sparse(sparse_tile.variable_data.array_data))
+        self.assertEqual([1, 100, 11], list(sparse_tile.variable_data.shape))
+        self.assertLess(len(sparse_tile.variable_data.array_data), len(tile.variable_data.array_data))
+        np.testing.assert_array_equal(from_shaped_array(tile.variable_data),
+                                      from_shaped_array(sparse_tile.variable_data))
+
+    def test_read_dense_below_threshold(self):
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time',
+                                                      sparse_threshold='0.99')
+
+        tile = list(reader.process(self.input_tile))[0].tile.grid_tile
+
+        self.assertFalse(is_sparse(tile.variable_data.array_data))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -15,8 +15,12 @@
 
 import unittest
 from os import path
+from unittest import mock
+
+import numpy as np
 
 import sdap.processors
+from sdap.processors.tilesummarizingprocessor import summarize_data
 
 
 class TestSummarizeTile(unittest.TestCase):
@@ -87,5 +91,40 @@ class TestSummarizeTile(unittest.TestCase):
         self.assertEqual(1462838400, tile_summary.stats.max_time)
 
 
+class TestSummarizeData(unittest.TestCase):
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.latitudes = np.linspace(-60, 60, 50)
+        self.data = random.normal(290.0, 5.0, (1, 50, 70)).astype(np.float32)
+        self.data[0, :10, :] = np.nan
+        self.data[0, 20:30, 5] = np.nan
+
+    def test_matches_masked_average(self):
+        weights = np.cos(np.radians(np.repeat(self.latitudes, 70)))
+        expected_mean = np.ma.average(np.ma.masked_invalid(self.data).flatten(), weights=weights).item()
+
+        # Small blocks so the data is summarized over many of them
+        with mock.patch('sdap.processors.tilesummarizingprocessor.BLOCK_SIZE', 128):
+            minimum, maximum, mean, count = summarize_data(self.data, self.latitudes.reshape(-1, 1))
+
+        self.assertEqual(np.nanmin(self.data), minimum)
+        self.assertEqual(np.nanmax(self.data), maximum)
+        self.assertAlmostEqual(expected_mean, mean, places=9)
+        self.assertEqual(np.count_nonzero(~np.isnan(self.data)), count)
+
+    def test_unweighted(self):
+        minimum, maximum, mean, count = summarize_data(self.data)
+
+        self.assertAlmostEqual(np.nanmean(self.data.astype(np.float64)), mean, places=9)
+
+    def test_all_nan(self):
+        minimum, maximum, mean, count = summarize_data(np.full((1, 5, 5), np.nan), np.zeros((5, 1)))
+
+        self.assertTrue(np.isnan(minimum))
+        self.assertTrue(np.isnan(maximum))
+        self.assertEqual(0.0, mean)
+        self.assertEqual(0, count)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,189 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+from os import path
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+from sdap.processors.trimemptyborders import trim_section_spec, valid_bounds
+
+
+class TestValidBounds(unittest.TestCase):
+    def test_bounds(self):
+        data = np.full((1, 6, 8), np.nan)
+        data[0, 2, 3] = 1.0
+        data[0, 4, 6] = 2.0
+
+        self.assertEqual([(0, 1), (2, 5), (3, 7)], valid_bounds(data))
+
+    def test_empty(self):
+        self.assertIsNone(valid_bounds(np.full((3, 3), np.nan)))
+
+    def test_trim_section_spec_with_deleted_axis(self):
+        self.assertEqual("time:0:1,lat:12:15,lon:33:37",
+                         trim_section_spec("time:0:1,lat:10:16,lon:30:38", ['lat', 'lon'], (6, 8), [(2, 5), (3, 7)]))
+
+    def test_trim_section_spec_by_name(self):
+        # Square data, the spec lists lon before lat
+        self.assertEqual("lon:0:4,lat:1:4",
+                         trim_section_spec("lon:0:4,lat:0:4", ['lat', 'lon'], (4, 4), [(1, 4), (0, 4)]))
+
+    def test_trim_section_spec_missing_dimension(self):
+        with self.assertRaises(RuntimeError):
+            trim_section_spec("time:0:1,lat:0:4,lon:0:4", ['lat', 'longitude'], (4, 4), [(1, 4), (0, 4)])
+
+
+class TestTrimGrid(unittest.TestCase):
+    def test_trim_partial_empty_mur(self):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % path.join(path.dirname(__file__), 'datafiles',
+                                                           'partial_empty_mur.nc4')
+        input_tile.summary.section_spec = "time:0:1,lat:380:480,lon:0:11"
+
+        reader = sdap.processors.GridReadingProcessor('analysed_sst', 'lat', 'lon', time='time',
+                                                      meta='analysis_error')
+        tile = list(reader.process(input_tile))[0]
+        data = from_shaped_array(tile.tile.grid_tile.variable_data)
+        latitudes = from_shaped_array(tile.tile.grid_tile.latitude)
+        longitudes = from_shaped_array(tile.tile.grid_tile.longitude)
+        error = from_shaped_array(tile.tile.grid_tile.meta_data[0].meta_data)
+
+        processor = sdap.processors.TrimEmptyBorders('time,lat,lon')
+        trimmed = list(processor.process(tile))[0]
+
+        (_, _), (lat_start, lat_stop), (lon_start, lon_stop) = valid_bounds(data)
+        self.assertLess(lat_stop - lat_start, 100)
+        self.assertEqual("time:0:1,lat:%d:%d,lon:%d:%d" % (380 + lat_start, 380 + lat_stop, lon_start, lon_stop),
+                         trimmed.summary.section_spec)
+
+        grid_tile = trimmed.tile.grid_tile
+        trimmed_data = from_shaped_array(grid_tile.variable_data)
+        np.testing.assert_array_equal(data[:, lat_start:lat_stop, lon_start:lon_stop], trimmed_data)
+        self.assertEqual(np.count_nonzero(~np.isnan(data)), np.count_nonzero(~np.isnan(trimmed_data)))
+        np.testing.assert_array_equal(error[:, lat_start:lat_stop, lon_start:lon_stop],
+                                      from_shaped_array(grid_tile.meta_data[0].meta_data))
+        self.assertEqual('analysis_error', grid_tile.meta_data[0].name)
+        np.testing.assert_array_equal(latitudes[lat_start:lat_stop], from_shaped_array(grid_tile.latitude))
+        np.testing.assert_array_equal(longitudes[lon_start:lon_stop], from_shaped_array(grid_tile.longitude))
+
+        # Trimmed tiles are left as they are
+        self.assertEqual(trimmed.SerializeToString(),
+                         list(processor.process(trimmed))[0].SerializeToString())
+
+    def test_trim_ccmp_spec_in_other_order(self):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.granule = "file:%s" % path.join(path.dirname(__file__), 'datafiles', 'not_empty_ccmp.nc')
+        input_tile.summary.section_spec = "time:0:1,longitude:0:87,latitude:0:38"
+
+        reader = sdap.processors.GridReadingProcessor('uwnd', 'latitude', 'longitude', time='time')
+        tile = list(reader.process(input_tile))[0]
+        grid_tile = tile.tile.grid_tile
+        data = from_shaped_array(grid_tile.variable_data)
+        self.assertEqual((1, 38, 87), data.shape)
+        latitudes = from_shaped_array(grid_tile.latitude)
+        longitudes = from_shaped_array(grid_tile.longitude)
+
+        data[:, :3, :] = np.nan
+        data[:, :, 80:] = np.nan
+        grid_tile.variable_data.CopyFrom(to_shaped_array(data))
+
+        trimmed = list(sdap.processors.TrimEmptyBorders('time,latitude,longitude').process(tile))[0]
+
+        self.assertEqual("time:0:1,longitude:0:80,latitude:3:38", trimmed.summary.section_spec)
+        grid_tile = trimmed.tile.grid_tile
+        np.testing.assert_array_equal(data[:, 3:, :80], from_shaped_array(grid_tile.variable_data))
+        np.testing.assert_array_equal(latitudes[3:], from_shaped_array(grid_tile.latitude))
+        np.testing.assert_array_equal(longitudes[:80], from_shaped_array(grid_tile.longitude))
+
+    def test_empty_tile_unchanged(self):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.section_spec = "lat:0:2,lon:0:2"
+        input_tile.tile.grid_tile.variable_data.CopyFrom(to_shaped_array(np.full((2, 2), np.nan)))
+
+        output_tile = list(sdap.processors.TrimEmptyBorders('lat,lon').process(input_tile))[0]
+
+        self.assertEqual("lat:0:2,lon:0:2", output_tile.summary.section_spec)
+        self.assertEqual([2, 2], list(output_tile.tile.grid_tile.variable_data.shape))
+
+
+class TestTrimSwath(unittest.TestCase):
+    def test_trim_swath_edges(self):
+        data = np.arange(30, dtype=np.float64).reshape(5, 6)
+        data[:, 0] = np.nan
+        data[4, :] = np.nan
+        latitudes = np.arange(30, dtype=np.float64).reshape(5, 6) / 10
+        time = np.arange(5, dtype=np.float64).reshape(5, 1)
+
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.section_spec = "scan:10:15,pixel:0:6"
+        swath_tile = input_tile.tile.swath_tile
+        swath_tile.variable_data.CopyFrom(to_shaped_array(data))
+        swath_tile.latitude.CopyFrom(to_shaped_array(latitudes))
+        swath_tile.longitude.CopyFrom(to_shaped_array(-latitudes))
+        swath_tile.time.CopyFrom(to_shaped_array(time))
+        swath_tile.meta_data.add().CopyFrom(to_metadata('quality', data * 2))
+
+        output_tile = list(sdap.processors.TrimEmptyBorders('scan,pixel').process(input_tile))[0]
+
+        self.assertEqual("scan:10:14,pixel:1:6", output_tile.summary.section_spec)
+        swath_tile = output_tile.tile.swath_tile
+        np.testing.assert_array_equal(data[:4, 1:], from_shaped_array(swath_tile.variable_data))
+        np.testing.assert_array_equal(latitudes[:4, 1:], from_shaped_array(swath_tile.latitude))
+        np.testing.assert_array_equal(-latitudes[:4, 1:], from_shaped_array(swath_tile.longitude))
+        np.testing.assert_array_equal(time[:4], from_shaped_array(swath_tile.time))
+        np.testing.assert_array_equal(data[:4, 1:] * 2, from_shaped_array(swath_tile.meta_data[0].meta_data))
+
+    def swath_tile(self, data, time):
+        input_tile = nexusproto.NexusTile()
+        input_tile.summary.section_spec = "scan:10:%d,pixel:0:%d" % (10 + data.shape[0], data.shape[1])
+        swath_tile = input_tile.tile.swath_tile
+        swath_tile.variable_data.CopyFrom(to_shaped_array(data))
+        swath_tile.latitude.CopyFrom(to_shaped_array(data))
+        swath_tile.longitude.CopyFrom(to_shaped_array(data))
+        swath_tile.time.CopyFrom(to_shaped_array(time))
+        return input_tile
+
+    def test_trim_time_per_scan(self):
+        data = np.arange(30, dtype=np.float64).reshape(5, 6)
+        data[4, :] = np.nan
+        data[:, 5] = np.nan
+        time = np.arange(5, dtype=np.float64)
+
+        output_tile = list(sdap.processors.TrimEmptyBorders('scan,pixel').process(self.swath_tile(data, time)))[0]
+
+        self.assertEqual("scan:10:14,pixel:0:5", output_tile.summary.section_spec)
+        np.testing.assert_array_equal(time[:4], from_shaped_array(output_tile.tile.swath_tile.time))
+
+    def test_trim_time_per_scan_of_square_swath(self):
+        data = np.arange(25, dtype=np.float64).reshape(5, 5)
+        data[4, :] = np.nan
+        time = np.arange(5, dtype=np.float64)
+
+        # The time could run along either axis
+        with self.assertRaises(RuntimeError):
+            list(sdap.processors.TrimEmptyBorders('scan,pixel').process(self.swath_tile(data, time)))
+
+        output_tile = list(sdap.processors.TrimEmptyBorders('scan,pixel', time_dimensions='scan')
+                           .process(self.swath_tile(data, time)))[0]
+
+        np.testing.assert_array_equal(time[:4], from_shaped_array(output_tile.tile.swath_tile.time))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+import zlib
+
+import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
+
+import sdap.processors
+from sdap.processors.serialization import from_shaped_array, to_metadata, to_shaped_array
+
+
+class TestTrimPrecision(unittest.TestCase):
+    def setUp(self):
+        self.data = np.random.RandomState(0).normal(290.0, 5.0, (1, 30, 30))
+        self.data[0, :5, :] = np.nan
+        self.flags = np.arange(900, dtype=np.int16).reshape(1, 30, 30)
+
+        self.input_tile = nexusproto.NexusTile()
+        tile = self.input_tile.tile.grid_tile
+        tile.variable_data.CopyFrom(to_shaped_array(self.data))
+        tile.meta_data.add().CopyFrom(to_metadata('error', self.data.astype(np.float32)))
+        tile.meta_data.add().CopyFrom(to_metadata('other', self.data))
+        tile.meta_data.add().CopyFrom(to_metadata('flags', self.flags))
+
+    def test_significant_digits(self):
+        processor = sdap.processors.TrimPrecision(significant_digits=3, meta='error,flags')
+
+        tile = list(processor.process(self.input_tile))[0].tile.grid_tile
+
+        trimmed = from_shaped_array(tile.variable_data)
+        np.testing.assert_array_equal(np.isnan(self.data), np.isnan(trimmed))
+        self.assertLessEqual(np.nanmax(np.abs(trimmed - self.data) / np.abs(self.data)), 0.5e-3)
+        self.assertLess(len(zlib.compress(trimmed.tobytes())), len(zlib.compress(self.data.tobytes())) / 2)
+
+        error = from_shaped_array(tile.meta_data[0].meta_data)
+        self.assertEqual(np.float32, error.dtype)
+        self.assertLessEqual(np.nanmax(np.abs(error - self.data) / np.abs(self.data)), 0.5e-3)
+
+        # Not selected
+        np.testing.assert_array_equal(self.data, from_shaped_array(tile.meta_data[1].meta_data))
+        # Not floating point
+        np.testing.assert_array_equal(self.flags, from_shaped_array(tile.meta_data[2].meta_data))
+
+    def test_precision(self):
+        processor = sdap.processors.TrimPrecision(precision=0.01)
+
+        tile = list(processor.process(self.input_tile))[0].tile.grid_tile
+
+        trimmed = from_shaped_array(tile.variable_data)
+        self.assertLessEqual(np.nanmax(np.abs(trimmed - self.data)), 0.01)
+        np.testing.assert_array_equal(np.isnan(self.data), np.isnan(trimmed))
+
+    def test_keeps_infinity(self):
+        data = np.array([np.inf, -np.inf, np.nan, -3.14159], dtype=np.float32)
+        input_tile = nexusproto.NexusTile()
+        input_tile.tile.grid_tile.variable_data.CopyFrom(to_shaped_array(data))
+
+        tile = list(sdap.processors.TrimPrecision(significant_digits=2).process(input_tile))[0].tile.grid_tile
+
+        trimmed = from_shaped_array(tile.variable_data)
+        self.assertEqual([np.inf, -np.inf], list(trimmed[:2]))
+        self.assertTrue(np.isnan(trimmed[2]))
+        self.assertAlmostEqual(-3.14159, trimmed[3], delta=3.14159 * 0.5e-2)
+
+    def test_requires_one_option(self):
+        with self.assertRaises(ValueError):
+            sdap.processors.TrimPrecision()
+        with self.assertRaises(ValueError):
+            sdap.processors.TrimPrecision(significant_digits=3, precision=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,12 +14,15 @@
 # limitations under the License.
 
 import unittest
+from math import cos, radians, sin
 from os import path
 
 import numpy as np
+from nexusproto import DataTile_pb2 as nexusproto
 from nexusproto.serialization import from_shaped_array
 
 import sdap.processors
+from sdap.processors.serialization import to_metadata, to_shaped_array
 
 
 class TestAscatbUData(unittest.TestCase):
@@ -96,5 +99,42 @@ class TestAscatbVData(unittest.TestCase):
         self.assertEqual(tile_data.shape, np.ma.masked_invalid(from_shaped_array(wind_u.meta_data)).shape)
 
 
+class TestComponentValues(unittest.TestCase):
+
+    def test_matches_element_wise_conversion(self):
+        random = np.random.RandomState(0)
+        wind_speed = random.uniform(0, 30, (20, 30)).astype(np.float32)
+        wind_dir = random.uniform(0, 360, (20, 30)).astype(np.float32)
+        wind_speed[0, :] = np.nan
+        wind_dir[:, 0] = np.nan
+
+        input_tile = nexusproto.NexusTile()
+        input_tile.tile.swath_tile.variable_data.CopyFrom(to_shaped_array(wind_speed))
+        input_tile.tile.swath_tile.meta_data.add().CopyFrom(to_metadata('wind_dir', wind_dir))
+
+        tile_data = list(sdap.processors.WindDirSpeedToUV('U').process(input_tile))[0].tile.swath_tile
+
+        expected_u = np.empty(wind_speed.shape)
+        expected_v = np.empty(wind_speed.shape)
+        for index in np.ndindex(wind_speed.shape):
+            expected_u[index] = float(wind_speed[index]) * sin(radians(wind_dir[index]))
+            expected_v[index] = float(wind_speed[index]) * cos(radians(wind_dir[index]))
+
+        np.testing.assert_array_equal(expected_u, from_shaped_array(tile_data.variable_data))
+        wind_v = next(meta_obj for meta_obj in tile_data.meta_data if meta_obj.name == 'wind_v')
+        np.testing.assert_array_equal(expected_v, from_shaped_array(wind_v.meta_data))
+        np.testing.assert_array_equal(np.isnan(wind_speed) | np.isnan(wind_dir),
+                                      np.isnan(from_shaped_array(tile_data.variable_data)))
+
+    def test_masked_values(self):
+        direction = np.ma.masked_array(np.radians([0.0, 90.0, 180.0]), mask=[False, True, False])
+        speed = np.ma.masked_array([2.0, 2.0, 2.0], mask=[False, False, True])
+
+        u = sdap.processors.winddirspeedtouv.calculate_u_component_value(direction, speed)
+
+        self.assertEqual([False, True, True], list(np.ma.getmaskarray(u)))
+        self.assertAlmostEqual(0.0, u[0])
+
+
 if __name__ == '__main__':
     unittest.main()